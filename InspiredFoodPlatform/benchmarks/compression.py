@@ -0,0 +1,59 @@
+# bytes on the wire and CPU cost of compression, to pick thresholds
+#
+# for a range of typical payloads prints the size and the time to compress
+# them, both as gateway JSON (HTTP_COMPRESSION_*) and as protobuf messages
+# between services (*_COMPRESSION, gRPC compresses each message on its own)
+#
+#   python -m benchmarks.compression
+import gzip
+import zlib
+import timeit
+import argparse
+from benchmarks.serialization import sample_order, sample_restaurant, sample_delivery, sample_payments
+from gateway import serializers
+from gateway.compression import compress, ENCODINGS
+
+def measure(fn, repeat):
+    number = 200
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 6, 9])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    payloads = [
+        ('delivery', sample_delivery(), serializers.delivery_json),
+        ('order, 3 items', sample_order(3), serializers.order_json),
+        ('menu, 2 items', sample_restaurant(2), serializers.restaurant_json),
+        ('order, 100 items', sample_order(100), serializers.order_json),
+        ('payments, 50', sample_payments(50), serializers.payments_json),
+        ('menu, 200 items', sample_restaurant(200), serializers.restaurant_json),
+    ]
+
+    print("HTTP responses (gateway JSON)")
+    print(f"{'payload':<18} {'encoding':<9} {'level':>5} {'bytes':>8} {'ratio':>6} {'us':>8}")
+    for name, message, to_json in payloads:
+        body = to_json(message)
+        print(f"{name:<18} {'identity':<9} {'':>5} {len(body):>8} {1.0:>6.2f} {0.0:>8.1f}")
+        for encoding in ENCODINGS:
+            for level in args.levels:
+                compressed = compress(encoding, body, level)
+                seconds = measure(lambda: compress(encoding, body, level), args.repeat)
+                print(f"{'':<18} {encoding:<9} {level:>5} {len(compressed):>8} {len(body) / len(compressed):>6.2f} {seconds * 1e6:>8.1f}")
+
+    print()
+    print("gRPC messages (protobuf)")
+    print(f"{'payload':<18} {'encoding':<9} {'bytes':>8} {'ratio':>6} {'us':>8}")
+    for name, message, _ in payloads:
+        data = message.SerializeToString()
+        print(f"{name:<18} {'none':<9} {len(data):>8} {1.0:>6.2f} {0.0:>8.1f}")
+        # grpc uses the zlib default level for both algorithms
+        for encoding, fn in (('gzip', lambda: gzip.compress(data, mtime=0)), ('deflate', lambda: zlib.compress(data))):
+            compressed = fn()
+            seconds = measure(fn, args.repeat)
+            print(f"{'':<18} {encoding:<9} {len(compressed):>8} {len(data) / len(compressed):>6.2f} {seconds * 1e6:>8.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# gateway throughput with concurrent clients
+#
+# starts the three backends in process with an artificial per-call latency,
+# runs the gateway under uvicorn and hammers POST /orders from an increasing
+# number of client threads. every order is new, so each request makes a
+# CreateOrder call (GET /restaurants/{id} is answered from the gateway's
+# cache). run it with --app pointed at an older gateway to get the "before"
+# numbers, e.g.
+#
+#   python -m benchmarks.gateway_throughput --latency 0.02
+import argparse
+import itertools
+from benchmarks.harness import start_backends, start_gateway, run_load, percentile
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--app', default='gateway.gateway:app')
+    parser.add_argument('--latency', type=float, default=0.02, help='backend latency per call in seconds')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+    args = parser.parse_args()
+
+    addrs, stop_backends = start_backends(latency=args.latency, max_workers=max(args.concurrency))
+    base_url, stop_gateway = start_gateway(addrs, app=args.app)
+
+    numbers = itertools.count()
+
+    def create_order(session):
+        number = next(numbers)
+        session.post(f'{base_url}/orders', json={
+            "customer_name": f"Customer {number}", "customer_email": f"customer{number}@example.com",
+            "restaurant_id": "restaurant456", "delivery_address": "1 Main St",
+            "items": [{"item_id": "pizza1", "name": "Margherita Pizza", "price": 12.99, "quantity": 1}],
+        }).raise_for_status()
+
+    try:
+        print(f"backend latency {args.latency * 1000:.0f} ms, {args.duration:.0f}s per run")
+        print(f"{'clients':>8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+        for concurrency in args.concurrency:
+            rps, latencies = run_load(create_order, concurrency, args.duration)
+            print(f"{concurrency:>8} {rps:>10.1f} {percentile(latencies, 50) * 1000:>10.1f} {percentile(latencies, 99) * 1000:>10.1f}")
+    finally:
+        stop_gateway()
+        stop_backends()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# GetOrder with and without the serialized response cache
+#
+# first times the work the order service does per call, the handler plus
+# serializing what it returns, for orders of 3 and 20 items. then GetOrder
+# calls per second over gRPC from a few client threads, which adds the cost
+# of gRPC itself. ORDER_RESPONSE_CACHE is switched off for the "rebuilt" runs
+#
+#   python -m benchmarks.get_order
+import time
+import logging
+import argparse
+from concurrent import futures
+import grpc
+from common.serialized import SerializedResponses, passthrough_serializer
+from benchmarks.harness import load_service_module, free_port
+from benchmarks.store_stress import Context
+
+def new_order(order_service, servicer, items):
+    pb2 = order_service.order_service_pb2
+    request = pb2.CreateOrderRequest(
+        customer_name='Bench', customer_email='bench@example.com', restaurant_id='restaurant456',
+        delivery_address='1 Main St',
+        items=[
+            pb2.OrderItem(item_id=f"item{index}", name=f"Item {index}", price=4.5, quantity=1, customizations=['no onions'])
+            for index in range(items)
+        ],
+    )
+    return servicer.CreateOrder(request, Context()).order_id
+
+def handler_rate(order_service, servicer, order_id, duration):
+    pb2 = order_service.order_service_pb2
+    serialize = passthrough_serializer(pb2.OrderResponse.SerializeToString)
+    request = pb2.GetOrderRequest(order_id=order_id)
+    calls = 0
+    stop = time.perf_counter() + duration
+    while time.perf_counter() < stop:
+        for _ in range(100):
+            serialize(servicer.GetOrder(request, Context()))
+        calls += 100
+    return calls / duration
+
+def grpc_rate(order_service, address, order_id, threads, duration):
+    pb2 = order_service.order_service_pb2
+    channel = grpc.insecure_channel(address)
+    stub = order_service.order_service_pb2_grpc.OrderServiceStub(channel)
+    request = pb2.GetOrderRequest(order_id=order_id)
+    stub.GetOrder(request)
+    done = [0] * threads
+    stop = time.perf_counter() + duration
+
+    def work(index):
+        while time.perf_counter() < stop:
+            stub.GetOrder(request)
+            done[index] += 1
+    with futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(work, range(threads)))
+    channel.close()
+    return sum(done) / duration
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, nargs='+', default=[3, 20])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=2.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    order_service = load_service_module('order_service')
+    servicer = order_service.OrderServicer()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=16), interceptors=[SerializedResponses()])
+    order_service.order_service_pb2_grpc.add_OrderServiceServicer_to_server(servicer, server)
+    port = free_port()
+    server.add_insecure_port(f'127.0.0.1:{port}')
+    server.start()
+
+    print(f"GetOrder calls per second, {args.duration:.0f}s per run, {args.threads} client threads over gRPC")
+    print(f"{'items':>6} {'handler rebuilt':>16} {'handler cached':>15} {'gRPC rebuilt':>13} {'gRPC cached':>12}")
+    try:
+        for items in args.items:
+            order_id = new_order(order_service, servicer, items)
+            rates = {}
+            for cached in (False, True):
+                order_service.ORDER_RESPONSE_CACHE = cached
+                rates['handler', cached] = handler_rate(order_service, servicer, order_id, args.duration)
+                rates['grpc', cached] = grpc_rate(order_service, f'127.0.0.1:{port}', order_id, args.threads, args.duration)
+            print(f"{items:>6} {rates['handler', False]:>16.0f} {rates['handler', True]:>15.0f} "
+                  f"{rates['grpc', False]:>13.0f} {rates['grpc', True]:>12.0f}")
+    finally:
+        server.stop(None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import os
+import sys
+import time
+import socket
+import subprocess
+import importlib.util
+from concurrent import futures
+import grpc
+import requests
+from common.serialized import SerializedResponses
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# load a servicer module straight from its file so the three services
+# can live in one process without their module names clashing
+def load_service_module(service):
+    service_dir = os.path.join(project_root, service)
+    if service_dir not in sys.path:
+        sys.path.insert(0, service_dir)
+    spec = importlib.util.spec_from_file_location(f"{service}_module", os.path.join(service_dir, f"{service}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+# server interceptor that adds a fixed delay to every unary call to
+# stand in for real backend work (database, payment provider, ...)
+class LatencyInterceptor(grpc.ServerInterceptor):
+    def __init__(self, latency):
+        self.latency = latency
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or handler.unary_unary is None or not self.latency:
+            return handler
+        behaviour = handler.unary_unary
+
+        def delayed(request, context):
+            time.sleep(self.latency)
+            return behaviour(request, context)
+
+        return grpc.unary_unary_rpc_method_handler(
+            delayed,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
+
+# start order, restaurant and delivery services in this process
+# and return their addresses plus a function that stops them all
+def start_backends(latency=0.0, max_workers=64):
+    servers = []
+    addrs = {}
+
+    def start(service, add_servicer, make_servicer):
+        port = free_port()
+        server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=max_workers),
+            # SerializedResponses last, as the services install it
+            interceptors=[LatencyInterceptor(latency), SerializedResponses()],
+        )
+        add_servicer(make_servicer(), server)
+        server.add_insecure_port(f'127.0.0.1:{port}')
+        server.start()
+        servers.append(server)
+        addrs[service] = f'127.0.0.1:{port}'
+
+    order = load_service_module('order_service')
+    start('order_service', order.order_service_pb2_grpc.add_OrderServiceServicer_to_server, order.OrderServicer)
+
+    restaurant = load_service_module('restaurant_service')
+    start('restaurant_service', restaurant.restaurant_service_pb2_grpc.add_RestaurantServiceServicer_to_server, restaurant.RestaurantServicer)
+
+    os.environ['ORDER_SERVICE_ADDR'] = addrs['order_service']
+    delivery = load_service_module('delivery_service')
+    start('delivery_service', delivery.delivery_service_pb2_grpc.add_DeliveryServiceServicer_to_server, delivery.DeliveryServicer)
+
+    def stop():
+        for server in servers:
+            server.stop(None)
+
+    return addrs, stop
+
+# run the gateway under uvicorn in a child process pointed at the given backends
+def start_gateway(addrs, app='gateway.gateway:app', extra_env=None):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        'ORDER_SERVICE_ADDR': addrs['order_service'],
+        'DELIVERY_SERVICE_ADDR': addrs['delivery_service'],
+        'RESTAURANT_SERVICE_ADDR': addrs['restaurant_service'],
+        'PYTHONPATH': project_root,
+    })
+    env.update(extra_env or {})
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', app, '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        cwd=project_root,
+        env=env,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f'{base_url}/', timeout=1)
+            break
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    else:
+        process.kill()
+        raise RuntimeError('gateway did not start')
+
+    def stop():
+        process.terminate()
+        process.wait()
+
+    return base_url, stop
+
+# fire requests from `concurrency` threads for `duration` seconds
+# and return (requests per second, sorted latencies in seconds)
+def run_load(make_request, concurrency, duration):
+    latencies = []
+    errors = []
+    stop_at = time.time() + duration
+
+    def worker():
+        session = requests.Session()
+        local = []
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            try:
+                make_request(session)
+            except Exception as e:
+                errors.append(e)
+            local.append(time.perf_counter() - start)
+        latencies.extend(local)
+
+    started = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    if errors:
+        raise RuntimeError(f"{len(errors)} requests failed, first error: {errors[0]}")
+    latencies.sort()
+    return len(latencies) / elapsed, latencies
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
@@ -0,0 +1,65 @@
+# CreateOrder with idempotency keys
+#
+# times the order service's CreateOrder handler placing orders without a
+# key, with a new key each time, and answering repeats of a key it has
+# seen, which is what a client retrying during an incident sends. then the
+# memory each remembered key takes with its response
+#
+#   python -m benchmarks.idempotency
+import gc
+import time
+import logging
+import argparse
+from benchmarks.harness import load_service_module
+from benchmarks.order_memory import resident_bytes, request_bytes
+from benchmarks.store_stress import Context
+
+def per_call(servicer, requests):
+    start = time.perf_counter()
+    for request in requests:
+        servicer.CreateOrder(request, Context())
+    return (time.perf_counter() - start) / len(requests)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=50000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    order_service = load_service_module('order_service')
+    pb2 = order_service.order_service_pb2
+    servicer = order_service.OrderServicer()
+
+    def requests(key=None):
+        batch = []
+        for index in range(args.calls):
+            request = pb2.CreateOrderRequest.FromString(request_bytes(pb2, index))
+            if key is not None:
+                request.idempotency_key = key(index)
+            batch.append(request)
+        return batch
+
+    without_key = per_call(servicer, requests())
+    keyed = requests(lambda index: f"key-{index:08d}")
+    first = per_call(servicer, keyed)
+    repeated = per_call(servicer, keyed)
+    placed = len(servicer.orders)
+
+    # a remembered key holds the serialized response sent for it
+    response = servicer.CreateOrder(keyed[0], Context())
+    index = order_service.DedupeIndex(capacity=args.calls)
+    gc.collect()
+    before = resident_bytes()
+    for number in range(args.calls):
+        claim, _ = index.claim(f"key-{number:08d}", number)
+        index.complete(claim, bytes(bytearray(response)))
+    gc.collect()
+    per_key = (resident_bytes() - before) / args.calls
+
+    print(f"CreateOrder handler, {args.calls} calls each")
+    print(f"{'no key (us)':>12} {'new key (us)':>13} {'repeated key (us)':>18} {'bytes per key':>14}")
+    print(f"{without_key * 1e6:>12.1f} {first * 1e6:>13.1f} {repeated * 1e6:>18.1f} {per_key:>14.0f}")
+    print(f"{placed} orders placed for {3 * args.calls} calls, {len(response)} byte responses")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# ListOrders against a scan of every order
+#
+# fills the order service with orders spread over 100 restaurants and times
+# one page (50 orders) of a restaurant's pending orders, first through the
+# secondary indexes and then by filtering and sorting every order, which is
+# what a dashboard had to do before. with the indexes the time per page
+# should stay flat as the number of orders grows
+#
+#   python -m benchmarks.list_orders
+#   python -m benchmarks.list_orders --orders 10000 100000 1000000
+import time
+import logging
+import argparse
+from benchmarks.harness import load_service_module
+from benchmarks.store_stress import Context
+
+def fill(order_service, servicer, orders):
+    pb2 = order_service.order_service_pb2
+    items = pb2.OrderResponse(items=[pb2.OrderItem(item_id='pizza1', name='Pizza', price=12.99, quantity=1)]).SerializeToString()
+    start = order_service.micros_from_iso('2026-01-01T00:00:00')
+    for index in range(orders):
+        order_id = f"order-{index:09d}"
+        created_at = start + index * 1000000
+        servicer.orders.put(order_id, order_service.OrderRecord(
+            order_id=order_id,
+            customer_id=f"customer-{index:09d}",
+            customer_name='Bench',
+            customer_email=f"customer{index % 5000}@example.com",
+            customer_phone='',
+            restaurant_id=f"restaurant{index % 100}",
+            items=items,
+            delivery_address='1 Main St',
+            special_instructions='',
+            # one order in seven still pending
+            status=pb2.ORDER_PENDING if index % 7 == 0 else pb2.ORDER_DELIVERED,
+            total_amount=12.99,
+            created_at=created_at,
+            updated_at=created_at,
+            version=1,
+        ))
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, nargs='+', default=[10000, 100000, 500000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    order_service = load_service_module('order_service')
+    pb2 = order_service.order_service_pb2
+
+    print("one page of 50 pending orders for one restaurant, newest first")
+    print(f"{'orders':>8} {'matching':>9} {'ListOrders (ms)':>16} {'scan (ms)':>10}")
+    for orders in args.orders:
+        servicer = order_service.OrderServicer()
+        fill(order_service, servicer, orders)
+        request = pb2.ListOrdersRequest(restaurant_id='restaurant0', status=pb2.ORDER_PENDING, page_size=50)
+
+        indexed, response = timed(lambda: servicer.ListOrders(request, Context()), args.repeat)
+
+        def scan():
+            matching = [
+                order for order in servicer.orders.snapshot().values()
+                if order.restaurant_id == 'restaurant0' and order.status == pb2.ORDER_PENDING
+            ]
+            matching.sort(key=order_service.order_sort_key, reverse=True)
+            return matching
+        scanned, matching = timed(scan, max(1, args.repeat // 10))
+
+        # whole orders come back already serialized
+        if isinstance(response, bytes):
+            response = pb2.ListOrdersResponse.FromString(response)
+        assert [order.order_id for order in response.orders] == [order.order_id for order in matching[:50]]
+        print(f"{orders:>8} {len(matching):>9} {indexed * 1000:>16.3f} {scanned * 1000:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# checking orders against the menus: the order service's pushed copy of
+# the menus against a GetRestaurant call to the restaurant service per order
+#
+# starts the restaurant service in process and times the order service's
+# CreateOrder handler placing orders without checks, checked against its
+# copy of the menus, and checked with a GetRestaurant call first (what
+# CreateOrder would do without the copy). then how long a menu change takes
+# to reach the copy
+#
+#   python -m benchmarks.menu_check
+import os
+import time
+import logging
+import argparse
+from concurrent import futures
+import grpc
+from benchmarks.harness import load_service_module, free_port
+from benchmarks.store_stress import Context
+
+RESTAURANT_ID = 'restaurant456'
+
+def create_request(pb2, index):
+    return pb2.CreateOrderRequest(
+        customer_name=f"Customer {index}",
+        customer_email=f"customer{index}@example.com",
+        restaurant_id=RESTAURANT_ID,
+        items=[
+            pb2.OrderItem(item_id='pizza1', name='Margherita Pizza', price=12.99, quantity=1),
+            pb2.OrderItem(item_id='pizza2', name='Pepperoni Pizza', price=14.99, quantity=2),
+        ],
+        delivery_address=f"{index % 500} Main Street, Cork",
+    )
+
+def per_call(place, requests):
+    start = time.perf_counter()
+    for request in requests:
+        context = Context()
+        place(request, context)
+        assert context.code is None, context.code
+    return (time.perf_counter() - start) / len(requests)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=5000)
+    parser.add_argument('--changes', type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    restaurant_service = load_service_module('restaurant_service')
+    restaurant_pb2 = restaurant_service.restaurant_service_pb2
+    restaurants = restaurant_service.RestaurantServicer()
+    port = free_port()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    restaurant_service.restaurant_service_pb2_grpc.add_RestaurantServiceServicer_to_server(restaurants, server)
+    server.add_insecure_port(f'127.0.0.1:{port}')
+    server.start()
+
+    os.environ['RESTAURANT_SERVICE_ADDR'] = f'127.0.0.1:{port}'
+    order_service = load_service_module('order_service')
+    pb2 = order_service.order_service_pb2
+    checked = order_service.OrderServicer()
+    checked.menus.ready.wait(10)
+    order_service.RESTAURANT_SERVICE_ADDR = None
+    unchecked = order_service.OrderServicer()
+
+    channel = grpc.insecure_channel(f'127.0.0.1:{port}')
+    stub = restaurant_service.restaurant_service_pb2_grpc.RestaurantServiceStub(channel)
+
+    def fetch_then_place(request, context):
+        stub.GetRestaurant(restaurant_pb2.GetRestaurantRequest(restaurant_id=request.restaurant_id), timeout=5)
+        return unchecked.CreateOrder(request, context)
+
+    try:
+        requests = [create_request(pb2, index) for index in range(args.calls)]
+        none = per_call(unchecked.CreateOrder, requests)
+        local = per_call(checked.CreateOrder, requests)
+        remote = per_call(fetch_then_place, requests)
+
+        # change pizza1's price and wait for the order service's copy to have it
+        delays = []
+        menu = list(restaurants.restaurants.get(RESTAURANT_ID)['menu_items'])
+        for change in range(args.changes):
+            items = [restaurant_pb2.MenuItem(**item) for item in menu]
+            items[0].price = 12.99 + (change + 1) / 100
+            start = time.perf_counter()
+            version = stub.UpdateMenu(restaurant_pb2.UpdateMenuRequest(restaurant_id=RESTAURANT_ID, menu_items=items)).version
+            while checked.menus.menus[RESTAURANT_ID].version < version:
+                time.sleep(0)
+            delays.append(time.perf_counter() - start)
+        delays.sort()
+
+        print(f"CreateOrder handler, {args.calls} calls each")
+        print(f"{'unchecked (us)':>15} {'menu copy (us)':>15} {'GetRestaurant per order (us)':>29}")
+        print(f"{none * 1e6:>15.1f} {local * 1e6:>15.1f} {remote * 1e6:>29.1f}")
+        print(f"menu change to order service copy, including the UpdateMenu call: "
+              f"median {delays[len(delays) // 2] * 1000:.2f} ms, max {delays[-1] * 1000:.2f} ms over {args.changes} changes")
+    finally:
+        channel.close()
+        server.stop(None)
+
+if __name__ == '__main__':
+    main()
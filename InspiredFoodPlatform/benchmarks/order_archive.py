@@ -0,0 +1,110 @@
+# order service memory over a day of orders, with and without the archiver
+#
+# each round places --per-round orders and delivers them, then (in the
+# "archived" run) moves them to the archive the way the archiver does once
+# they are old enough. prints the process's resident memory after every
+# round, each run in a fresh process. then times GetOrder for an order in
+# memory, an archived order and an unknown id
+#
+#   python -m benchmarks.order_archive
+#   python -m benchmarks.order_archive --rounds 20 --per-round 100000
+import os
+import gc
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from common.archive import SegmentArchive
+from common.ids import uuid7
+from benchmarks.harness import load_service_module
+from benchmarks.store_stress import Context
+from benchmarks.order_memory import resident_bytes, request_bytes
+
+def deliver(order_service, servicer, orders):
+    pb2 = order_service.order_service_pb2
+    now = order_service.now_micros()
+    order_ids = order_service.uuid7s(orders)
+    customer_ids = servicer._new_ids(orders)
+    for index in range(orders):
+        request = pb2.CreateOrderRequest.FromString(request_bytes(pb2, index))
+        servicer._store_order(request, order_ids[index], customer_ids[index], now)
+        order = servicer.orders.get(order_ids[index])
+        servicer.orders.put(order.order_id, order.replace(status=pb2.ORDER_DELIVERED, version=2))
+    return order_ids
+
+def get_rate(order_service, servicer, order_ids, calls):
+    pb2 = order_service.order_service_pb2
+    requests = [pb2.GetOrderRequest(order_id=random.choice(order_ids)) for _ in range(calls)]
+    start = time.perf_counter()
+    for request in requests:
+        servicer.GetOrder(request, Context())
+    return (time.perf_counter() - start) / calls
+
+# one run in this process, prints a JSON line per round and one with timings
+def run(archived, rounds, per_round):
+    logging.disable(logging.INFO)
+    order_service = load_service_module('order_service')
+    servicer = order_service.OrderServicer()
+    directory = tempfile.mkdtemp()
+    servicer.archive = SegmentArchive(directory)
+    try:
+        gc.collect()
+        start = resident_bytes()
+        order_ids = []
+        for _ in range(rounds):
+            order_ids = deliver(order_service, servicer, per_round)
+            if archived:
+                servicer.archive_orders(order_service.now_micros() + 1)
+            gc.collect()
+            print(json.dumps({'memory': resident_bytes() - start, 'in_memory': len(servicer.orders)}), flush=True)
+        if archived:
+            disk = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+            in_memory = deliver(order_service, servicer, 1000)
+            print(json.dumps({
+                'disk': disk / len(servicer.archive),
+                'memory_get': get_rate(order_service, servicer, in_memory, 20000),
+                'archived_get': get_rate(order_service, servicer, order_ids, 20000),
+                'missing_get': get_rate(order_service, servicer, [uuid7()], 20000),
+                'segments': len(servicer.archive.segments),
+            }), flush=True)
+    finally:
+        servicer.archive.close()
+        shutil.rmtree(directory)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--per-round', type=int, default=100000)
+    parser.add_argument('--archived', choices=('yes', 'no'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.archived:
+        run(args.archived == 'yes', args.rounds, args.per_round)
+        return
+
+    results = {}
+    for archived in ('no', 'yes'):
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.order_archive', '--rounds', str(args.rounds),
+             '--per-round', str(args.per_round), '--archived', archived],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        results[archived] = [json.loads(line) for line in output.splitlines()]
+
+    print(f"{args.per_round} orders placed and delivered per round, resident memory growth")
+    print(f"{'orders':>9} {'kept in memory (MiB)':>21} {'archived (MiB)':>15}")
+    for round_number in range(args.rounds):
+        kept, archived = results['no'][round_number], results['yes'][round_number]
+        print(f"{(round_number + 1) * args.per_round:>9} {kept['memory'] / 2**20:>21.0f} {archived['memory'] / 2**20:>15.0f}")
+    timings = results['yes'][-1]
+    print(f"archive: {timings['disk']:.0f} bytes per order on disk in {timings['segments']} segments")
+    print(f"GetOrder: in memory {timings['memory_get'] * 1e6:.1f} us, archived {timings['archived_get'] * 1e6:.1f} us, "
+          f"unknown id {timings['missing_get'] * 1e6:.1f} us")
+
+if __name__ == '__main__':
+    main()
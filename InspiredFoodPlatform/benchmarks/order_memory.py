@@ -0,0 +1,112 @@
+# memory per stored order, compact OrderRecord against the old dict layout
+#
+# the old layout is what the order service kept before: a dict per order
+# with the request's live protobuf OrderItem objects and ISO timestamp
+# strings. each layout is filled in a fresh process with --orders orders of
+# three items each, parsed from bytes the way gRPC hands them over, and the
+# growth of the process's resident memory is divided by the number of orders.
+# the last column adds the secondary indexes ListOrders uses
+#
+#   python -m benchmarks.order_memory
+#   python -m benchmarks.order_memory --orders 100000
+import os
+import gc
+import sys
+import logging
+import argparse
+import subprocess
+from datetime import datetime
+from common.store import StripedStore
+from benchmarks.harness import load_service_module
+
+LAYOUTS = ('dict', 'compact', 'indexed')
+
+def resident_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def request_bytes(pb2, index):
+    return pb2.CreateOrderRequest(
+        customer_name=f"Customer {index}",
+        customer_email=f"customer{index}@example.com",
+        customer_phone=f"+353 87 {index:07d}",
+        restaurant_id=f"restaurant{index % 100}",
+        items=[
+            pb2.OrderItem(item_id='pizza1', name='Margherita Pizza', price=12.99, quantity=1, customizations=['extra cheese']),
+            pb2.OrderItem(item_id='side2', name='Garlic Bread', price=4.50, quantity=2),
+            pb2.OrderItem(item_id='drink3', name='Cola', price=2.00, quantity=2),
+        ],
+        delivery_address=f"{index % 500} Main Street, Cork",
+    ).SerializeToString()
+
+# how _store_order kept an order before the compact records
+def dict_order(pb2, request, order_id, customer_id):
+    now = datetime.now().isoformat()
+    return {
+        'order_id': order_id,
+        'customer_id': customer_id,
+        'customer_name': request.customer_name,
+        'customer_email': request.customer_email,
+        'customer_phone': request.customer_phone,
+        'restaurant_id': request.restaurant_id,
+        'items': list(request.items),
+        'delivery_address': request.delivery_address,
+        'special_instructions': request.special_instructions or '',
+        'status': pb2.ORDER_PENDING,
+        'total_amount': sum(item.price * item.quantity for item in request.items),
+        'created_at': now,
+        'updated_at': now,
+        'version': 1,
+    }
+
+# fills one layout in this process, prints bytes per order
+def measure(layout, orders):
+    logging.disable(logging.INFO)
+    order_service = load_service_module('order_service')
+    pb2 = order_service.order_service_pb2
+    servicer = order_service.OrderServicer()
+    if layout != 'indexed':
+        servicer.orders = StripedStore()
+    # the ids are made up front, they take the same space in both layouts
+    ids = [(f"{index:08d}-0000-4000-8000-000000000000", f"{index:08d}-0000-4000-8000-000000000001") for index in range(orders)]
+    gc.collect()
+    before = resident_bytes()
+
+    for index in range(orders):
+        request = pb2.CreateOrderRequest.FromString(request_bytes(pb2, index))
+        order_id, customer_id = ids[index]
+        if layout == 'dict':
+            servicer.orders.put(order_id, dict_order(pb2, request, order_id, customer_id))
+        else:
+            servicer._store_order(request, order_id, customer_id, order_service.now_micros())
+
+    gc.collect()
+    print((resident_bytes() - before) / orders)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--layout', choices=LAYOUTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.layout:
+        measure(args.layout, args.orders)
+        return
+
+    per_order = {}
+    for layout in LAYOUTS:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.order_memory', '--orders', str(args.orders), '--layout', layout],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        per_order[layout] = float(output)
+
+    print(f"{args.orders} orders, 3 items each, resident memory per order")
+    print(f"{'dict (bytes)':>13} {'compact (bytes)':>16} {'saved':>6} {'compact + indexes (bytes)':>26}")
+    print(f"{per_order['dict']:>13.0f} {per_order['compact']:>16.0f} "
+          f"{1 - per_order['compact'] / per_order['dict']:>6.0%} {per_order['indexed']:>26.0f}")
+    print(f"total for {args.orders} orders: {per_order['dict'] * args.orders / 2**20:.0f} MiB -> "
+          f"{per_order['compact'] * args.orders / 2**20:.0f} MiB")
+
+if __name__ == '__main__':
+    main()
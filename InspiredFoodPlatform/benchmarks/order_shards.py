@@ -0,0 +1,125 @@
+# order service throughput with 1, 2, 4 and 8 shards
+#
+# starts order_service.py with ORDER_SHARDS set, then --clients client
+# processes, each with --threads threads, place an order and read it back
+# over and over for --duration seconds, routing every call to its shard
+# the way the gateway and the delivery service do (common/sharding.py).
+# the clients are processes too, so they aren't held to one core either.
+# the shards can't go faster than there are cores to run them on
+#
+#   python -m benchmarks.order_shards
+#   python -m benchmarks.order_shards --shards 1 2 4 8 --clients 8 --duration 10
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import grpc
+from benchmarks.harness import project_root, load_service_module, percentile
+from benchmarks.order_memory import request_bytes
+from common.balancer import ReplicaPool, PooledStub
+from common.sharding import ShardedStub
+
+# `count` free ports in a row, for a shard each
+def free_ports(count):
+    for base in range(42000, 60000, 100):
+        try:
+            for port in range(base, base + count):
+                with socket.socket() as sock:
+                    sock.bind(('127.0.0.1', port))
+            return base
+        except OSError:
+            continue
+    raise RuntimeError('no free ports')
+
+def start_order_service(shards):
+    base = free_ports(shards)
+    env = dict(os.environ, ORDER_SHARDS=str(shards), PORT=str(base))
+    for name in ('ORDER_DATA_DIR', 'ORDER_ARCHIVE_DIR', 'RESTAURANT_SERVICE_ADDR'):
+        env.pop(name, None)
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(project_root, 'order_service', 'order_service.py')],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    addresses = [f'127.0.0.1:{base + shard}' for shard in range(shards)]
+    for address in addresses:
+        with grpc.insecure_channel(address) as channel:
+            grpc.channel_ready_future(channel).result(timeout=30)
+    return addresses, process
+
+# one client process, prints a JSON line with its call count and latencies
+def run_client(addresses, threads, duration):
+    order_service = load_service_module('order_service')
+    pb2 = order_service.order_service_pb2
+    stub = ShardedStub([
+        PooledStub(ReplicaPool([address], grpc.insecure_channel, order_service.order_service_pb2_grpc.OrderServiceStub))
+        for address in addresses
+    ])
+    requests = [pb2.CreateOrderRequest.FromString(request_bytes(pb2, index)) for index in range(100)]
+    latencies = []
+    stop_at = time.time() + duration
+
+    def worker(offset):
+        local = []
+        index = offset
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            order = stub.CreateOrder(requests[index % len(requests)], timeout=5)
+            stub.GetOrder(pb2.GetOrderRequest(order_id=order.order_id), timeout=5)
+            local.append(time.perf_counter() - start)
+            index += 1
+        latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(offset,)) for offset in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    print(json.dumps({'orders': len(latencies), 'latencies': latencies}))
+
+def run(shards, clients, threads, duration):
+    addresses, service = start_order_service(shards)
+    try:
+        processes = [
+            subprocess.Popen(
+                [sys.executable, '-m', 'benchmarks.order_shards', '--client', ';'.join(addresses),
+                 '--threads', str(threads), '--duration', str(duration)],
+                cwd=project_root, stdout=subprocess.PIPE, text=True,
+            )
+            for _ in range(clients)
+        ]
+        results = [json.loads(process.communicate()[0]) for process in processes]
+    finally:
+        service.terminate()
+        service.wait()
+    latencies = sorted(latency for result in results for latency in result['latencies'])
+    return sum(result['orders'] for result in results) / duration, latencies
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--clients', type=int, default=8, help='client processes')
+    parser.add_argument('--threads', type=int, default=4, help='threads per client process')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--client', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client:
+        run_client(args.client.split(';'), args.threads, args.duration)
+        return
+
+    print(f"CreateOrder then GetOrder, {args.clients} client processes x {args.threads} threads, "
+          f"{args.duration:.0f}s per run, {os.cpu_count()} cores")
+    print(f"{'shards':>6} {'orders/s':>9} {'speedup':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    baseline = None
+    for shards in args.shards:
+        rate, latencies = run(shards, args.clients, args.threads, args.duration)
+        baseline = baseline or rate
+        print(f"{shards:>6} {rate:>9.0f} {rate / baseline:>7.2f}x "
+              f"{percentile(latencies, 50) * 1000:>9.2f} {percentile(latencies, 99) * 1000:>9.2f}")
+
+if __name__ == '__main__':
+    main()
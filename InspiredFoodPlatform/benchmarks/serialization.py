@@ -0,0 +1,197 @@
+# proto -> JSON micro-benchmark for the gateway
+#
+# compares the serializers in gateway/serializers.py against the old route
+# code, which copied each message into a dict and let FastAPI run
+# jsonable_encoder and JSONResponse over it. also checks both give the same JSON
+#
+#   python -m benchmarks.serialization
+import os
+import sys
+import json
+import timeit
+import argparse
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+for service in ('order_service', 'restaurant_service', 'delivery_service'):
+    sys.path.insert(0, os.path.join(project_root, service))
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from order_service import order_service_pb2
+from restaurant_service import restaurant_service_pb2
+from delivery_service import delivery_service_pb2
+from gateway import serializers
+
+# the dict building the routes did before the serializer layer
+def old_order(response):
+    result_items = []
+    for item in response.items:
+        item_dict = {
+            "item_id": item.item_id,
+            "quantity": item.quantity,
+            "name": item.name,
+            "price": item.price
+        }
+        if item.customizations:
+            item_dict["customizations"] = list(item.customizations)
+        result_items.append(item_dict)
+    return {
+        "order_id": response.order_id,
+        "customer_name": response.customer_name,
+        "customer_email": response.customer_email,
+        "customer_phone": response.customer_phone,
+        "restaurant_id": response.restaurant_id,
+        "items": result_items,
+        "delivery_address": response.delivery_address,
+        "special_instructions": response.special_instructions,
+        "status": order_service_pb2.OrderStatus.Name(response.status),
+        "total_amount": response.total_amount,
+        "created_at": response.created_at,
+        "updated_at": response.updated_at,
+    }
+
+def old_restaurant(response):
+    menu_items = []
+    for item in response.menu_items:
+        menu_items.append({
+            "item_id": item.item_id,
+            "name": item.name,
+            "description": item.description,
+            "price": item.price,
+            "available": item.available
+        })
+    return {
+        "restaurant_id": response.restaurant_id,
+        "name": response.name,
+        "address": response.address,
+        "is_open": response.is_open,
+        "menu_items": menu_items
+    }
+
+def old_delivery(response):
+    result = {
+        "delivery_id": response.delivery_id,
+        "order_id": response.order_id,
+        "driver_id": response.driver_id,
+        "restaurant_address": response.restaurant_address,
+        "customer_address": response.customer_address,
+        "status": delivery_service_pb2.DeliveryStatus.Name(response.status),
+        "current_location": response.current_location,
+        "assigned_at": response.assigned_at,
+    }
+    if response.picked_up_at:
+        result["picked_up_at"] = response.picked_up_at
+    if response.delivered_at:
+        result["delivered_at"] = response.delivered_at
+    return result
+
+def old_payments(response):
+    payments = []
+    for payment in response.payments:
+        payments.append({
+            "payment_id": payment.payment_id,
+            "order_id": payment.order_id,
+            "amount": payment.amount,
+            "status": payment.status,
+            "timestamp": payment.timestamp
+        })
+    return payments
+
+# what FastAPI does with a returned dict
+def fastapi_render(content):
+    return JSONResponse(jsonable_encoder(content)).body
+
+def sample_order(items):
+    return order_service_pb2.OrderResponse(
+        order_id='0b9f4c0e-3f0e-4c55-9d0c-5f6a2b1e9a11',
+        customer_name='Sara Rahim',
+        customer_email='sara.rahim@mycit.ie',
+        customer_phone='R00-211-761',
+        restaurant_id='restaurant456',
+        items=[
+            order_service_pb2.OrderItem(
+                item_id=f'pizza{i}',
+                name=f'Eskimo Classic Pizza {i}',
+                price=12.99 + i,
+                quantity=1 + i % 3,
+                customizations=['Extra cheese', 'Well done'] if i % 2 else [],
+            )
+            for i in range(items)
+        ],
+        delivery_address='Rossa Ave, Bishopstown, Cork, T12 P928',
+        special_instructions='Please leave the food outside.',
+        status=order_service_pb2.ORDER_CONFIRMED,
+        total_amount=123.45,
+        created_at='2025-03-01T12:00:00.000000',
+        updated_at='2025-03-01T12:05:00.000000',
+    )
+
+def sample_restaurant(items):
+    return restaurant_service_pb2.RestaurantResponse(
+        restaurant_id='restaurant456',
+        name='Eskimo Pizza Bandon',
+        address='1st Patricks quay, Gully, Bandon, Co. Cork, P72 TN93',
+        is_open=True,
+        menu_items=[
+            restaurant_service_pb2.MenuItem(
+                item_id=f'pizza{i}',
+                name=f'Mighty Meaty Pizza {i}',
+                description='Pepperoni, ham, crispy bacon and tender chicken. ' * 3,
+                price=14.99 + i,
+                available=bool(i % 5),
+            )
+            for i in range(items)
+        ],
+    )
+
+def sample_delivery():
+    return delivery_service_pb2.DeliveryResponse(
+        delivery_id='7d5e1c8a-0a4b-4c1e-8f6e-2a9d3b7c6e55',
+        order_id='0b9f4c0e-3f0e-4c55-9d0c-5f6a2b1e9a11',
+        driver_id='driver789',
+        restaurant_address='123 Restaurant St',
+        customer_address='Rossa Ave, Bishopstown, Cork, T12 P928',
+        status=delivery_service_pb2.DELIVERY_PICKED_UP,
+        current_location='At restaurant',
+        assigned_at='2025-03-01T12:10:00.000000',
+        picked_up_at='2025-03-01T12:20:00.000000',
+    )
+
+def sample_payments(count):
+    return restaurant_service_pb2.GetRestaurantPaymentsResponse(payments=[
+        restaurant_service_pb2.Payment(
+            payment_id=f'payment_{i}_restaurant456',
+            order_id=f'order_{i}_restaurant456',
+            amount=round(14.99 + i * 5.0, 2),
+            status='completed',
+            timestamp='2025-03-01T12:00:00.000000',
+        )
+        for i in range(count)
+    ])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [
+        ('order, 3 items', sample_order(3), old_order, serializers.order_json),
+        ('order, 100 items', sample_order(100), old_order, serializers.order_json),
+        ('menu, 2 items', sample_restaurant(2), old_restaurant, serializers.restaurant_json),
+        ('menu, 200 items', sample_restaurant(200), old_restaurant, serializers.restaurant_json),
+        ('delivery', sample_delivery(), old_delivery, serializers.delivery_json),
+        ('payments, 50', sample_payments(50), old_payments, serializers.payments_json),
+    ]
+
+    print(f"{'message':<20} {'old us':>10} {'new us':>10} {'speedup':>8}")
+    for name, message, old, new in cases:
+        old_body = fastapi_render(old(message))
+        new_body = new(message)
+        assert json.loads(old_body) == json.loads(new_body), name
+
+        number = max(1, 20000 // (len(new_body) // 100 + 1))
+        old_time = min(timeit.repeat(lambda: fastapi_render(old(message)), number=number, repeat=args.repeat)) / number
+        new_time = min(timeit.repeat(lambda: new(message), number=number, repeat=args.repeat)) / number
+        print(f"{name:<20} {old_time * 1e6:>10.1f} {new_time * 1e6:>10.1f} {old_time / new_time:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+# stress test and throughput of common/store.py
+#
+# first checks that nothing is lost when many threads write at once:
+# counters bumped through update() and through compare_and_set() retry
+# loops, concurrent UpdateOrderStatus calls, and racing restaurant responses
+# to one order (exactly one may win). the same counter test on a plain dict
+# shows what goes wrong without the store. then measures operations per
+# second from 1 to 16 threads, striped against a single lock
+#
+#   python -m benchmarks.store_stress
+import sys
+import time
+import random
+import logging
+import argparse
+import threading
+import grpc
+from datetime import datetime
+from common.store import StripedStore
+from benchmarks.harness import load_service_module
+
+class Context:
+    def __init__(self):
+        self.code = None
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        pass
+
+    def time_remaining(self):
+        return None
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def check(name, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}: {detail}")
+    return ok
+
+def counters(threads, increments, keys):
+    results = []
+
+    store = StripedStore()
+    for key in range(keys):
+        store.put(key, {'count': 0})
+
+    def bump(index):
+        for i in range(increments):
+            store.update(i % keys, lambda record: {'count': record['count'] + 1})
+    run_threads(threads, bump)
+    total = sum(store.get(key)['count'] for key in range(keys))
+    results.append(check("update()", total == threads * increments, f"{total} of {threads * increments} increments"))
+
+    store = StripedStore()
+    for key in range(keys):
+        store.put(key, {'count': 0})
+    retries = [0] * threads
+
+    def bump_cas(index):
+        for i in range(increments):
+            while True:
+                record = store.get(i % keys)
+                if store.compare_and_set(i % keys, record, {'count': record['count'] + 1}):
+                    break
+                retries[index] += 1
+    run_threads(threads, bump_cas)
+    total = sum(store.get(key)['count'] for key in range(keys))
+    results.append(check("compare_and_set()", total == threads * increments,
+                         f"{total} of {threads * increments} increments, {sum(retries)} retries"))
+
+    # what the servicers did before: read, do some work (a timestamp), write back, no lock
+    plain = {key: {'count': 0} for key in range(keys)}
+
+    def bump_plain(index):
+        for i in range(increments):
+            record = plain[i % keys]
+            count = record['count']
+            record['updated_at'] = datetime.now().isoformat()
+            record['count'] = count + 1
+    run_threads(threads, bump_plain)
+    total = sum(record['count'] for record in plain.values())
+    print(f"     plain dict for comparison: {total} of {threads * increments} increments, {threads * increments - total} lost")
+    return all(results)
+
+def servicers(threads):
+    order_service = load_service_module('order_service')
+    pb2 = order_service.order_service_pb2
+    servicer = order_service.OrderServicer()
+    results = []
+
+    def new_order():
+        request = pb2.CreateOrderRequest(
+            customer_name='Stress', customer_email='stress@example.com', restaurant_id='restaurant456',
+            delivery_address='1 Main St', items=[pb2.OrderItem(item_id='pizza1', name='Pizza', price=12.99, quantity=1)],
+        )
+        return servicer.CreateOrder(request, Context()).order_id
+
+    # threads racing to walk orders through their statuses with expected
+    # versions: every step is taken exactly once, whoever read a stale
+    # version gets ABORTED, and nothing moves a delivered order back
+    chain = [pb2.ORDER_PENDING, pb2.ORDER_CONFIRMED, pb2.ORDER_PREPARING, pb2.ORDER_READY, pb2.ORDER_OUT_FOR_DELIVERY, pb2.ORDER_DELIVERED]
+    rounds = 100
+    wrong = 0
+    for _ in range(rounds):
+        order_id = new_order()
+        steps = []
+
+        def walk(index):
+            for status in chain[1:]:
+                while True:
+                    order = servicer.orders.get(order_id)
+                    if chain.index(order.status) >= chain.index(status):
+                        break
+                    context = Context()
+                    servicer.UpdateOrderStatus(
+                        pb2.UpdateOrderStatusRequest(order_id=order_id, status=status, expected_version=order.version), context)
+                    if context.code is None:
+                        steps.append(status)
+                        break
+                    if context.code != grpc.StatusCode.ABORTED:
+                        steps.append(None)
+                        break
+        run_threads(threads, walk)
+        order = servicer.orders.get(order_id)
+        if sorted(steps) != sorted(chain[1:]) or order.version != len(chain) or order.status != pb2.ORDER_DELIVERED:
+            wrong += 1
+    results.append(check("UpdateOrderStatus", wrong == 0, f"{rounds} orders, {wrong} with a step lost, repeated or refused"))
+
+    context = Context()
+    servicer.UpdateOrderStatus(pb2.UpdateOrderStatusRequest(order_id=order_id, status=pb2.ORDER_PREPARING), context)
+    refused = context.code == grpc.StatusCode.FAILED_PRECONDITION
+    results.append(check("UpdateOrderStatus after delivery", refused, f"{context.code}, expected FAILED_PRECONDITION"))
+
+    # many restaurant responses racing for the same pending order
+    rounds = 200
+    double_wins = 0
+    for _ in range(rounds):
+        order_id = new_order()
+        winners = []
+
+        def respond(index):
+            context = Context()
+            servicer.RestaurantOrderResponse(
+                pb2.RestaurantOrderResponseRequest(restaurant_id='restaurant456', order_id=order_id, accepted=index % 2 == 0),
+                context,
+            )
+            if context.code is None:
+                winners.append(index)
+        run_threads(threads, respond)
+        if len(winners) != 1 or servicer.orders.get(order_id).version != 2:
+            double_wins += 1
+    results.append(check("RestaurantOrderResponse", double_wins == 0, f"{rounds} orders, {double_wins} with more or less than one winner"))
+    return all(results)
+
+def throughput(stripes, threads, keys, duration, write_ratio):
+    store = StripedStore(stripes=stripes)
+    for key in range(keys):
+        store.put(key, {'count': 0, 'status': 1, 'version': 1})
+    done = [0] * threads
+    stop = time.perf_counter() + duration
+
+    def work(index):
+        rng = random.Random(index)
+        ops = 0
+        while time.perf_counter() < stop:
+            for _ in range(100):
+                key = rng.randrange(keys)
+                if rng.random() < write_ratio:
+                    store.update(key, lambda record: {'count': record['count'] + 1, 'version': record['version'] + 1})
+                else:
+                    store.get(key)
+            ops += 100
+        done[index] = ops
+    run_threads(threads, work)
+    return sum(done) / duration
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--keys', type=int, default=10000)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    # switch threads as often as possible to shake out races
+    sys.setswitchinterval(1e-6)
+    ok = counters(threads=16, increments=20000, keys=8)
+    ok = servicers(threads=16) and ok
+    sys.setswitchinterval(0.005)
+
+    print()
+    print(f"{args.keys} records, {args.write_ratio:.0%} writes, {args.duration:.0f}s per run")
+    print(f"{'threads':>8} {'striped ops/s':>14} {'one lock ops/s':>15}")
+    for threads in args.threads:
+        striped = throughput(64, threads, args.keys, args.duration, args.write_ratio)
+        single = throughput(1, threads, args.keys, args.duration, args.write_ratio)
+        print(f"{threads:>8} {striped:>14.0f} {single:>15.0f}")
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# cost and recovery time of the order service's write-ahead log (common/wal.py)
+#
+# first measures CreateOrder calls per second and their latency from 1 to 16
+# threads with orders kept only in memory, logged with fsync, and logged
+# without fsync, so the price of durability and how much group commit wins
+# back under concurrency are side by side. then fills a log with --orders
+# orders, a snapshot of most of them plus a log tail of the rest, and times
+# how long a restart takes to rebuild them
+#
+#   python -m benchmarks.wal_recovery
+#   python -m benchmarks.wal_recovery --orders 1000000 --directory /var/tmp/wal
+import os
+import gc
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from common.store import StripedStore
+from common.wal import WriteAheadLog
+from benchmarks.harness import load_service_module
+from benchmarks.store_stress import Context, run_threads
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def create_orders(order_service, directory, fsync, threads, duration):
+    pb2 = order_service.order_service_pb2
+    order_service.ORDER_DATA_DIR = directory
+    os.environ['WAL_FSYNC'] = 'true' if fsync else 'false'
+    servicer = order_service.OrderServicer()
+    request = pb2.CreateOrderRequest(
+        customer_name='Bench', customer_email='bench@example.com', restaurant_id='restaurant456',
+        delivery_address='1 Main St', items=[pb2.OrderItem(item_id='pizza1', name='Pizza', price=12.99, quantity=1)],
+    )
+    latencies = [[] for _ in range(threads)]
+    stop = time.perf_counter() + duration
+
+    def work(index):
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            servicer.CreateOrder(request, Context())
+            latencies[index].append(time.perf_counter() - started)
+    run_threads(threads, work)
+
+    if servicer.orders._log is not None:
+        servicer.orders._log.close()
+    samples = [sample for thread in latencies for sample in thread]
+    return len(samples) / duration, percentile(samples, 0.5), percentile(samples, 0.99)
+
+def order_record(order_service, index, now):
+    pb2 = order_service.order_service_pb2
+    return order_service.OrderRecord(
+        order_id=f"order-{index:09d}",
+        customer_id=f"customer-{index:09d}",
+        customer_name='Bench',
+        customer_email='bench@example.com',
+        customer_phone='',
+        restaurant_id=f"restaurant{index % 100}",
+        items=pb2.OrderResponse(items=[pb2.OrderItem(item_id='pizza1', name='Pizza', price=12.99, quantity=1)]).SerializeToString(),
+        delivery_address='1 Main St',
+        special_instructions='',
+        status=pb2.ORDER_PENDING,
+        total_amount=12.99,
+        created_at=now,
+        updated_at=now,
+        version=1,
+    )
+
+# writes `orders` orders through a logged store, snapshotting after
+# `snapshot_fraction` of them, and returns the on-disk size
+def fill_log(order_service, directory, orders, snapshot_fraction):
+    log = WriteAheadLog(directory, fsync=False, snapshot_every=max(1, int(orders * snapshot_fraction)))
+    store = StripedStore(log=log)
+    store.load(log.recover())
+    log.start(store.snapshot)
+    now = order_service.now_micros()
+    for index in range(orders):
+        store.put(f"order-{index:09d}", order_record(order_service, index, now), wait=False)
+    store.sync()
+    # let the snapshot thread finish before measuring
+    while log.snapshotting or not log._numbers('snapshot'):
+        time.sleep(0.1)
+    log.close()
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--duration', type=float, default=2.0)
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--snapshot-fraction', type=float, default=0.9)
+    parser.add_argument('--directory', default=None, help="where to put the log, defaults to a temporary directory")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    order_service = load_service_module('order_service')
+    base = args.directory or tempfile.mkdtemp(prefix='wal-bench-')
+
+    print(f"CreateOrder, {args.duration:.0f}s per run")
+    print(f"{'threads':>8} {'mode':>10} {'orders/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for threads in args.threads:
+        for mode, directory, fsync in (('memory', None, False), ('wal', base, True), ('no fsync', base, False)):
+            if directory is not None:
+                shutil.rmtree(directory, ignore_errors=True)
+            rate, p50, p99 = create_orders(order_service, directory, fsync, threads, args.duration)
+            print(f"{threads:>8} {mode:>10} {rate:>10.0f} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}")
+
+    shutil.rmtree(base, ignore_errors=True)
+    size = fill_log(order_service, base, args.orders, args.snapshot_fraction)
+    gc.collect()
+
+    started = time.perf_counter()
+    log = WriteAheadLog(base)
+    records = log.recover()
+    elapsed = time.perf_counter() - started
+    print()
+    print(f"recovered {len(records)} orders ({log.since_snapshot} replayed from the log after the snapshot) "
+          f"from {size / 2**20:.0f} MiB in {elapsed:.2f}s, {len(records) / elapsed:.0f} orders/s")
+    shutil.rmtree(base, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# following an order's status: polling GET /orders/{id} against watching
+# GET /orders/{id}/watch
+#
+# starts the backends in process and the gateway under uvicorn, then
+# --clients clients follow one order while it is walked from PENDING to
+# DELIVERED, one status every --step seconds. pollers ask every --interval
+# seconds, watchers hold a server-sent events stream. counts the requests
+# the gateway got and the unary calls it made to the order service (the
+# watchers share one WatchOrder stream, not counted), and how long after
+# each change was sent the clients saw it
+#
+#   python -m benchmarks.watch_order
+#   python -m benchmarks.watch_order --clients 200 --interval 0.5
+import json
+import time
+import argparse
+import threading
+import requests
+from benchmarks.harness import start_backends, start_gateway
+
+STATUSES = (2, 4, 5, 6, 7) # CONFIRMED, PREPARING, READY, OUT_FOR_DELIVERY, DELIVERED
+
+ORDER = {
+    "customer_name": "Bench", "customer_email": "bench@example.com", "restaurant_id": "restaurant456",
+    "delivery_address": "1 Main St", "items": [{"item_id": "pizza1", "name": "Pizza", "price": 12.99, "quantity": 1}],
+}
+
+def order_service_calls(base_url):
+    backends = requests.get(f'{base_url}/metrics/summary').json()['backends']
+    return sum(entry['count'] for entry in backends if entry['service'] == 'order_service')
+
+def follow(base_url, order_id, mode, interval, seen):
+    if mode == 'watch':
+        with requests.get(f'{base_url}/orders/{order_id}/watch', stream=True, timeout=60) as response:
+            for line in response.iter_lines():
+                if line.startswith(b'data: '):
+                    seen.setdefault(json.loads(line[6:])['status'], time.perf_counter())
+        return 1
+    session = requests.Session()
+    polls = 0
+    while True:
+        status = session.get(f'{base_url}/orders/{order_id}').json()['status']
+        polls += 1
+        seen.setdefault(status, time.perf_counter())
+        if status == 'ORDER_DELIVERED':
+            return polls
+        time.sleep(interval)
+
+def run(base_url, mode, clients, interval, step):
+    order_id = requests.post(f'{base_url}/orders', json=ORDER).json()['order_id']
+    calls_before = order_service_calls(base_url)
+    seen = [{} for _ in range(clients)]
+    requests_made = [0] * clients
+
+    def client(index):
+        requests_made[index] = follow(base_url, order_id, mode, interval, seen[index])
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+
+    changed = {}
+    for status in STATUSES:
+        time.sleep(step)
+        at = time.perf_counter()
+        response = requests.put(f'{base_url}/orders/{order_id}/status', json={"status": status})
+        changed[response.json()['status']] = at
+    for thread in threads:
+        thread.join()
+
+    # minus the status updates themselves
+    calls = order_service_calls(base_url) - calls_before - len(STATUSES)
+    delays = [client_seen[status] - at for client_seen in seen for status, at in changed.items()]
+    return sum(requests_made), calls, sum(delays) / len(delays)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between polls')
+    parser.add_argument('--step', type=float, default=2.0, help='seconds between status changes')
+    args = parser.parse_args()
+
+    addrs, stop_backends = start_backends(max_workers=32)
+    base_url, stop_gateway = start_gateway(addrs)
+    try:
+        print(f"{args.clients} clients following an order through {len(STATUSES)} changes, "
+              f"{args.step:.0f}s apart, polls every {args.interval:.1f}s")
+        print(f"{'mode':>6} {'gateway requests':>17} {'order service calls':>20} {'mean delay (ms)':>16}")
+        for mode in ('poll', 'watch'):
+            gateway_requests, calls, delay = run(base_url, mode, args.clients, args.interval, args.step)
+            print(f"{mode:>6} {gateway_requests:>17} {calls:>20} {delay * 1000:>16.1f}")
+    finally:
+        stop_gateway()
+        stop_backends()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import os
+import mmap
+import heapq
+import pickle
+import struct
+import logging
+import threading
+from common.wal import fsync_directory
+
+# a segment file is the pickled records one after another, then their keys,
+# then a table with one entry per record in key order, then a footer
+ENTRY = struct.Struct('<QIQI') # key offset, key length, record offset, record length
+FOOTER = struct.Struct('<QQ8s') # table offset, record count, magic
+MAGIC = b'ARCHIVE1'
+
+# one read-only segment, mapped into memory. a lookup binary searches the
+# table, so nothing per record is kept in memory
+class _Segment:
+    __slots__ = ('path', 'data', 'table', 'count', 'first', 'last')
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < FOOTER.size:
+            raise ValueError(f"{path} is too short to be an archive segment")
+        self.table, self.count, magic = FOOTER.unpack_from(self.data, len(self.data) - FOOTER.size)
+        if magic != MAGIC or self.count == 0:
+            raise ValueError(f"{path} is not an archive segment")
+        self.first = self._key(0)
+        self.last = self._key(self.count - 1)
+
+    def _entry(self, i):
+        return ENTRY.unpack_from(self.data, self.table + i * ENTRY.size)
+
+    def _key(self, i):
+        key_offset, key_length, _, _ = self._entry(i)
+        return self.data[key_offset:key_offset + key_length]
+
+    # (key, pickled record) pairs in key order, for merging
+    def items(self):
+        for i in range(self.count):
+            key_offset, key_length, record_offset, record_length = self._entry(i)
+            yield self.data[key_offset:key_offset + key_length], self.data[record_offset:record_offset + record_length]
+
+    # the record under `key` (encoded), or None
+    def get(self, key):
+        if key < self.first or key > self.last:
+            return None
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            key_offset, key_length, record_offset, record_length = self._entry(middle)
+            found = self.data[key_offset:key_offset + key_length]
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                return pickle.loads(self.data[record_offset:record_offset + record_length])
+        return None
+
+    def close(self):
+        self.data.close()
+
+# writes (key, pickled record) pairs, in key order, to a segment file at
+# `path` and returns once it is on disk
+def _write_segment(path, items):
+    with open(path, 'wb') as f:
+        spans = []
+        keys = []
+        offset = 0
+        for key, payload in items:
+            f.write(payload)
+            spans.append((offset, len(payload)))
+            keys.append(key)
+            offset += len(payload)
+        entries = []
+        for key, (record_offset, record_length) in zip(keys, spans):
+            f.write(key)
+            entries.append(ENTRY.pack(offset, len(key), record_offset, record_length))
+            offset += len(key)
+        f.write(b''.join(entries))
+        f.write(FOOTER.pack(offset, len(keys), MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+
+# records moved out of an in memory store for good, kept in read-only
+# segment files and looked up by key without loading them. every write()
+# makes a new segment; a lookup tries the newest segment first, and only
+# the segments whose first and last keys bracket the key. with keys that
+# sort by when they were made (e.g. common/ids.py) each segment covers a
+# narrow range of keys, so few are tried.
+#
+# each segment keeps a mapping and a file descriptor open, so after a write
+# the newest segments are merged into one while they hold at least as many
+# records as the segment before them. segments get bigger the older they
+# are, there are about log2(records) of them, and a record is copied about
+# as many times over its life
+class SegmentArchive:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # replaced, never changed in place, so lookups take no lock
+        self.segments = ()
+        self.lock = threading.Lock() # one write at a time
+        self.next_number = 1
+
+        segments = []
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name.endswith('.tmp'):
+                # a write cut short, its records were never removed from the store
+                os.remove(path)
+            elif name.startswith('segment-') and name.endswith('.arc'):
+                try:
+                    segments.append(_Segment(path))
+                except ValueError as e:
+                    logging.warning(f"Skipping {path}: {e}")
+                self.next_number = max(self.next_number, int(name[len('segment-'):-len('.arc')]) + 1)
+        self.segments = tuple(segments)
+        logging.info(f"Opened {len(self)} archived records in {len(segments)} segments in {directory}")
+
+    def __len__(self):
+        return sum(segment.count for segment in self.segments)
+
+    # the record archived under `key`, or None
+    def get(self, key):
+        encoded = key.encode()
+        for segment in reversed(self.segments):
+            record = segment.get(encoded)
+            if record is not None:
+                return record
+        return None
+
+    # writes `records` ((key, record) pairs) to a new segment and returns
+    # once it is on disk and get() finds them
+    def write(self, records):
+        if not records:
+            return
+        records = sorted(records, key=lambda pair: pair[0])
+        with self.lock:
+            path = os.path.join(self.directory, f"segment-{self.next_number:010d}.arc")
+            self.next_number += 1
+            _write_segment(path + '.tmp', (
+                (key.encode(), pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)) for key, record in records
+            ))
+            os.replace(path + '.tmp', path)
+            fsync_directory(self.directory)
+            self.segments = self.segments + (_Segment(path),)
+            logging.info(f"Archived {len(records)} records to {path}")
+            self._merge()
+
+    # merges the newest segments while they hold at least as many records
+    # as the one before them. the merged segment replaces the newest of
+    # them, so it keeps their place in the lookup order, then the others are
+    # removed. a crash in between leaves records in two segments, and the
+    # newer copy is found first as before. called with the lock held
+    def _merge(self):
+        segments = self.segments
+        start = len(segments) - 1
+        records = segments[start].count if segments else 0
+        while start > 0 and segments[start - 1].count <= records:
+            start -= 1
+            records += segments[start].count
+        if len(segments) - start < 2:
+            return
+        merging = segments[start:]
+
+        # a key in more than one segment keeps the newest segment's record
+        def keyed(age, segment):
+            for key, payload in segment.items():
+                yield key, age, payload
+
+        def newest_first():
+            previous = None
+            for key, _, payload in heapq.merge(*(keyed(-age, segment) for age, segment in enumerate(merging))):
+                if key != previous:
+                    yield key, payload
+                    previous = key
+
+        path = merging[-1].path
+        _write_segment(path + '.tmp', newest_first())
+        os.replace(path + '.tmp', path)
+        fsync_directory(self.directory)
+        merged = _Segment(path)
+        self.segments = segments[:start] + (merged,)
+        for segment in merging[:-1]:
+            os.remove(segment.path)
+        fsync_directory(self.directory)
+        # lookups already under way may still read the old segments, their
+        # mappings are closed once nothing refers to them
+        logging.info(f"Merged {len(merging)} archive segments into {path}, {merged.count} records")
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
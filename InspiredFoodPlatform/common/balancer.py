@@ -0,0 +1,181 @@
+import time
+import logging
+import threading
+import grpc
+from common.breaker import BREAKER_FAILURE_CODES
+
+# status codes that mean the replica itself is in trouble, as opposed to
+# the request being bad (NOT_FOUND, INVALID_ARGUMENT, ...)
+REPLICA_FAILURE_CODES = {grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED}
+
+# turns "host1:50051, host2:50051" into ["host1:50051", "host2:50051"]
+def parse_addresses(value):
+    return [address.strip() for address in value.split(',') if address.strip()]
+
+class Replica:
+    def __init__(self, address, channel, stub):
+        self.address = address
+        self.channel = channel
+        self.stub = stub
+        self.outstanding = 0 # calls currently in flight
+        self.failures = 0 # consecutive failures
+        self.ejected_until = 0.0
+
+# a channel and stub per replica of one backend service. a replica that
+# fails `eject_after` times in a row is left out for `eject_for` seconds,
+# and if every replica is ejected the one due back first is used anyway.
+# an optional circuit breaker guards the service as a whole.
+#
+# by default every call goes to the first healthy replica in the list and
+# the others are standbys: the services keep their records in memory, so a
+# call sent to another replica than the one that made the record finds
+# nothing (spread orders over processes with shards, routed by order id,
+# see common/sharding.py). only replicas that serve the same data, e.g. a
+# stateless backend, should be given `spread`, which sends each call to the
+# healthy replica with the fewest requests in flight
+class ReplicaPool:
+    def __init__(self, addresses, channel_factory, stub_class, eject_after=3, eject_for=10.0, breaker=None, clock=time.monotonic, spread=False):
+        if not addresses:
+            raise ValueError("At least one replica address is required")
+        self.replicas = []
+        for address in addresses:
+            channel = channel_factory(address)
+            self.replicas.append(Replica(address, channel, stub_class(channel)))
+        self.eject_after = eject_after
+        self.eject_for = eject_for
+        self.breaker = breaker
+        self.clock = clock
+        self.spread = spread
+        self.lock = threading.Lock() # the delivery service calls in from many worker threads
+        self.next_index = 0
+
+    # raises CircuitOpenError when the breaker is open
+    def pick(self):
+        if self.breaker is not None:
+            self.breaker.before_call()
+
+        with self.lock:
+            now = self.clock()
+            candidates = [replica for replica in self.replicas if replica.ejected_until <= now]
+            if not candidates:
+                candidates = [min(self.replicas, key=lambda replica: replica.ejected_until)]
+
+            if not self.spread:
+                replica = candidates[0]
+                replica.outstanding += 1
+                return replica
+
+            # rotate the starting point so ties are shared out round robin
+            self.next_index = (self.next_index + 1) % len(candidates)
+            rotated = candidates[self.next_index:] + candidates[:self.next_index]
+            replica = min(rotated, key=lambda replica: replica.outstanding)
+            replica.outstanding += 1
+            return replica
+
+    # hand back a replica whose call says nothing about the backend, e.g.
+    # one that ran out of a deadline the caller shortened. neither the
+    # breaker nor the replica's failure count hear of it
+    def discard(self, replica):
+        if self.breaker is not None:
+            self.breaker.cancel()
+        with self.lock:
+            replica.outstanding -= 1
+
+    # tell the breaker how a call went before its replica is handed back. a
+    # stream does this once its first message is in, so it doesn't hold a
+    # half open trial slot for as long as it stays open
+    def record(self, code=None, duration=0.0):
+        if self.breaker is not None:
+            self.breaker.record(code in BREAKER_FAILURE_CODES, duration)
+
+    # hand a replica back with the status code of the call (None on success)
+    # and how long it took. `recorded` if the breaker has already heard how
+    # the call went from record()
+    def release(self, replica, code=None, duration=0.0, recorded=False):
+        if not recorded:
+            self.record(code, duration)
+
+        with self.lock:
+            replica.outstanding -= 1
+            if code not in REPLICA_FAILURE_CODES:
+                replica.failures = 0
+                return
+
+            replica.failures += 1
+            if replica.failures >= self.eject_after:
+                replica.failures = 0
+                replica.ejected_until = self.clock() + self.eject_for
+                logging.warning(f"Ejected replica {replica.address} for {self.eject_for}s after {self.eject_after} failures")
+
+    def stats(self):
+        now = self.clock()
+        with self.lock:
+            return [
+                {
+                    "address": replica.address,
+                    "outstanding": replica.outstanding,
+                    "ejected": replica.ejected_until > now,
+                }
+                for replica in self.replicas
+            ]
+
+# stand in for a generated stub that sends each call through the pool.
+# use PooledStub with grpc channels and AsyncPooledStub with grpc.aio ones.
+# `own_deadline()`, if given, says whether the deadline of the call being
+# made is the caller's default. when it isn't, a DEADLINE_EXCEEDED is the
+# caller's doing and isn't held against the backend
+class PooledStub:
+    def __init__(self, pool, own_deadline=None):
+        self._pool = pool
+        self._own_deadline = own_deadline
+
+    def __getattr__(self, method):
+        pool = self._pool
+        own_deadline = self._own_deadline
+
+        def call(*args, **kwargs):
+            replica = pool.pick()
+            start = time.monotonic()
+            try:
+                response = getattr(replica.stub, method)(*args, **kwargs)
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED and own_deadline is not None and not own_deadline():
+                    pool.discard(replica)
+                else:
+                    pool.release(replica, e.code(), time.monotonic() - start)
+                raise
+            except BaseException:
+                pool.release(replica, None, time.monotonic() - start)
+                raise
+            pool.release(replica, None, time.monotonic() - start)
+            return response
+
+        return call
+
+class AsyncPooledStub:
+    def __init__(self, pool, own_deadline=None):
+        self._pool = pool
+        self._own_deadline = own_deadline
+
+    def __getattr__(self, method):
+        pool = self._pool
+        own_deadline = self._own_deadline
+
+        async def call(*args, **kwargs):
+            replica = pool.pick()
+            start = time.monotonic()
+            try:
+                response = await getattr(replica.stub, method)(*args, **kwargs)
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED and own_deadline is not None and not own_deadline():
+                    pool.discard(replica)
+                else:
+                    pool.release(replica, e.code(), time.monotonic() - start)
+                raise
+            except BaseException:
+                pool.release(replica, None, time.monotonic() - start)
+                raise
+            pool.release(replica, None, time.monotonic() - start)
+            return response
+
+        return call
@@ -0,0 +1,137 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+import grpc
+
+# status codes that count against a backend. NOT_FOUND, INVALID_ARGUMENT and
+# the like are the caller's problem and leave the breaker alone
+BREAKER_FAILURE_CODES = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.INTERNAL,
+    grpc.StatusCode.UNKNOWN,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable, circuit breaker is open")
+        self.name = name
+        self.retry_after = retry_after
+
+# per backend circuit breaker over the last `window` calls. it opens when at
+# least `min_calls` have been seen and either the failure rate or the rate of
+# calls slower than `slow_call_seconds` reaches its threshold. while open every
+# call fails fast; after `open_for` seconds up to `half_open_calls` trial calls
+# go through and decide whether it closes again or stays open
+class CircuitBreaker:
+    def __init__(self, name, window=20, min_calls=10, failure_rate=0.5, slow_call_seconds=1.0,
+                 slow_call_rate=0.5, open_for=10.0, half_open_calls=3, clock=time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_for = open_for
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.calls = deque(maxlen=window) # (failed, slow) per call
+        self.failures = 0
+        self.slow = 0
+        self.opened_at = 0.0
+        self.trials = 0
+        self.trial_successes = 0
+        self.rejected = 0
+
+    # raises CircuitOpenError instead of letting the call through
+    def before_call(self):
+        with self.lock:
+            if self.state == OPEN:
+                waited = self.clock() - self.opened_at
+                if waited < self.open_for:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, self.open_for - waited)
+                self.state = HALF_OPEN
+                self.trials = 0
+                self.trial_successes = 0
+
+            if self.state == HALF_OPEN:
+                if self.trials >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, self.open_for)
+                self.trials += 1
+
+    # a call that says nothing about the backend, e.g. one cut short by a
+    # deadline the caller chose. gives back its half open trial slot
+    def cancel(self):
+        with self.lock:
+            if self.state == HALF_OPEN and self.trials > 0:
+                self.trials -= 1
+
+    def record(self, failed, duration):
+        slow = duration >= self.slow_call_seconds
+        with self.lock:
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                    return
+                self.trial_successes += 1
+                if self.trial_successes >= self.half_open_calls:
+                    self.state = CLOSED
+                    self.calls.clear()
+                    self.failures = 0
+                    self.slow = 0
+                    logging.info(f"Circuit breaker for {self.name} closed")
+                return
+
+            if self.state == OPEN:
+                return
+
+            if len(self.calls) == self.calls.maxlen:
+                old_failed, old_slow = self.calls[0]
+                self.failures -= old_failed
+                self.slow -= old_slow
+            self.calls.append((failed, slow))
+            self.failures += failed
+            self.slow += slow
+
+            count = len(self.calls)
+            if count >= self.min_calls and (
+                self.failures / count >= self.failure_rate or self.slow / count >= self.slow_call_rate
+            ):
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = self.clock()
+        logging.warning(f"Circuit breaker for {self.name} opened for {self.open_for}s")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "calls": len(self.calls),
+                "failures": self.failures,
+                "slow": self.slow,
+                "rejected": self.rejected,
+            }
+
+# circuit breaker configured from the BREAKER_* environment variables
+def breaker_from_env(name):
+    return CircuitBreaker(
+        name,
+        window=int(os.environ.get('BREAKER_WINDOW', '20')),
+        min_calls=int(os.environ.get('BREAKER_MIN_CALLS', '10')),
+        failure_rate=float(os.environ.get('BREAKER_FAILURE_RATE', '0.5')),
+        slow_call_seconds=float(os.environ.get('BREAKER_SLOW_CALL_SECONDS', '1')),
+        slow_call_rate=float(os.environ.get('BREAKER_SLOW_CALL_RATE', '0.5')),
+        open_for=float(os.environ.get('BREAKER_OPEN_SECONDS', '10')),
+    )
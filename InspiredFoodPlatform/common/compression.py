@@ -0,0 +1,14 @@
+import grpc
+
+GRPC_COMPRESSION = {
+    'none': grpc.Compression.NoCompression,
+    'gzip': grpc.Compression.Gzip,
+    'deflate': grpc.Compression.Deflate,
+}
+
+# "gzip" -> grpc.Compression.Gzip, for the *_COMPRESSION environment variables
+def grpc_compression(value):
+    name = (value or 'none').strip().lower()
+    if name not in GRPC_COMPRESSION:
+        raise ValueError(f"Unknown gRPC compression {value!r}, expected one of {', '.join(GRPC_COMPRESSION)}")
+    return GRPC_COMPRESSION[name]
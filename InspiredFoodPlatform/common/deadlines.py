@@ -0,0 +1,9 @@
+# seconds left before `context`'s deadline, at most `cap`, for a call made
+# while handling it, so the caller's deadline carries on down. grpc gives a
+# huge time_remaining() for a call without a deadline, and the context
+# stand-ins the benchmarks use give None, both of which get `cap`
+def time_remaining(context, cap):
+    remaining = context.time_remaining()
+    if remaining is None:
+        return cap
+    return max(min(remaining, cap), 0)
@@ -0,0 +1,72 @@
+import time
+import threading
+from collections import OrderedDict
+
+# one idempotency key: a fingerprint of the request that claimed it and,
+# once that request is done, its response (None if it failed). there is one
+# per key, so it is kept small: repeats wait on the index's condition
+class Claim:
+    __slots__ = ('fingerprint', 'expires_at', 'response', 'done')
+
+    def __init__(self, fingerprint, expires_at):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.response = None
+        self.done = False
+
+# idempotency keys seen in the last `ttl` seconds, at most `capacity` of
+# them, so a retried request gets the first one's response instead of
+# being run again. every key lives for the same time, so insertion order is
+# expiry order: expired keys are dropped from the front as new ones come
+# in, and past `capacity` the oldest go first. lookups and claims are O(1)
+class DedupeIndex:
+    def __init__(self, capacity=100000, ttl=86400.0, clock=time.monotonic):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.finished = threading.Condition(self.lock) # wakes repeats waiting for a claim
+        self.claims = OrderedDict() # key -> Claim
+
+    # (claim, True) for the first request with `key`, which then calls
+    # complete() or release(). (claim, False) for a repeat: the claim's
+    # fingerprint says whether it was the same request, wait() gives the response
+    def claim(self, key, fingerprint):
+        now = self.clock()
+        with self.lock:
+            while self.claims:
+                oldest = next(iter(self.claims.values()))
+                if oldest.expires_at > now and len(self.claims) < self.capacity:
+                    break
+                self.claims.popitem(last=False)
+
+            claim = self.claims.get(key)
+            if claim is not None:
+                return claim, False
+            claim = Claim(fingerprint, now + self.ttl)
+            self.claims[key] = claim
+            return claim, True
+
+    # the response of the request that made `claim`, waiting up to `timeout`
+    # seconds for it. None if that request failed or is still running
+    def wait(self, claim, timeout=None):
+        with self.lock:
+            self.finished.wait_for(lambda: claim.done, timeout)
+            return claim.response
+
+    def complete(self, claim, response):
+        with self.lock:
+            claim.response = response
+            claim.done = True
+            self.finished.notify_all()
+
+    # the request that claimed `key` failed, the next one with it runs again
+    def release(self, key, claim):
+        with self.lock:
+            if self.claims.get(key) is claim:
+                del self.claims[key]
+            claim.done = True
+            self.finished.notify_all()
+
+    def __len__(self):
+        return len(self.claims)
@@ -0,0 +1,12 @@
+# top level fields a google.protobuf.FieldMask asks for, or None when the
+# mask is empty, which means every field. only top level paths are
+# supported, a path the message doesn't have raises ValueError
+def masked_fields(mask, descriptor):
+    if not mask.paths:
+        return None
+    fields = set()
+    for path in mask.paths:
+        if path not in descriptor.fields_by_name:
+            raise ValueError(f"{descriptor.name} has no field {path!r}")
+        fields.add(path)
+    return fields
@@ -0,0 +1,192 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+# keys per chunk of a SortedKeys before it is split in two
+CHUNK_SIZE = 512
+
+# sorted collection of unique keys. the keys are kept in chunks of at most
+# 2 * CHUNK_SIZE sorted lists, so adding or removing a key moves at most one
+# chunk's worth of entries rather than everything after it
+class SortedKeys:
+    # one per indexed value, many of which (e.g. customer emails) hold a
+    # single key, so keep them small
+    __slots__ = ('_chunks', '_maxes', '_length')
+
+    def __init__(self):
+        self._chunks = []
+        self._maxes = [] # last key of each chunk
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def add(self, key):
+        self._length += 1
+        if not self._chunks:
+            self._chunks.append([key])
+            self._maxes.append(key)
+            return
+        i = min(bisect_left(self._maxes, key), len(self._chunks) - 1)
+        chunk = self._chunks[i]
+        insort(chunk, key)
+        self._maxes[i] = chunk[-1]
+        if len(chunk) > 2 * CHUNK_SIZE:
+            self._chunks[i:i + 1] = [chunk[:CHUNK_SIZE], chunk[CHUNK_SIZE:]]
+            self._maxes[i:i + 1] = [chunk[CHUNK_SIZE - 1], chunk[-1]]
+
+    def remove(self, key):
+        i = bisect_left(self._maxes, key)
+        if i == len(self._chunks):
+            return
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, key)
+        if j < len(chunk) and chunk[j] == key:
+            del chunk[j]
+            self._length -= 1
+            if chunk:
+                self._maxes[i] = chunk[-1]
+            else:
+                del self._chunks[i]
+                del self._maxes[i]
+
+    # up to `limit` keys strictly between `lower` and `upper` (None for no
+    # bound), smallest first or with `reverse` largest first
+    def range(self, lower=None, upper=None, limit=None, reverse=False):
+        found = []
+        if not reverse:
+            i = 0 if lower is None else bisect_right(self._maxes, lower)
+            while i < len(self._chunks):
+                chunk = self._chunks[i]
+                j = 0 if lower is None else bisect_right(chunk, lower)
+                while j < len(chunk):
+                    key = chunk[j]
+                    if (upper is not None and key >= upper) or len(found) == limit:
+                        return found
+                    found.append(key)
+                    j += 1
+                i += 1
+        else:
+            i = len(self._chunks) - 1 if upper is None else min(bisect_left(self._maxes, upper), len(self._chunks) - 1)
+            while i >= 0:
+                chunk = self._chunks[i]
+                j = (len(chunk) if upper is None else bisect_left(chunk, upper)) - 1
+                while j >= 0:
+                    key = chunk[j]
+                    if (lower is not None and key <= lower) or len(found) == limit:
+                        return found
+                    found.append(key)
+                    j -= 1
+                i -= 1
+        return found
+
+# secondary indexes over the records of a StripedStore (common/store.py).
+# every record has a sort key that never changes, a tuple ending with the
+# record's key in the store (e.g. creation time and id). all sort keys are
+# kept in order, and for each of `fields` every value maps to the sort keys
+# of the records holding it, also in order. so a page of the records with a
+# given value, or created in a given time range, costs as much as the page
+# rather than a scan of every record. the store calls replace() with the
+# stripe lock held on every write, with None for `old` when a record is
+# added and for `new` when one is removed.
+#
+# the records are split between `partitions` by their key, the way the
+# store splits them between stripes, and each partition has its own lock.
+# so writes to different stripes rarely wait on each other here either;
+# find() asks every partition and merges what they found
+class RecordIndex:
+    def __init__(self, fields, sort_key, partitions=4):
+        self.fields = fields
+        self.sort_key = sort_key # record -> key, unique per record
+        self.partitions = [IndexPartition(fields) for _ in range(partitions)]
+
+    def _partition(self, key):
+        return self.partitions[hash(key[-1]) % len(self.partitions)]
+
+    def replace(self, old, new):
+        key = self.sort_key(new if old is None else old)
+        self._partition(key).replace(key, old, new)
+
+    def add_all(self, records):
+        for record in records:
+            key = self.sort_key(record)
+            self._partition(key).replace(key, None, record)
+
+    # sort keys of up to `limit` records matching every field -> value in
+    # `equals`, strictly between `lower` and `upper`. only the smallest
+    # matching bucket is walked, so the other fields must be checked by the
+    # caller (who re-checks every record anyway, it may have changed since).
+    # every partition is asked for up to `limit` and the first `limit` kept
+    def find(self, equals, lower=None, upper=None, limit=None, reverse=False):
+        found = []
+        for partition in self.partitions:
+            found.extend(partition.find(equals, lower, upper, limit, reverse))
+        # already sorted runs, which sort() merges in one pass
+        found.sort(reverse=reverse)
+        return found[:limit]
+
+# one partition of a RecordIndex: its records' sort keys, and per field and
+# value the sort keys of its records holding that value
+class IndexPartition:
+    def __init__(self, fields):
+        self.fields = fields
+        self.lock = threading.Lock()
+        self.everything = SortedKeys()
+        # field -> value -> sort key, or SortedKeys once a value has more than
+        # one record. most customer emails have one order, and a lone key
+        # takes far less memory than a SortedKeys
+        self.values = {field: {} for field in fields}
+
+    def replace(self, key, old, new):
+        with self.lock:
+            if old is None:
+                self.everything.add(key)
+                for field in self.fields:
+                    self._bucket_add(self.values[field], new.get(field), key)
+                return
+            if new is None:
+                self.everything.remove(key)
+                for field in self.fields:
+                    self._bucket_remove(self.values[field], old.get(field), key)
+                return
+            for field in self.fields:
+                before, after = old.get(field), new.get(field)
+                if before != after:
+                    self._bucket_remove(self.values[field], before, key)
+                    self._bucket_add(self.values[field], after, key)
+
+    def _bucket_add(self, buckets, value, key):
+        bucket = buckets.get(value)
+        if bucket is None:
+            buckets[value] = key
+        elif isinstance(bucket, SortedKeys):
+            bucket.add(key)
+        else:
+            keys = SortedKeys()
+            keys.add(bucket)
+            keys.add(key)
+            buckets[value] = keys
+
+    def _bucket_remove(self, buckets, value, key):
+        bucket = buckets.get(value)
+        if isinstance(bucket, SortedKeys):
+            bucket.remove(key)
+            if len(bucket) == 1:
+                buckets[value] = bucket.range()[0]
+        elif bucket == key:
+            del buckets[value]
+
+    # only the smallest matching bucket is walked, see RecordIndex.find
+    def find(self, equals, lower=None, upper=None, limit=None, reverse=False):
+        with self.lock:
+            keys = self.everything
+            for field, value in equals.items():
+                bucket = self.values[field].get(value)
+                if bucket is None:
+                    return []
+                if not isinstance(bucket, SortedKeys):
+                    # a single record has it
+                    inside = (lower is None or bucket > lower) and (upper is None or bucket < upper)
+                    return [bucket] if inside and limit != 0 else []
+                if len(bucket) < len(keys):
+                    keys = bucket
+            return keys.range(lower, upper, limit, reverse)
@@ -0,0 +1,28 @@
+import threading
+import grpc
+
+# a server streaming RPC on a thread pool server holds one of the pool's
+# worker threads for as long as the stream is open. with enough streams
+# open there are no threads left for the calls they wait on, so a
+# StreamLimit lets at most `limit` streams of one kind run at once and the
+# rest of the pool stays free. streams past the limit fail straight away
+# with RESOURCE_EXHAUSTED, which the callers' replica pools don't count
+# against the server
+class StreamLimit:
+    def __init__(self, limit, name):
+        self.limit = limit
+        self.name = name # the RPC, for the error details
+        self._slots = threading.BoundedSemaphore(limit)
+
+    # yields what `stream` (a generator, not started yet) yields if a slot
+    # is free, and gives the slot back when the stream ends or is cancelled
+    def run(self, stream, context):
+        if not self._slots.acquire(blocking=False):
+            stream.close()
+            context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+            context.set_details(f"Already serving {self.limit} {self.name} streams")
+            return
+        try:
+            yield from stream
+        finally:
+            self._slots.release()
@@ -0,0 +1,49 @@
+import grpc
+
+# response serializer that sends bytes as they are and serializes anything
+# else with `serializer`
+def passthrough_serializer(serializer):
+    def serialize(response):
+        if isinstance(response, bytes):
+            return response
+        return serializer(response)
+    return serialize
+
+# server interceptor that lets unary handlers return their response already
+# serialized, as bytes, so a servicer can keep the serialized form of a
+# response it sends often and skip building and serializing it per call.
+# install it last in the server's interceptors, so the handlers it wraps are
+# the registered ones and the wrapped handler can be reused across calls
+class SerializedResponses(grpc.ServerInterceptor):
+    def __init__(self):
+        self.handlers = {} # method -> (registered handler, wrapped handler)
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or handler.unary_unary is None:
+            return handler
+        cached = self.handlers.get(handler_call_details.method)
+        if cached is not None and cached[0] is handler:
+            return cached[1]
+
+        wrapped = grpc.unary_unary_rpc_method_handler(
+            handler.unary_unary,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=passthrough_serializer(handler.response_serializer),
+        )
+        self.handlers[handler_call_details.method] = (handler, wrapped)
+        return wrapped
+
+def _varint(value):
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+# the wire encoding of a length delimited field (an embedded message, string
+# or bytes) numbered `number` holding `payload`. serialized messages joined
+# with this make up a repeated message field
+def embedded(number, payload):
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
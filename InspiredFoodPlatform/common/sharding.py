@@ -0,0 +1,44 @@
+import zlib
+import itertools
+from common.balancer import parse_addresses
+
+# the shard that owns `key` out of `shards`. crc32 rather than hash(), which
+# is salted per process for strings, so every process agrees
+def shard_for(key, shards):
+    return zlib.crc32(key.encode()) % shards
+
+# turns "host:50051;host:50052" into [["host:50051"], ["host:50052"]], one
+# list of replica addresses per shard, in shard order. without a ";" it is
+# a single shard, so a plain replica list means what it did before
+def parse_shards(value):
+    return [parse_addresses(shard) for shard in value.split(';') if shard.strip()]
+
+# what an order service request is routed by: the order it is about, or for
+# CreateOrder its idempotency key, so a retry reaches the shard that
+# remembers the key. None for requests that can go to any shard
+# (CreateOrder without a key, CreateOrders' request stream)
+def order_shard_key(request):
+    return getattr(request, 'order_id', '') or getattr(request, 'idempotency_key', '') or None
+
+# stand in for a generated stub that sends each call to the shard owning
+# the request's key, through that shard's stub (a PooledStub or
+# AsyncPooledStub). calls without a key take turns between the shards
+class ShardedStub:
+    def __init__(self, stubs, key=order_shard_key):
+        self._stubs = stubs
+        self._key = key
+        self._turns = itertools.count()
+
+    def _shard(self, request):
+        key = self._key(request)
+        if key is None:
+            return next(self._turns) % len(self._stubs)
+        return shard_for(key, len(self._stubs))
+
+    def __getattr__(self, method):
+        stubs = self._stubs
+
+        def call(request, *args, **kwargs):
+            return getattr(stubs[self._shard(request)], method)(request, *args, **kwargs)
+
+        return call
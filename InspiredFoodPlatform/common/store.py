@@ -0,0 +1,162 @@
+import threading
+
+# `record` with `changes` (field -> value) applied. dicts are merged, other
+# records (e.g. compact classes with __slots__) return a changed copy from
+# replace(**changes)
+def merged(record, changes):
+    if isinstance(record, dict):
+        return {**record, **changes}
+    return record.replace(**changes)
+
+# in memory records shared by a servicer's worker threads. a stored record
+# (a dict, or an object with replace(), see merged()) is never changed in
+# place: every write puts a new record under the key, so readers see either
+# the old record or the new one, never half of an update, and don't take a
+# lock. writers lock only the stripe their key hashes to, so writes to
+# different records rarely wait on each other. with a `log` (common/wal.py)
+# every write is logged in the order it was applied, and returns once the
+# log has it on disk. with an `index` (common/index.py) every write also
+# updates the secondary indexes, and with `watchers` (common/watch.py)
+# every new record is published to them
+class StripedStore:
+    def __init__(self, stripes=64, log=None, index=None, watchers=None):
+        self._records = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._log = log
+        self._index = index
+        self._watchers = watchers
+
+    def _lock(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+    # called with the key's stripe locked, so the log sees writes to a key
+    # in the order they were made
+    def _logged(self, key, fields, replace):
+        if self._log is None:
+            return None
+        return self._log.append(key, fields, replace)
+
+    # called with the key's stripe locked, like _logged
+    def _indexed(self, old, new):
+        if self._index is not None:
+            self._index.replace(old, new)
+
+    # called with the key's stripe locked, so watchers see a key's records
+    # in the order they were written
+    def _published(self, key, record):
+        if self._watchers is not None:
+            self._watchers.publish(key, record)
+
+    def _durable(self, sequence):
+        if sequence is not None:
+            self._log.wait(sequence)
+
+    # records recovered from the log, stored without logging them again
+    def load(self, records):
+        self._records.update(records)
+        if self._index is not None:
+            self._index.add_all(records.values())
+
+    # a copy of every record, for snapshots
+    def snapshot(self):
+        return self._records.copy()
+
+    # wait until every write made so far is on disk, after writes made with wait=False
+    def sync(self):
+        if self._log is not None:
+            self._log.wait()
+
+    def get(self, key, default=None):
+        return self._records.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def put(self, key, record, wait=True):
+        with self._lock(key):
+            self._indexed(self._records.get(key), record)
+            self._records[key] = record
+            sequence = self._logged(key, record, True)
+            self._published(key, record)
+        if wait:
+            self._durable(sequence)
+
+    # stores `record` unless the key is taken, returns whether it was stored
+    def insert(self, key, record):
+        with self._lock(key):
+            if key in self._records:
+                return False
+            self._indexed(None, record)
+            self._records[key] = record
+            sequence = self._logged(key, record, True)
+            self._published(key, record)
+        self._durable(sequence)
+        return True
+
+    # replaces the record under `key` with `record` only if it is still
+    # `expected` (the very dict the caller read), returns whether it did.
+    # callers check the record, build its replacement and retry on False
+    def compare_and_set(self, key, expected, record):
+        with self._lock(key):
+            if self._records.get(key) is not expected:
+                return False
+            self._indexed(expected, record)
+            self._records[key] = record
+            sequence = self._logged(key, record, True)
+            self._published(key, record)
+        self._durable(sequence)
+        return True
+
+    # removes the record under `key` only if it is still `expected`, returns
+    # whether it did. with wait=False the caller waits with sync()
+    def remove(self, key, expected, wait=True):
+        with self._lock(key):
+            if self._records.get(key) is not expected:
+                return False
+            self._indexed(expected, None)
+            del self._records[key]
+            sequence = self._logged(key, None, True)
+        if wait:
+            self._durable(sequence)
+        return True
+
+    # atomic read-modify-write: `change(record)` returns the fields to change
+    # and the new record is stored in one step. returns the new record, or
+    # None if there is no record under `key`
+    def update(self, key, change):
+        with self._lock(key):
+            record = self._records.get(key)
+            if record is None:
+                return None
+            changes = change(record)
+            old, record = record, merged(record, changes)
+            self._indexed(old, record)
+            self._records[key] = record
+            sequence = self._logged(key, changes, False)
+            self._published(key, record)
+        self._durable(sequence)
+        return record
+
+    # records matching every field -> value in `equals` whose sort keys lie
+    # strictly between `lower` and `upper`, in sort key order (largest first
+    # with `reverse`), at most `limit` of them. needs an index
+    def find(self, equals, lower=None, upper=None, limit=50, reverse=False):
+        found = []
+        while len(found) < limit:
+            wanted = limit - len(found)
+            keys = self._index.find(equals, lower, upper, wanted, reverse)
+            for sort_key in keys:
+                record = self._records.get(sort_key[-1])
+                # the record may have changed since the index was read
+                if record is not None and all(record.get(field) == value for field, value in equals.items()):
+                    found.append(record)
+            if len(keys) < wanted:
+                break
+            if reverse:
+                upper = keys[-1]
+            else:
+                lower = keys[-1]
+        return found
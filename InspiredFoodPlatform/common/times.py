@@ -0,0 +1,18 @@
+import time
+from datetime import datetime
+
+# timestamps are kept as integer microseconds since the epoch and turned
+# into ISO strings only at the edges (responses, cursors, query filters)
+
+# the current time as microseconds since the epoch
+def now_micros():
+    return time.time_ns() // 1000
+
+# microseconds since the epoch -> local ISO time, as datetime.now().isoformat() gives
+def iso_time(micros):
+    return datetime.fromtimestamp(micros // 1000000).replace(microsecond=micros % 1000000).isoformat()
+
+# local ISO time -> microseconds since the epoch, raises ValueError
+def micros_from_iso(value):
+    moment = datetime.fromisoformat(value)
+    return int(moment.replace(microsecond=0).timestamp()) * 1000000 + moment.microsecond
@@ -0,0 +1,248 @@
+import os
+import zlib
+import pickle
+import struct
+import logging
+import threading
+from common.store import merged
+
+# every entry in a log segment or snapshot is framed as payload length and
+# crc32, then the pickled payload. a frame cut short by a crash, or one
+# whose checksum doesn't match, ends the file
+FRAME = struct.Struct('<II')
+
+# records per frame in a snapshot
+SNAPSHOT_CHUNK = 10000
+
+def _frame(payload):
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+# the payloads of the whole frames in `path`, and the offset where they end
+def _read_frames(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    payloads = []
+    offset = 0
+    while offset + FRAME.size <= len(data):
+        length, crc = FRAME.unpack_from(data, offset)
+        start = offset + FRAME.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        payloads.append(payload)
+        offset = start + length
+    return payloads, offset
+
+def fsync_directory(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# append-only log of changes to an in memory store (common/store.py), so its
+# records survive a restart, plus snapshots so the log doesn't grow forever.
+#
+# writers append a change and then wait until it is on disk. one background
+# thread writes and fsyncs whatever has been appended since its last write
+# in one go (group commit), so many concurrent writers share one fsync.
+# every `snapshot_every` changes it moves on to a new log segment and a
+# second thread writes a snapshot of the store, after which the older
+# segments are deleted. recovery loads the newest snapshot and replays the
+# segments written after it. changes hold field values rather than
+# increments, so replaying one the snapshot already has does no harm
+class WriteAheadLog:
+    def __init__(self, directory, fsync=True, snapshot_every=100000):
+        self.directory = directory
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.work = threading.Condition(self.lock) # wakes the writer thread
+        self.flushed = threading.Condition(self.lock) # wakes writers waiting for disk
+        self.buffer = []
+        self.appended = 0 # sequence number of the last append
+        self.durable = 0 # sequence number of the last append on disk
+        self.failure = None
+        self.closed = False
+        self.since_snapshot = 0
+        self.snapshotting = False
+
+        self.segment_number = 0
+        self.segment = None
+        self.snapshot_source = None
+        self.writer = None
+
+    def _path(self, kind, number):
+        return os.path.join(self.directory, f"{kind}-{number:010d}.{'log' if kind == 'wal' else 'snap'}")
+
+    def _numbers(self, kind):
+        suffix = '.log' if kind == 'wal' else '.snap'
+        return sorted(
+            int(name[len(kind) + 1:-len(suffix)])
+            for name in os.listdir(self.directory)
+            if name.startswith(kind + '-') and name.endswith(suffix)
+        )
+
+    # records as of the last change that reached the disk, key -> record.
+    # call once, before start()
+    def recover(self):
+        records = {}
+        snapshots = self._numbers('snapshot')
+        covered = 0
+        if snapshots:
+            covered = snapshots[-1]
+            payloads, _ = _read_frames(self._path('snapshot', covered))
+            for payload in payloads:
+                records.update(pickle.loads(payload))
+
+        replayed = 0
+        segments = [number for number in self._numbers('wal') if number > covered]
+        for number in segments:
+            path = self._path('wal', number)
+            payloads, end = _read_frames(path)
+            for payload in payloads:
+                key, fields, replace = pickle.loads(payload)
+                current = records.get(key)
+                if fields is None:
+                    records.pop(key, None)
+                elif replace:
+                    records[key] = fields
+                elif current is None:
+                    # only some of the fields of a record we don't have,
+                    # keeping them would make a record missing the rest
+                    logging.warning(f"Skipping a partial update of unknown record {key} in {path}")
+                else:
+                    records[key] = merged(current, fields)
+            replayed += len(payloads)
+            if end < os.path.getsize(path):
+                # a write torn by a crash, it was never acknowledged
+                logging.warning(f"Truncating {path} at {end} bytes")
+                with open(path, 'r+b') as f:
+                    f.truncate(end)
+
+        self.segment_number = max([covered] + segments)
+        self.since_snapshot = replayed
+        logging.info(f"Recovered {len(records)} records from {self.directory} ({replayed} log entries replayed)")
+        return records
+
+    # start logging. `snapshot_source()` returns a copy of every record
+    def start(self, snapshot_source):
+        self.snapshot_source = snapshot_source
+        self.segment_number += 1
+        self.segment = self._open_segment()
+        self.writer = threading.Thread(target=self._write_loop, name='wal-writer', daemon=True)
+        self.writer.start()
+
+    # log a change, `fields` is the whole record when `replace` is set and the
+    # changed fields otherwise, None when the record was removed. returns a sequence number to wait() on
+    def append(self, key, fields, replace):
+        frame = _frame(pickle.dumps((key, fields, replace), protocol=pickle.HIGHEST_PROTOCOL))
+        with self.lock:
+            self.buffer.append(frame)
+            self.appended += 1
+            self.work.notify()
+            return self.appended
+
+    # block until the change numbered `sequence` (default: everything
+    # appended so far) is on disk
+    def wait(self, sequence=None):
+        with self.lock:
+            if sequence is None:
+                sequence = self.appended
+            while self.durable < sequence:
+                if self.failure is not None:
+                    raise IOError(f"Write-ahead log failed: {self.failure}")
+                self.flushed.wait()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.work.notify()
+        if self.writer is not None:
+            self.writer.join()
+        if self.segment is not None:
+            self.segment.close()
+
+    def _write_loop(self):
+        while True:
+            with self.lock:
+                while not self.buffer and not self.closed:
+                    self.work.wait()
+                if not self.buffer:
+                    return
+                batch = self.buffer
+                self.buffer = []
+                upto = self.appended
+
+            try:
+                self.segment.write(b''.join(batch))
+                self.segment.flush()
+                if self.fsync:
+                    os.fsync(self.segment.fileno())
+            except OSError as e:
+                logging.error(f"Write-ahead log write failed: {e}")
+                with self.lock:
+                    self.failure = e
+                    self.flushed.notify_all()
+                return
+
+            with self.lock:
+                self.durable = upto
+                self.since_snapshot += len(batch)
+                self.flushed.notify_all()
+                snapshot_due = self.since_snapshot >= self.snapshot_every and not self.snapshotting
+                if snapshot_due:
+                    self.snapshotting = True
+                    self.since_snapshot = 0
+
+            if snapshot_due:
+                covered = self._rotate()
+                threading.Thread(target=self._snapshot, args=(covered,), name='wal-snapshot', daemon=True).start()
+
+    # move on to a new segment, returns the number of the last full one.
+    # only called from the writer thread
+    def _rotate(self):
+        self.segment.close()
+        covered = self.segment_number
+        self.segment_number += 1
+        self.segment = self._open_segment()
+        return covered
+
+    # the file for segment_number. its directory entry is synced too, or
+    # after a power cut the file, and the writes acknowledged from it, could be gone
+    def _open_segment(self):
+        segment = open(self._path('wal', self.segment_number), 'ab')
+        if self.fsync:
+            fsync_directory(self.directory)
+        return segment
+
+    # write a snapshot holding everything in segments up to `covered`, then
+    # drop those segments and older snapshots
+    def _snapshot(self, covered):
+        try:
+            records = list(self.snapshot_source().items())
+            path = self._path('snapshot', covered)
+            temporary = path + '.tmp'
+            with open(temporary, 'wb') as f:
+                for start in range(0, len(records), SNAPSHOT_CHUNK):
+                    chunk = dict(records[start:start + SNAPSHOT_CHUNK])
+                    f.write(_frame(pickle.dumps(chunk, protocol=pickle.HIGHEST_PROTOCOL)))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+            fsync_directory(self.directory)
+
+            for number in self._numbers('wal'):
+                if number <= covered:
+                    os.remove(self._path('wal', number))
+            for number in self._numbers('snapshot'):
+                if number < covered:
+                    os.remove(self._path('snapshot', number))
+            logging.info(f"Wrote snapshot of {len(records)} records to {path}")
+        except OSError as e:
+            logging.error(f"Snapshot failed, keeping the log: {e}")
+        finally:
+            with self.lock:
+                self.snapshotting = False
@@ -0,0 +1,71 @@
+import threading
+from collections import deque
+
+# one watcher of a key: the records published for it that it hasn't taken
+# yet. if it falls more than `size` changes behind the oldest are dropped;
+# each record is a whole record, so it still gets the latest one. a `size`
+# of None drops nothing
+class Subscription:
+    __slots__ = ('key', 'pending', 'ready')
+
+    def __init__(self, key, size):
+        self.key = key
+        self.pending = deque(maxlen=size)
+        self.ready = threading.Event()
+
+    def push(self, record):
+        self.pending.append(record)
+        self.ready.set()
+
+    # wake a take() waiting on this subscription, e.g. when its stream is cancelled
+    def wake(self):
+        self.ready.set()
+
+    # the records published since the last call, oldest first, waiting up to
+    # `timeout` seconds for one. empty if there were none or it was woken
+    def take(self, timeout=None):
+        self.ready.wait(timeout)
+        self.ready.clear()
+        records = []
+        while self.pending:
+            records.append(self.pending.popleft())
+        return records
+
+# watchers of records in a StripedStore (common/store.py), per key. the
+# store calls publish() with the key's stripe lock held after every write,
+# so a watcher sees a record's changes in the order they were made. the
+# registry starts no threads: publish() hands the new record to the key's
+# subscriptions and the watchers' own threads take it from there. a
+# write to a key nobody watches costs two dict lookups. subscribing to the
+# key None watches every key
+class WatchRegistry:
+    def __init__(self, queue_size=16):
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        # key -> tuple of subscriptions, replaced rather than changed so
+        # publish() reads it without the lock
+        self.watchers = {}
+
+    def subscribe(self, key):
+        subscription = Subscription(key, self.queue_size)
+        with self.lock:
+            self.watchers[key] = self.watchers.get(key, ()) + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            remaining = tuple(s for s in self.watchers.get(subscription.key, ()) if s is not subscription)
+            if remaining:
+                self.watchers[subscription.key] = remaining
+            else:
+                self.watchers.pop(subscription.key, None)
+
+    def publish(self, key, record):
+        for subscription in self.watchers.get(key, ()):
+            subscription.push(record)
+        for subscription in self.watchers.get(None, ()):
+            subscription.push(record)
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(subscriptions) for subscriptions in self.watchers.values())
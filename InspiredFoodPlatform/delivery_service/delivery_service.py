@@ -4,6 +4,8 @@ import logging
 from datetime import datetime
 from concurrent import futures
 import sys
+import threading
+import functools
 import grpc
 import delivery_service_pb2
 import delivery_service_pb2_grpc
@@ -12,20 +14,117 @@ sys.path.insert(0, project_root)
 sys.path.insert(0, os.path.join(project_root, 'order_service'))
 from order_service import order_service_pb2
 from order_service import order_service_pb2_grpc
+from common.balancer import ReplicaPool, PooledStub
+from common.breaker import CircuitOpenError, breaker_from_env
+from common.compression import grpc_compression
+from common.deadlines import time_remaining
+from common.fieldmask import masked_fields
+from common.limits import StreamLimit
+from common.sharding import ShardedStub, parse_shards
+from common.store import StripedStore
+
+# deadline for calls to the order service when the incoming call has none,
+# and the longest they get when it has one
+ORDER_SERVICE_TIMEOUT = float(os.environ.get('ORDER_SERVICE_TIMEOUT', '5'))
+
+# worker threads
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '10'))
+
+# open TrackDelivery streams at once (see common/limits.py), so updates
+# still have threads. the gateway shares one stream per delivery
+MAX_TRACKERS = int(os.environ.get('MAX_TRACKERS', str(MAX_WORKERS // 2)))
+
+# tries at confirming an order that keeps changing under AssignDriver
+ORDER_UPDATE_ATTEMPTS = 5
+
+# orders in these statuses can't be delivered
+UNDELIVERABLE_ORDER_STATUSES = {
+    order_service_pb2.ORDER_REJECTED, order_service_pb2.ORDER_DELIVERED, order_service_pb2.ORDER_CANCELLED,
+}
+
+# TrackDelivery ends once the delivery reaches one of these
+FINAL_DELIVERY_STATUSES = {delivery_service_pb2.DELIVERY_DELIVERED, delivery_service_pb2.DELIVERY_CANCELLED}
+
+# the order status a delivery status moves its order to
+ORDER_STATUS_FOR_DELIVERY = {
+    delivery_service_pb2.DELIVERY_PICKED_UP: order_service_pb2.ORDER_OUT_FOR_DELIVERY,
+    delivery_service_pb2.DELIVERY_DELIVERED: order_service_pb2.ORDER_DELIVERED,
+}
+
+# order service errors passed on to the caller as they are, anything else is
+# INTERNAL. the caller's mistakes (NOT_FOUND, INVALID_ARGUMENT) must stay
+# theirs, INTERNAL would count against this service's circuit breaker
+PASSED_ON_CODES = {
+    grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.FAILED_PRECONDITION, grpc.StatusCode.ABORTED,
+    grpc.StatusCode.NOT_FOUND, grpc.StatusCode.INVALID_ARGUMENT,
+}
+
+def order_service_error(e, context):
+    logging.error(f"Error communicating with Order service: {e}")
+    # keep timeouts, unavailability, missing orders and refused changes visible to the caller
+    context.set_code(e.code() if e.code() in PASSED_ON_CODES else grpc.StatusCode.INTERNAL)
+    context.set_details(f"Error communicating with Order service: {e.details() if hasattr(e, 'details') else str(e)}")
 
 
 class DeliveryServicer(delivery_service_pb2_grpc.DeliveryServiceServicer):
     def __init__(self):
-        self.deliveries = {} # in memory storage for orders
+        self.deliveries = StripedStore() # in memory storage for deliveries, shared by the worker threads
+        self.delivery_changed = {} # delivery id -> condition notified on every update
+        self.delivery_by_order = {} # order id -> id of its latest delivery
+        self.trackers = StreamLimit(MAX_TRACKERS, 'TrackDelivery')
         
+        # may list several shards, separated by semicolons (see
+        # common/sharding.py), and per shard a replica and its standbys,
+        # separated by commas (see common/balancer.py)
         order_service_addr = os.environ.get('ORDER_SERVICE_ADDR', 'order_service:50051')
         try:
-            self.order_channel = grpc.insecure_channel(order_service_addr)
-            self.order_stub = order_service_pb2_grpc.OrderServiceStub(self.order_channel)
+            self.order_pools = [
+                ReplicaPool(
+                    addresses,
+                    functools.partial(
+                        grpc.insecure_channel,
+                        compression=grpc_compression(os.environ.get('ORDER_SERVICE_COMPRESSION')),
+                    ),
+                    order_service_pb2_grpc.OrderServiceStub,
+                    eject_after=int(os.environ.get('REPLICA_EJECT_AFTER', '3')),
+                    eject_for=float(os.environ.get('REPLICA_EJECT_SECONDS', '10')),
+                    breaker=breaker_from_env('order_service'),
+                )
+                for addresses in parse_shards(order_service_addr)
+            ]
+            self.order_stub = ShardedStub([PooledStub(pool) for pool in self.order_pools])
             logging.info(f"Connected to Order Service at {order_service_addr}")
         except Exception as e:
             logging.error(f"Failed to connect to Order Service: {e}")
     
+    # assigning a driver confirms an order the restaurant hasn't answered yet.
+    # the update only applies to the version of the order that was read, so
+    # it can't undo a status set in the meantime (e.g. PREPARING); when the
+    # order changed, read it again and look at its new status. returns
+    # (code, details) when the order can't be delivered or kept changing
+    def _confirm_order(self, order, context):
+        for _ in range(ORDER_UPDATE_ATTEMPTS):
+            if order.status in UNDELIVERABLE_ORDER_STATUSES:
+                return grpc.StatusCode.FAILED_PRECONDITION, f"Order {order.order_id} is {order_service_pb2.OrderStatus.Name(order.status)} and can't be delivered"
+            if order.status != order_service_pb2.ORDER_PENDING:
+                return None
+            update_request = order_service_pb2.UpdateOrderStatusRequest(
+                order_id=order.order_id,
+                status=order_service_pb2.ORDER_CONFIRMED,
+                expected_version=order.version,
+            )
+            try:
+                self.order_stub.UpdateOrderStatus(update_request, timeout=time_remaining(context, ORDER_SERVICE_TIMEOUT))
+                return None
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.ABORTED:
+                    raise
+            order_request = order_service_pb2.GetOrderRequest(order_id=order.order_id)
+            order = self.order_stub.GetOrder(order_request, timeout=time_remaining(context, ORDER_SERVICE_TIMEOUT))
+        logging.warning(f"Gave up confirming order {order.order_id}, it kept changing")
+        return grpc.StatusCode.ABORTED, f"Order {order.order_id} kept changing, try again"
+    
     # assign delivery driver
     def AssignDriver(self, request, context):
         order_id = request.order_id
@@ -33,17 +132,22 @@ class DeliveryServicer(delivery_service_pb2_grpc.DeliveryServiceServicer):
         
         try:
             order_request = order_service_pb2.GetOrderRequest(order_id=order_id)
-            order_response = self.order_stub.GetOrder(order_request)
+            order_response = self.order_stub.GetOrder(order_request, timeout=time_remaining(context, ORDER_SERVICE_TIMEOUT))
             
-            if not order_response or not order_response.order_id:
-                context.set_code(grpc.StatusCode.NOT_FOUND)
-                context.set_details(f"Order {order_id} not found")
+            # confirmed before the delivery is stored, so an order that can't
+            # be delivered doesn't leave a delivery behind
+            error = self._confirm_order(order_response, context)
+            if error is not None:
+                context.set_code(error[0])
+                context.set_details(error[1])
                 return delivery_service_pb2.DeliveryResponse()
                 
             delivery_id = str(uuid.uuid4())
             now = datetime.now().isoformat()
             
-            self.deliveries[delivery_id] = {
+            # the condition exists before the delivery can be found
+            self.delivery_changed[delivery_id] = threading.Condition()
+            self.deliveries.put(delivery_id, {
                 'delivery_id': delivery_id,
                 'order_id': order_id,
                 'driver_id': driver_id,
@@ -54,16 +158,12 @@ class DeliveryServicer(delivery_service_pb2_grpc.DeliveryServiceServicer):
                 'assigned_at': now,
                 'picked_up_at': None,
                 'delivered_at': None,
-            }
+                'version': 1,
+            })
+            self.delivery_by_order[order_id] = delivery_id
             
             logging.info(f"Assigned driver {driver_id} to order {order_id}, delivery {delivery_id}")
             
-            update_request = order_service_pb2.UpdateOrderStatusRequest(
-                order_id=order_id,
-                status=order_service_pb2.ORDER_CONFIRMED
-            )
-            self.order_stub.UpdateOrderStatus(update_request)
-            
             return delivery_service_pb2.DeliveryResponse(
                 delivery_id=delivery_id,
                 order_id=order_id,
@@ -73,26 +173,47 @@ class DeliveryServicer(delivery_service_pb2_grpc.DeliveryServiceServicer):
                 status=delivery_service_pb2.DELIVERY_ASSIGNED,
                 current_location='Driver starting location',
                 assigned_at=now,
+                version=1,
             )
             
         except grpc.RpcError as e:
-            logging.error(f"Error communicating with Order service: {e}")
-            context.set_code(grpc.StatusCode.INTERNAL)
-            context.set_details(f"Error communicating with Order service: {e.details() if hasattr(e, 'details') else str(e)}")
+            order_service_error(e, context)
+            return delivery_service_pb2.DeliveryResponse()
+        except CircuitOpenError as e:
+            logging.error(f"Order service circuit breaker open: {e}")
+            context.set_code(grpc.StatusCode.UNAVAILABLE)
+            context.set_details(str(e))
             return delivery_service_pb2.DeliveryResponse()
     
     # get deliverys
     def GetDelivery(self, request, context):
         delivery_id = request.delivery_id
         
-        if delivery_id not in self.deliveries:
+        try:
+            fields = masked_fields(request.read_mask, delivery_service_pb2.DeliveryResponse.DESCRIPTOR)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return delivery_service_pb2.DeliveryResponse()
+        
+        delivery = self.deliveries.get(delivery_id)
+        if delivery is None:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details(f"Delivery {delivery_id} not found")
             return delivery_service_pb2.DeliveryResponse()
         
-        delivery = self.deliveries[delivery_id]
         logging.info(f"Retrieved delivery {delivery_id}")
         
+        # the caller's copy is current, don't send the delivery again
+        if request.if_version and request.if_version == delivery['version']:
+            return delivery_service_pb2.DeliveryResponse(delivery_id=delivery_id, version=delivery['version'])
+        
+        # only the fields asked for, e.g. status and location for a driver map
+        if fields is not None:
+            values = {name: delivery[name] for name in fields if delivery.get(name) is not None}
+            values.update(delivery_id=delivery_id, version=delivery['version'])
+            return delivery_service_pb2.DeliveryResponse(**values)
+        
         response = delivery_service_pb2.DeliveryResponse(
             delivery_id=delivery['delivery_id'],
             order_id=delivery['order_id'],
@@ -102,6 +223,7 @@ class DeliveryServicer(delivery_service_pb2_grpc.DeliveryServiceServicer):
             status=delivery['status'],
             current_location=delivery['current_location'],
             assigned_at=delivery['assigned_at'],
+            version=delivery['version'],
         )
         
         if delivery['picked_up_at']:
@@ -111,43 +233,57 @@ class DeliveryServicer(delivery_service_pb2_grpc.DeliveryServiceServicer):
         
         return response
     
+    # get the latest delivery of an order
+    def GetDeliveryByOrder(self, request, context):
+        delivery_id = self.delivery_by_order.get(request.order_id)
+        
+        if delivery_id is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details(f"No delivery for order {request.order_id}")
+            return delivery_service_pb2.DeliveryResponse()
+        
+        return self.GetDelivery(delivery_service_pb2.GetDeliveryRequest(delivery_id=delivery_id), context)
+    
     # update delivery status 
     def UpdateDeliveryStatus(self, request, context):
         delivery_id = request.delivery_id
         
-        if delivery_id not in self.deliveries:
+        changed = self.delivery_changed.get(delivery_id)
+        if changed is None:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details(f"Delivery {delivery_id} not found")
             return delivery_service_pb2.DeliveryResponse()
         
-        delivery = self.deliveries[delivery_id]
-        delivery['status'] = request.status
-        delivery['current_location'] = request.current_location
-        
         now = datetime.now().isoformat()
+        changes = {'status': request.status, 'current_location': request.current_location}
         if request.status == delivery_service_pb2.DELIVERY_PICKED_UP:
-            delivery['picked_up_at'] = now
-            
-            try:
-                update_request = order_service_pb2.UpdateOrderStatusRequest(
-                    order_id=delivery['order_id'],
-                    status=order_service_pb2.ORDER_OUT_FOR_DELIVERY
-                )
-                self.order_stub.UpdateOrderStatus(update_request)
-            except Exception as e:
-                logging.error(f"Failed to update order status: {e}")
-                
+            changes['picked_up_at'] = now
         elif request.status == delivery_service_pb2.DELIVERY_DELIVERED:
-            delivery['delivered_at'] = now
-            
+            changes['delivered_at'] = now
+        
+        # the order moves first, and if the order service refuses (e.g. the
+        # order was cancelled) the delivery is left as it was
+        order_status = ORDER_STATUS_FOR_DELIVERY.get(request.status)
+        if order_status is not None:
             try:
                 update_request = order_service_pb2.UpdateOrderStatusRequest(
-                    order_id=delivery['order_id'],
-                    status=order_service_pb2.ORDER_DELIVERED
+                    order_id=self.deliveries.get(delivery_id)['order_id'],
+                    status=order_status,
                 )
-                self.order_stub.UpdateOrderStatus(update_request)
-            except Exception as e:
-                logging.error(f"Failed to update order status: {e}")
+                self.order_stub.UpdateOrderStatus(update_request, timeout=time_remaining(context, ORDER_SERVICE_TIMEOUT))
+            except grpc.RpcError as e:
+                order_service_error(e, context)
+                return delivery_service_pb2.DeliveryResponse()
+            except CircuitOpenError as e:
+                logging.error(f"Order service circuit breaker open: {e}")
+                context.set_code(grpc.StatusCode.UNAVAILABLE)
+                context.set_details(str(e))
+                return delivery_service_pb2.DeliveryResponse()
+        
+        # apply the update and wake every TrackDelivery stream watching it
+        with changed:
+            delivery = self.deliveries.update(delivery_id, lambda delivery: dict(changes, version=delivery['version'] + 1))
+            changed.notify_all()
         
         logging.info(f"Updated delivery {delivery_id} status to {request.status}")
         
@@ -160,6 +296,7 @@ class DeliveryServicer(delivery_service_pb2_grpc.DeliveryServiceServicer):
             status=delivery['status'],
             current_location=delivery['current_location'],
             assigned_at=delivery['assigned_at'],
+            version=delivery['version'],
         )
         
         if delivery['picked_up_at']:
@@ -169,7 +306,8 @@ class DeliveryServicer(delivery_service_pb2_grpc.DeliveryServiceServicer):
         
         return response
     
-    # track deliverys
+    # track deliverys, sending the current state and then every update
+    # until the delivery is finished or the client goes away
     def TrackDelivery(self, request, context):
         delivery_id = request.delivery_id
         
@@ -178,20 +316,46 @@ class DeliveryServicer(delivery_service_pb2_grpc.DeliveryServiceServicer):
             context.set_details(f"Delivery {delivery_id} not found")
             return
         
-        delivery = self.deliveries[delivery_id]
+        yield from self.trackers.run(self._track(delivery_id, context), context)
+    
+    def _track(self, delivery_id, context):
+        changed = self.delivery_changed[delivery_id]
         
-        response = delivery_service_pb2.TrackDeliveryResponse(
-            delivery_id=delivery['delivery_id'],
-            driver_id=delivery['driver_id'],
-            current_location=delivery['current_location'],
-            status=delivery['status'],
-        )
+        # wake the wait below when the stream is cancelled
+        def on_done():
+            with changed:
+                changed.notify_all()
+        context.add_callback(on_done)
         
-        yield response
+        seen_version = 0
+        while True:
+            with changed:
+                changed.wait_for(lambda: self.deliveries.get(delivery_id)['version'] != seen_version or not context.is_active())
+                if not context.is_active():
+                    return
+                delivery = self.deliveries.get(delivery_id)
+                seen_version = delivery['version']
+                response = delivery_service_pb2.TrackDeliveryResponse(
+                    delivery_id=delivery['delivery_id'],
+                    driver_id=delivery['driver_id'],
+                    current_location=delivery['current_location'],
+                    status=delivery['status'],
+                    version=delivery['version'],
+                )
+                finished = delivery['status'] in FINAL_DELIVERY_STATUSES
+            
+            yield response
+            
+            if finished:
+                return
 
 # starting the gRPC server       
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    # GRPC_COMPRESSION compresses responses (none, gzip or deflate)
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=MAX_WORKERS),
+        compression=grpc_compression(os.environ.get('GRPC_COMPRESSION')),
+    )
     delivery_service_pb2_grpc.add_DeliveryServiceServicer_to_server(DeliveryServicer(), server)
     
     server.add_insecure_port('[::]:50052')
@@ -22,29 +22,32 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
+from google.protobuf import field_mask_pb2 as google_dot_protobuf_dot_field__mask__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16\x64\x65livery_service.proto\x12\x08\x64\x65livery\":\n\x13\x41ssignDriverRequest\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x11\n\tdriver_id\x18\x02 \x01(\t\")\n\x12GetDeliveryRequest\x12\x13\n\x0b\x64\x65livery_id\x18\x01 \x01(\t\"v\n\x1bUpdateDeliveryStatusRequest\x12\x13\n\x0b\x64\x65livery_id\x18\x01 \x01(\t\x12(\n\x06status\x18\x02 \x01(\x0e\x32\x18.delivery.DeliveryStatus\x12\x18\n\x10\x63urrent_location\x18\x03 \x01(\t\"+\n\x14TrackDeliveryRequest\x12\x13\n\x0b\x64\x65livery_id\x18\x01 \x01(\t\"\x87\x02\n\x10\x44\x65liveryResponse\x12\x13\n\x0b\x64\x65livery_id\x18\x01 \x01(\t\x12\x10\n\x08order_id\x18\x02 \x01(\t\x12\x11\n\tdriver_id\x18\x03 \x01(\t\x12\x1a\n\x12restaurant_address\x18\x04 \x01(\t\x12\x18\n\x10\x63ustomer_address\x18\x05 \x01(\t\x12(\n\x06status\x18\x06 \x01(\x0e\x32\x18.delivery.DeliveryStatus\x12\x18\n\x10\x63urrent_location\x18\x07 \x01(\t\x12\x13\n\x0b\x61ssigned_at\x18\x08 \x01(\t\x12\x14\n\x0cpicked_up_at\x18\t \x01(\t\x12\x14\n\x0c\x64\x65livered_at\x18\n \x01(\t\"\x83\x01\n\x15TrackDeliveryResponse\x12\x13\n\x0b\x64\x65livery_id\x18\x01 \x01(\t\x12\x11\n\tdriver_id\x18\x02 \x01(\t\x12\x18\n\x10\x63urrent_location\x18\x03 \x01(\t\x12(\n\x06status\x18\x04 \x01(\x0e\x32\x18.delivery.DeliveryStatus*\x9f\x01\n\x0e\x44\x65liveryStatus\x12\x14\n\x10\x44\x45LIVERY_UNKNOWN\x10\x00\x12\x15\n\x11\x44\x45LIVERY_ASSIGNED\x10\x01\x12\x16\n\x12\x44\x45LIVERY_PICKED_UP\x10\x02\x12\x18\n\x14\x44\x45LIVERY_IN_PROGRESS\x10\x03\x12\x16\n\x12\x44\x45LIVERY_DELIVERED\x10\x04\x12\x16\n\x12\x44\x45LIVERY_CANCELLED\x10\x05\x32\xd4\x02\n\x0f\x44\x65liveryService\x12I\n\x0c\x41ssignDriver\x12\x1d.delivery.AssignDriverRequest\x1a\x1a.delivery.DeliveryResponse\x12G\n\x0bGetDelivery\x12\x1c.delivery.GetDeliveryRequest\x1a\x1a.delivery.DeliveryResponse\x12Y\n\x14UpdateDeliveryStatus\x12%.delivery.UpdateDeliveryStatusRequest\x1a\x1a.delivery.DeliveryResponse\x12R\n\rTrackDelivery\x12\x1e.delivery.TrackDeliveryRequest\x1a\x1f.delivery.TrackDeliveryResponse0\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16\x64\x65livery_service.proto\x12\x08\x64\x65livery\x1a google/protobuf/field_mask.proto\":\n\x13\x41ssignDriverRequest\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x11\n\tdriver_id\x18\x02 \x01(\t\"l\n\x12GetDeliveryRequest\x12\x13\n\x0b\x64\x65livery_id\x18\x01 \x01(\t\x12\x12\n\nif_version\x18\x02 \x01(\x03\x12-\n\tread_mask\x18\x03 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\"-\n\x19GetDeliveryByOrderRequest\x12\x10\n\x08order_id\x18\x01 \x01(\t\"v\n\x1bUpdateDeliveryStatusRequest\x12\x13\n\x0b\x64\x65livery_id\x18\x01 \x01(\t\x12(\n\x06status\x18\x02 \x01(\x0e\x32\x18.delivery.DeliveryStatus\x12\x18\n\x10\x63urrent_location\x18\x03 \x01(\t\"+\n\x14TrackDeliveryRequest\x12\x13\n\x0b\x64\x65livery_id\x18\x01 \x01(\t\"\x98\x02\n\x10\x44\x65liveryResponse\x12\x13\n\x0b\x64\x65livery_id\x18\x01 \x01(\t\x12\x10\n\x08order_id\x18\x02 \x01(\t\x12\x11\n\tdriver_id\x18\x03 \x01(\t\x12\x1a\n\x12restaurant_address\x18\x04 \x01(\t\x12\x18\n\x10\x63ustomer_address\x18\x05 \x01(\t\x12(\n\x06status\x18\x06 \x01(\x0e\x32\x18.delivery.DeliveryStatus\x12\x18\n\x10\x63urrent_location\x18\x07 \x01(\t\x12\x13\n\x0b\x61ssigned_at\x18\x08 \x01(\t\x12\x14\n\x0cpicked_up_at\x18\t \x01(\t\x12\x14\n\x0c\x64\x65livered_at\x18\n \x01(\t\x12\x0f\n\x07version\x18\x0b \x01(\x03\"\x94\x01\n\x15TrackDeliveryResponse\x12\x13\n\x0b\x64\x65livery_id\x18\x01 \x01(\t\x12\x11\n\tdriver_id\x18\x02 \x01(\t\x12\x18\n\x10\x63urrent_location\x18\x03 \x01(\t\x12(\n\x06status\x18\x04 \x01(\x0e\x32\x18.delivery.DeliveryStatus\x12\x0f\n\x07version\x18\x05 \x01(\x03*\x9f\x01\n\x0e\x44\x65liveryStatus\x12\x14\n\x10\x44\x45LIVERY_UNKNOWN\x10\x00\x12\x15\n\x11\x44\x45LIVERY_ASSIGNED\x10\x01\x12\x16\n\x12\x44\x45LIVERY_PICKED_UP\x10\x02\x12\x18\n\x14\x44\x45LIVERY_IN_PROGRESS\x10\x03\x12\x16\n\x12\x44\x45LIVERY_DELIVERED\x10\x04\x12\x16\n\x12\x44\x45LIVERY_CANCELLED\x10\x05\x32\xab\x03\n\x0f\x44\x65liveryService\x12I\n\x0c\x41ssignDriver\x12\x1d.delivery.AssignDriverRequest\x1a\x1a.delivery.DeliveryResponse\x12G\n\x0bGetDelivery\x12\x1c.delivery.GetDeliveryRequest\x1a\x1a.delivery.DeliveryResponse\x12U\n\x12GetDeliveryByOrder\x12#.delivery.GetDeliveryByOrderRequest\x1a\x1a.delivery.DeliveryResponse\x12Y\n\x14UpdateDeliveryStatus\x12%.delivery.UpdateDeliveryStatusRequest\x1a\x1a.delivery.DeliveryResponse\x12R\n\rTrackDelivery\x12\x1e.delivery.TrackDeliveryRequest\x1a\x1f.delivery.TrackDeliveryResponse0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'delivery_service_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_DELIVERYSTATUS']._serialized_start=705
-  _globals['_DELIVERYSTATUS']._serialized_end=864
-  _globals['_ASSIGNDRIVERREQUEST']._serialized_start=36
-  _globals['_ASSIGNDRIVERREQUEST']._serialized_end=94
-  _globals['_GETDELIVERYREQUEST']._serialized_start=96
-  _globals['_GETDELIVERYREQUEST']._serialized_end=137
-  _globals['_UPDATEDELIVERYSTATUSREQUEST']._serialized_start=139
-  _globals['_UPDATEDELIVERYSTATUSREQUEST']._serialized_end=257
-  _globals['_TRACKDELIVERYREQUEST']._serialized_start=259
-  _globals['_TRACKDELIVERYREQUEST']._serialized_end=302
-  _globals['_DELIVERYRESPONSE']._serialized_start=305
-  _globals['_DELIVERYRESPONSE']._serialized_end=568
-  _globals['_TRACKDELIVERYRESPONSE']._serialized_start=571
-  _globals['_TRACKDELIVERYRESPONSE']._serialized_end=702
-  _globals['_DELIVERYSERVICE']._serialized_start=867
-  _globals['_DELIVERYSERVICE']._serialized_end=1207
+  _globals['_DELIVERYSTATUS']._serialized_start=887
+  _globals['_DELIVERYSTATUS']._serialized_end=1046
+  _globals['_ASSIGNDRIVERREQUEST']._serialized_start=70
+  _globals['_ASSIGNDRIVERREQUEST']._serialized_end=128
+  _globals['_GETDELIVERYREQUEST']._serialized_start=130
+  _globals['_GETDELIVERYREQUEST']._serialized_end=238
+  _globals['_GETDELIVERYBYORDERREQUEST']._serialized_start=240
+  _globals['_GETDELIVERYBYORDERREQUEST']._serialized_end=285
+  _globals['_UPDATEDELIVERYSTATUSREQUEST']._serialized_start=287
+  _globals['_UPDATEDELIVERYSTATUSREQUEST']._serialized_end=405
+  _globals['_TRACKDELIVERYREQUEST']._serialized_start=407
+  _globals['_TRACKDELIVERYREQUEST']._serialized_end=450
+  _globals['_DELIVERYRESPONSE']._serialized_start=453
+  _globals['_DELIVERYRESPONSE']._serialized_end=733
+  _globals['_TRACKDELIVERYRESPONSE']._serialized_start=736
+  _globals['_TRACKDELIVERYRESPONSE']._serialized_end=884
+  _globals['_DELIVERYSERVICE']._serialized_start=1049
+  _globals['_DELIVERYSERVICE']._serialized_end=1476
 # @@protoc_insertion_point(module_scope)
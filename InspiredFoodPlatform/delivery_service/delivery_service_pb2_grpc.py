@@ -44,6 +44,11 @@ class DeliveryServiceStub(object):
                 request_serializer=delivery__service__pb2.GetDeliveryRequest.SerializeToString,
                 response_deserializer=delivery__service__pb2.DeliveryResponse.FromString,
                 _registered_method=True)
+        self.GetDeliveryByOrder = channel.unary_unary(
+                '/delivery.DeliveryService/GetDeliveryByOrder',
+                request_serializer=delivery__service__pb2.GetDeliveryByOrderRequest.SerializeToString,
+                response_deserializer=delivery__service__pb2.DeliveryResponse.FromString,
+                _registered_method=True)
         self.UpdateDeliveryStatus = channel.unary_unary(
                 '/delivery.DeliveryService/UpdateDeliveryStatus',
                 request_serializer=delivery__service__pb2.UpdateDeliveryStatusRequest.SerializeToString,
@@ -71,6 +76,12 @@ class DeliveryServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetDeliveryByOrder(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def UpdateDeliveryStatus(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -96,6 +107,11 @@ def add_DeliveryServiceServicer_to_server(servicer, server):
                     request_deserializer=delivery__service__pb2.GetDeliveryRequest.FromString,
                     response_serializer=delivery__service__pb2.DeliveryResponse.SerializeToString,
             ),
+            'GetDeliveryByOrder': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetDeliveryByOrder,
+                    request_deserializer=delivery__service__pb2.GetDeliveryByOrderRequest.FromString,
+                    response_serializer=delivery__service__pb2.DeliveryResponse.SerializeToString,
+            ),
             'UpdateDeliveryStatus': grpc.unary_unary_rpc_method_handler(
                     servicer.UpdateDeliveryStatus,
                     request_deserializer=delivery__service__pb2.UpdateDeliveryStatusRequest.FromString,
@@ -171,6 +187,33 @@ class DeliveryService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GetDeliveryByOrder(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/delivery.DeliveryService/GetDeliveryByOrder',
+            delivery__service__pb2.GetDeliveryByOrderRequest.SerializeToString,
+            delivery__service__pb2.DeliveryResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def UpdateDeliveryStatus(request,
             target,
@@ -0,0 +1,226 @@
+import json
+import math
+import time
+from collections import OrderedDict
+from gateway.metrics import route_template
+
+# routes in this class skip admission control altogether (monitoring)
+EXEMPT = 'exempt'
+
+class TokenBucket:
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate # tokens added per second
+        self.burst = burst
+        self.tokens = burst
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # takes a token as long as more than `reserve` tokens are left after it
+    def take(self, reserve=0.0):
+        self._refill()
+        if self.tokens - 1 < reserve:
+            return False
+        self.tokens -= 1
+        return True
+
+    def give_back(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    # seconds until take(reserve) would succeed
+    def retry_after(self, reserve=0.0):
+        return max(0.0, (1 + reserve - self.tokens) / self.rate)
+
+# "critical=1.0,normal=0.8,low=0.5" -> {"critical": 1.0, ...}
+def parse_priority_classes(value):
+    classes = {}
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        name, _, share = part.partition('=')
+        share = float(share)
+        if not 0 < share <= 1:
+            raise ValueError(f"Priority class {name.strip()!r} needs a share between 0 and 1, got {share}")
+        classes[name.strip()] = share
+    return classes
+
+# "GET /restaurants/{restaurant_id}=low, POST /orders=critical"
+# -> {("GET", "/restaurants/{restaurant_id}"): "low", ...}
+def parse_route_classes(value):
+    routes = {}
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        route, _, name = part.rpartition('=')
+        method, _, path = route.strip().partition(' ')
+        routes[(method.upper(), path.strip())] = name.strip()
+    return routes
+
+# decides which requests the gateway takes on. every request belongs to a
+# priority class with a share between 0 and 1 of the gateway's capacity:
+# - shedding: once `max_in_flight` * share requests are waiting for a
+#   response, new requests of that class get 503 until the queue drains
+# - global rate: requests may only take a token from the global bucket
+#   while more than (1 - share) * burst tokens are left
+# so lower classes are turned away first and the top class (share 1) keeps
+# the last of the capacity. on top of that each client has its own bucket,
+# and a client over its rate gets 429. a rate or limit of 0 turns that check
+# off. state lives on the event loop thread, no locks needed
+class Admission:
+    def __init__(self, classes, route_classes, default_class='normal', max_in_flight=0,
+                 global_rate=0.0, global_burst=0.0, client_rate=0.0, client_burst=0.0,
+                 max_clients=10000, clock=time.monotonic):
+        if default_class not in classes:
+            raise ValueError(f"Default priority class {default_class!r} is not one of {', '.join(classes)}")
+        for route, name in route_classes.items():
+            if name != EXEMPT and name not in classes:
+                raise ValueError(f"Route {' '.join(route)} has unknown priority class {name!r}")
+
+        self.classes = classes
+        self.route_classes = route_classes
+        self.default_class = default_class
+        self.max_in_flight = max_in_flight
+        self.global_bucket = TokenBucket(global_rate, global_burst or global_rate, clock) if global_rate > 0 else None
+        self.client_rate = client_rate
+        self.client_burst = client_burst or client_rate
+        self.clients = OrderedDict() # client -> TokenBucket, least recently seen first
+        self.max_clients = max_clients
+        self.clock = clock
+        self.waiting = 0 # admitted requests that have not started their response
+        self.admitted = {name: 0 for name in classes}
+        self.rejected = {} # (class, reason) -> count
+
+    def priority_class(self, method, route):
+        return self.route_classes.get((method, route), self.default_class)
+
+    def client_bucket(self, client):
+        bucket = self.clients.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.client_rate, self.client_burst, self.clock)
+            self.clients[client] = bucket
+            if len(self.clients) > self.max_clients:
+                self.clients.popitem(last=False)
+        else:
+            self.clients.move_to_end(client)
+        return bucket
+
+    # None if the request may go ahead, otherwise (status, reason, retry after seconds)
+    def admit(self, client, name):
+        share = self.classes[name]
+
+        if self.max_in_flight and self.waiting >= share * self.max_in_flight:
+            return self._reject(name, 503, 'overloaded', 1.0)
+
+        bucket = None
+        if self.client_rate > 0:
+            bucket = self.client_bucket(client)
+            if not bucket.take():
+                return self._reject(name, 429, 'client_rate', bucket.retry_after())
+
+        if self.global_bucket is not None:
+            reserve = (1 - share) * self.global_bucket.burst
+            if not self.global_bucket.take(reserve):
+                if bucket is not None:
+                    bucket.give_back() # the client's token wasn't spent
+                return self._reject(name, 503, 'global_rate', self.global_bucket.retry_after(reserve))
+
+        self.admitted[name] += 1
+        self.waiting += 1
+        return None
+
+    def _reject(self, name, status, reason, retry_after):
+        key = (name, reason)
+        self.rejected[key] = self.rejected.get(key, 0) + 1
+        return status, reason, retry_after
+
+    def stats(self):
+        rejected = {}
+        for (name, reason), count in self.rejected.items():
+            rejected.setdefault(name, {})[reason] = count
+        return {
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "global_tokens": None if self.global_bucket is None else round(self.global_bucket.tokens, 2),
+            "clients": len(self.clients),
+            "classes": {
+                name: {"share": share, "admitted": self.admitted[name], "rejected": rejected.get(name, {})}
+                for name, share in self.classes.items()
+            },
+        }
+
+MESSAGES = {
+    'overloaded': "Gateway is overloaded, try again shortly",
+    'client_rate': "Too many requests from this client",
+    'global_rate': "Gateway is at its request rate limit, try again shortly",
+}
+
+# ASGI middleware putting every request through `admission` before it reaches
+# the app. clients are told apart by `client_header` (e.g. an API key header)
+# when it is sent, otherwise by their address
+class AdmissionMiddleware:
+    def __init__(self, app, admission, routes, client_header=None):
+        self.app = app
+        self.admission = admission
+        self.routes = routes
+        self.client_header = client_header.lower().encode('latin-1') if client_header else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = self.admission.priority_class(scope["method"], route_template(self.routes, scope))
+        if name == EXEMPT:
+            await self.app(scope, receive, send)
+            return
+
+        rejection = self.admission.admit(self.client_of(scope), name)
+        if rejection is not None:
+            status, reason, retry_after = rejection
+            await self.reject(send, status, reason, retry_after)
+            return
+
+        waiting = True
+
+        def done_waiting():
+            nonlocal waiting
+            if waiting:
+                waiting = False
+                self.admission.waiting -= 1
+
+        async def send_started(message):
+            # the queue is what is waiting on a response, a long stream
+            # that has started sending doesn't hold a place in it
+            if message["type"] == "http.response.start":
+                done_waiting()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_started)
+        finally:
+            done_waiting()
+
+    def client_of(self, scope):
+        if self.client_header is not None:
+            for name, value in scope["headers"]:
+                if name == self.client_header:
+                    return value.decode('latin-1')
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def reject(self, send, status, reason, retry_after):
+        body = json.dumps({"detail": MESSAGES[reason]}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode('latin-1')),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode('latin-1')),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
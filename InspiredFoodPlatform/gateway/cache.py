@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+
+# bounded LRU cache with a time to live per entry. only used from the
+# gateway's event loop so it doesn't need any locking
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=30.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict() # key -> (expires_at, value)
+        self.generations = {} # key -> number of invalidations seen
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    # returns the cached value or None, counting the hit or miss
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    # callers take a generation before going to the backend and hand it back
+    # to set(), so a response fetched before an invalidation is never stored
+    def generation(self, key):
+        return self.generations.get(key, 0)
+
+    def set(self, key, value, generation=None):
+        if generation is not None and generation != self.generation(key):
+            return
+
+        self.entries[key] = (self.clock() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self.generations[key] = self.generation(key) + 1
+        if self.entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,118 @@
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError: # optional, only offered when installed
+    brotli = None
+
+# server preference when the client accepts several
+ENCODINGS = ['br', 'gzip', 'deflate'] if brotli is not None else ['gzip', 'deflate']
+
+def compress(encoding, body, level):
+    if encoding == 'br':
+        return brotli.compress(body, quality=min(level, 11))
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    return zlib.compress(body, level)
+
+# the Vary values already on a response with Accept-Encoding added, once
+def merged_vary(values):
+    fields = [field.strip() for value in values for field in value.split(b",") if field.strip()]
+    if b"*" not in fields and b"accept-encoding" not in (field.lower() for field in fields):
+        fields.append(b"Accept-Encoding")
+    return b", ".join(fields)
+
+# picks the encoding to use from an Accept-Encoding header, or None
+def negotiate(accept_encoding):
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    wildcard = accepted.get('*', 0.0)
+    best = None
+    best_quality = 0.0
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best = encoding
+            best_quality = quality
+    return best
+
+# ASGI middleware compressing response bodies of at least `minimum_size`
+# bytes with the best encoding the client accepts. streamed responses (SSE)
+# and bodies that are already encoded are passed through untouched. a
+# compressed body's ETag is made weak, since its bytes aren't those of the
+# uncompressed body, and Accept-Encoding is added to any Vary already there
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=1024, level=6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = negotiate(value.decode('latin-1'))
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                # held back until we know whether the body gets compressed
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            if start is not None:
+                body = message.get("body", b"")
+                headers = start["headers"]
+                streaming = message.get("more_body", False)
+                encoded = any(name == b"content-encoding" for name, _ in headers)
+                if streaming or encoded or len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+
+                compressed = compress(encoding, body, self.level)
+                start["headers"] = [
+                    (name, value) for name, value in headers if name not in (b"content-length", b"etag", b"vary")
+                ] + [
+                    (b"content-encoding", encoding.encode('latin-1')),
+                    (b"content-length", str(len(compressed)).encode('latin-1')),
+                    (b"vary", merged_vary(value for name, value in headers if name == b"vary")),
+                ] + [
+                    (b"etag", value if value.startswith(b"W/") else b"W/" + value)
+                    for name, value in headers if name == b"etag"
+                ]
+                await send(start)
+                start = None
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,63 @@
+import math
+import time
+from contextvars import ContextVar
+from starlette.responses import JSONResponse
+
+# when the HTTP request being handled has to be answered by, on the monotonic clock
+request_deadline = ContextVar('request_deadline', default=None)
+
+# whether the client shortened the request's budget with X-Request-Timeout
+request_deadline_shortened = ContextVar('request_deadline_shortened', default=False)
+
+class DeadlineExceeded(Exception):
+    pass
+
+# seconds left for a backend call made on behalf of the current request.
+# falls back to `default` outside a request
+def time_left(default):
+    deadline = request_deadline.get()
+    if deadline is None:
+        return default
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return remaining
+
+# whether the current request's budget is the gateway's own, so a backend
+# call running out of it says something about the backend. a client that
+# asks for less time than the default gets timeouts that don't
+def deadline_is_own():
+    return not request_deadline_shortened.get()
+
+# ASGI middleware giving every request a time budget. clients may ask for
+# a tighter (or, up to `max_timeout`, looser) budget with an
+# X-Request-Timeout header in seconds. every backend call then gets whatever
+# is left of it as its gRPC deadline, which the backends pass on downstream.
+# a header that isn't a finite, positive number of seconds is answered with 400
+class RequestDeadlineMiddleware:
+    def __init__(self, app, default_timeout, max_timeout):
+        self.app = app
+        self.default_timeout = default_timeout
+        self.max_timeout = max_timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            budget = self.default_timeout
+            for name, value in scope["headers"]:
+                if name == b"x-request-timeout":
+                    try:
+                        timeout = float(value)
+                    except ValueError:
+                        timeout = math.nan
+                    if not (math.isfinite(timeout) and timeout > 0):
+                        response = JSONResponse(
+                            status_code=400,
+                            content={"detail": "X-Request-Timeout must be a positive number of seconds"},
+                        )
+                        await response(scope, receive, send)
+                        return
+                    budget = min(timeout, self.max_timeout)
+                    break
+            request_deadline.set(time.monotonic() + budget)
+            request_deadline_shortened.set(budget < self.default_timeout)
+        await self.app(scope, receive, send)
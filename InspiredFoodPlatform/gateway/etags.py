@@ -0,0 +1,69 @@
+import zlib
+from fastapi.responses import Response
+
+# ETags are the record's version number, quoted, e.g. "3". a response that
+# the version alone doesn't pin down (only some of the fields, or a record
+# whose versions start over when its service restarts) adds a variant after
+# a dash, e.g. "3-1f8b0c2a", so its ETag never matches another body's
+def etag(version, variant=''):
+    return f'"{version}-{variant}"' if variant else f'"{version}"'
+
+# the variant for a response with only `fields` (as parsed by
+# gateway/fields.py, in the order they are rendered), '' for every field
+def fields_variant(fields):
+    if fields is None:
+        return ''
+    return f"{zlib.crc32(','.join(fields).encode()):08x}"
+
+# the variant for a response whose content the version doesn't pin down
+def content_variant(body):
+    return f"{zlib.crc32(body):08x}"
+
+# the tags in an If-None-Match header as (version, variant, weak), e.g.
+# '"3", W/"4-1f8b0c2a"' -> [(3, '', False), (4, '1f8b0c2a', True)]. tags
+# that aren't versions are left out
+def _tags(header):
+    tags = []
+    if not header:
+        return tags
+    for tag in header.split(','):
+        tag = tag.strip()
+        weak = tag.startswith('W/')
+        if weak:
+            tag = tag[2:]
+        version, _, tag_variant = tag.strip('"').partition('-')
+        if version.isdigit():
+            tags.append((int(version), tag_variant, weak))
+    return tags
+
+# versions listed with `variant` in an If-None-Match header, e.g.
+# '"3", W/"4"' -> {3, 4}. tags of other variants are left out. a weak tag
+# (a compressed body, see gateway/compression.py) matches like a strong one
+def requested_versions(header, variant=''):
+    return {version for version, tag_variant, _ in _tags(header) if tag_variant == variant}
+
+# the version an If-Match header asks for, e.g. '"3"' or '"3-1f8b0c2a"' -> 3.
+# 0 (any version) for no header or '*'; raises ValueError for anything else
+def expected_version(header):
+    if not header or header.strip() == '*':
+        return 0
+    tag = header.strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    version = tag.strip('"').partition('-')[0]
+    if not version.isdigit():
+        raise ValueError(f"If-Match must be a single version ETag, got {header!r}")
+    return int(version)
+
+# 304 for a client that already holds `version`, tagged the way the client
+# has it in `if_none_match`: weak if it was sent compressed, strong if not
+def not_modified(version, variant='', if_none_match=None):
+    tag = etag(version, variant)
+    held = [weak for tag_version, tag_variant, weak in _tags(if_none_match) if (tag_version, tag_variant) == (version, variant)]
+    if held and all(held):
+        tag = 'W/' + tag
+    return Response(status_code=304, headers={"ETag": tag})
+
+# JSON body tagged with the version it was rendered from
+def versioned_json(body, version, variant=''):
+    return Response(content=body, media_type="application/json", headers={"ETag": etag(version, variant)})
@@ -0,0 +1,21 @@
+from google.protobuf.field_mask_pb2 import FieldMask
+
+# "status,updated_at" from a ?fields= query -> ("status", "updated_at"), or
+# None when every field is wanted. raises ValueError on names not in `allowed`
+def parse_fields(value, allowed):
+    if not value:
+        return None
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in allowed:
+            raise ValueError(f"Unknown field {name!r}, expected some of {', '.join(allowed)}")
+        if name not in fields:
+            fields.append(name)
+    return tuple(fields) or None
+
+# FieldMask for a backend read, empty (every field) when `fields` is None
+def read_mask(fields):
+    return FieldMask(paths=fields or [])
@@ -5,8 +5,15 @@ sys.path.insert(0, project_root)
 sys.path.insert(0, os.path.join(project_root, 'order_service'))
 sys.path.insert(0, os.path.join(project_root, 'restaurant_service'))
 sys.path.insert(0, os.path.join(project_root, 'delivery_service'))
+import math
+import json
+import base64
+import asyncio
 import logging
-from fastapi import FastAPI, HTTPException, Body
+import functools
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Body, Header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 from typing import List, Optional
@@ -17,24 +24,212 @@ from restaurant_service import restaurant_service_pb2
 from restaurant_service import restaurant_service_pb2_grpc
 from delivery_service import delivery_service_pb2
 from delivery_service import delivery_service_pb2_grpc
+from gateway.cache import TTLCache
+from gateway.singleflight import SingleFlight
+from common.balancer import ReplicaPool, AsyncPooledStub, parse_addresses
+from common.breaker import CircuitOpenError, breaker_from_env
+from common.sharding import ShardedStub, parse_shards, shard_for
+from common.compression import grpc_compression
+from common.times import micros_from_iso
+from gateway.compression import CompressionMiddleware
+from gateway.deadlines import RequestDeadlineMiddleware, DeadlineExceeded, deadline_is_own, time_left
+from gateway.serializers import order_json, order_list_json, order_event_json, create_orders_json, restaurant_json, restaurant_summary_json, delivery_json, payments_json, tracking_json, overview_json
+from gateway.serializers import order_fields_json, restaurant_fields_json, delivery_fields_json, ORDER_FIELDS, RESTAURANT_FIELDS, DELIVERY_FIELDS
+from gateway.fields import parse_fields, read_mask
+from gateway.tracking import StreamHub, END
+from gateway.etags import etag, content_variant, fields_variant, expected_version, requested_versions, not_modified, versioned_json
+from gateway.metrics import RequestMetrics, MetricsMiddleware, InstrumentedStub, render_metrics
+from gateway.admission import Admission, AdmissionMiddleware, EXEMPT, parse_priority_classes, parse_route_classes
 
 logging.basicConfig(level=logging.INFO)
-# fastapi app 
-app = FastAPI(title="Inspired Food API Gateway")
 
 ORDER_SERVICE_ADDR = os.environ.get('ORDER_SERVICE_ADDR', 'order_service:50051')
 DELIVERY_SERVICE_ADDR = os.environ.get('DELIVERY_SERVICE_ADDR', 'delivery_service:50052')
 RESTAURANT_SERVICE_ADDR = os.environ.get('RESTAURANT_SERVICE_ADDR', 'restaurant_service:50053')
 
-# gRPC chanels and  stubs
-order_channel = grpc.insecure_channel(ORDER_SERVICE_ADDR)
-order_stub = order_service_pb2_grpc.OrderServiceStub(order_channel)
+# time budget for a request in seconds, unless the client sends X-Request-Timeout
+# (capped at MAX_REQUEST_TIMEOUT). backend calls get whatever is left of it as deadline
+GRPC_TIMEOUT = float(os.environ.get('GRPC_TIMEOUT', '5'))
+MAX_REQUEST_TIMEOUT = float(os.environ.get('MAX_REQUEST_TIMEOUT', '30'))
+
+# largest number of orders accepted by POST /orders:batch
+ORDER_BATCH_LIMIT = int(os.environ.get('ORDER_BATCH_LIMIT', '1000'))
+
+# (version, rendered JSON, rendered summary) for GET /restaurants/{id} and order
+# overviews, dropped as soon as the menu is updated
+restaurant_cache = TTLCache(
+    maxsize=int(os.environ.get('RESTAURANT_CACHE_SIZE', '1024')),
+    ttl=float(os.environ.get('RESTAURANT_CACHE_TTL', '30')),
+)
+
+# how long an order overview waits for the delivery and the restaurant
+# before it is sent without them
+OVERVIEW_PART_TIMEOUT = float(os.environ.get('OVERVIEW_PART_TIMEOUT', '1'))
+
+# longest Idempotency-Key accepted on POST /orders
+IDEMPOTENCY_KEY_LENGTH = 255
+
+# the order service's page size when a ListOrders request has none, and
+# its largest, for merging the pages of several shards
+ORDER_PAGE_SIZE = 50
+MAX_ORDER_PAGE_SIZE = 500
+
+# seconds between keepalive comments on an idle delivery tracking stream
+TRACK_KEEPALIVE = float(os.environ.get('TRACK_KEEPALIVE', '15'))
+
+# concurrent identical reads share a single in-flight backend call
+restaurant_flight = SingleFlight()
+order_flight = SingleFlight()
+delivery_flight = SingleFlight()
+
+# each *_SERVICE_ADDR may list several replicas, separated by commas
+REPLICA_EJECT_AFTER = int(os.environ.get('REPLICA_EJECT_AFTER', '3'))
+REPLICA_EJECT_SECONDS = float(os.environ.get('REPLICA_EJECT_SECONDS', '10'))
+
+# latency, in-flight and status counts per HTTP route and per backend RPC, served at /metrics
+http_metrics = RequestMetrics(("method", "route"))
+backend_metrics = RequestMetrics(("service", "method"))
+
+# priority class of each route, anything not listed is normal. ROUTE_PRIORITIES
+# adds to or overrides these, e.g. "GET /orders/{order_id}=low"
+ROUTE_PRIORITIES = {
+    ("POST", "/orders"): "critical",
+    ("POST", "/orders:batch"): "critical",
+    ("POST", "/restaurants/{restaurant_id}/orders/{order_id}/response"): "critical",
+    ("PUT", "/orders/{order_id}/status"): "critical",
+    ("POST", "/deliveries"): "critical",
+    ("PUT", "/deliveries/{delivery_id}/status"): "critical",
+    ("GET", "/"): "low",
+    ("GET", "/restaurants/{restaurant_id}"): "low",
+    ("GET", "/restaurants/{restaurant_id}/payments"): "low",
+    ("GET", "/metrics"): EXEMPT,
+    ("GET", "/metrics/summary"): EXEMPT,
+    ("GET", "/cache/stats"): EXEMPT,
+    ("GET", "/backends"): EXEMPT,
+    ("GET", "/admission/stats"): EXEMPT,
+}
+ROUTE_PRIORITIES.update(parse_route_classes(os.environ.get('ROUTE_PRIORITIES', '')))
+
+# rate limiting and load shedding, see gateway/admission.py. rates are
+# requests per second and 0 turns a limit off
+admission = Admission(
+    classes=parse_priority_classes(os.environ.get('PRIORITY_CLASSES', 'critical=1.0,normal=0.8,low=0.5')),
+    route_classes=ROUTE_PRIORITIES,
+    max_in_flight=int(os.environ.get('MAX_IN_FLIGHT', '512')),
+    global_rate=float(os.environ.get('GLOBAL_RATE_LIMIT', '0')),
+    global_burst=float(os.environ.get('GLOBAL_RATE_BURST', '0')),
+    client_rate=float(os.environ.get('CLIENT_RATE_LIMIT', '0')),
+    client_burst=float(os.environ.get('CLIENT_RATE_BURST', '0')),
+)
+
+# gRPC replica pools and stubs, created on startup so they bind to uvicorn's event loop.
+# the order service may be split into shards (ORDER_SERVICE_ADDR lists them
+# separated by semicolons), with a pool and stub each
+order_pools = None
+order_shard_stubs = None
+order_stub = None
+delivery_pool = None
+delivery_stub = None
+restaurant_pool = None
+restaurant_stub = None
+
+# gzip/deflate compression of messages sent to a backend, set per service
+# with ORDER_SERVICE_COMPRESSION etc. (default none)
+def create_pool(name, addresses, stub_class):
+    compression = grpc_compression(os.environ.get(f'{name.upper()}_COMPRESSION'))
+    return ReplicaPool(
+        addresses,
+        functools.partial(grpc.aio.insecure_channel, compression=compression),
+        stub_class,
+        eject_after=REPLICA_EJECT_AFTER,
+        eject_for=REPLICA_EJECT_SECONDS,
+        breaker=breaker_from_env(name),
+    )
+
+@asynccontextmanager
+async def lifespan(app):
+    global order_pools, order_shard_stubs, order_stub, delivery_pool, delivery_stub, restaurant_pool, restaurant_stub
+
+    # calls about an order go to the shard that owns it (common/sharding.py)
+    order_pools = [
+        create_pool('order_service', addresses, order_service_pb2_grpc.OrderServiceStub)
+        for addresses in parse_shards(ORDER_SERVICE_ADDR)
+    ]
+    order_shard_stubs = [InstrumentedStub(AsyncPooledStub(pool, own_deadline=deadline_is_own), 'order_service', backend_metrics) for pool in order_pools]
+    order_stub = ShardedStub(order_shard_stubs)
+
+    delivery_pool = create_pool('delivery_service', parse_addresses(DELIVERY_SERVICE_ADDR), delivery_service_pb2_grpc.DeliveryServiceStub)
+    delivery_stub = InstrumentedStub(AsyncPooledStub(delivery_pool, own_deadline=deadline_is_own), 'delivery_service', backend_metrics)
+
+    restaurant_pool = create_pool('restaurant_service', parse_addresses(RESTAURANT_SERVICE_ADDR), restaurant_service_pb2_grpc.RestaurantServiceStub)
+    restaurant_stub = InstrumentedStub(AsyncPooledStub(restaurant_pool, own_deadline=deadline_is_own), 'restaurant_service', backend_metrics)
+
+    yield
+
+    for pool in order_pools + [delivery_pool, restaurant_pool]:
+        for replica in pool.replicas:
+            await replica.channel.close()
+
+# fastapi app 
+app = FastAPI(title="Inspired Food API Gateway", lifespan=lifespan)
+app.add_middleware(RequestDeadlineMiddleware, default_timeout=GRPC_TIMEOUT, max_timeout=MAX_REQUEST_TIMEOUT)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get('HTTP_COMPRESSION_MIN_SIZE', '1024')),
+    level=int(os.environ.get('HTTP_COMPRESSION_LEVEL', '6')),
+)
+app.add_middleware(
+    AdmissionMiddleware,
+    admission=admission,
+    routes=app.router.routes,
+    client_header=os.environ.get('CLIENT_ID_HEADER'),
+)
+# outermost, so the recorded latency covers the other middleware too
+# and turned away requests are counted
+app.add_middleware(MetricsMiddleware, metrics=http_metrics, routes=app.router.routes)
+
+# deadline for the next backend call, what is left of the request's budget
+def backend_timeout():
+    return time_left(GRPC_TIMEOUT)
+
+# backend errors that mean the same for every route: the deadline ran out
+# or no replica could be reached
+def check_backend_error(e):
+    if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+        raise HTTPException(status_code=504, detail=str(e.details()))
+    if e.code() == grpc.StatusCode.UNAVAILABLE:
+        raise HTTPException(status_code=503, detail=str(e.details()))
 
-delivery_channel = grpc.insecure_channel(DELIVERY_SERVICE_ADDR)
-delivery_stub = delivery_service_pb2_grpc.DeliveryServiceStub(delivery_channel)
+# a backend that is up but can't take this call yet (the order service
+# before its first menus arrive) says so with FAILED_PRECONDITION and a
+# retry-after trailer, which isn't counted against it as UNAVAILABLE would be
+def check_retry_later(e):
+    if e.code() != grpc.StatusCode.FAILED_PRECONDITION:
+        return
+    for key, value in e.trailing_metadata() or ():
+        if key == 'retry-after':
+            raise HTTPException(status_code=503, detail=str(e.details()), headers={"Retry-After": value})
 
-restaurant_channel = grpc.insecure_channel(RESTAURANT_SERVICE_ADDR)
-restaurant_stub = restaurant_service_pb2_grpc.RestaurantServiceStub(restaurant_channel)
+# the fields named by a ?fields= query, None for every field
+def requested_fields(value, allowed):
+    try:
+        return parse_fields(value, allowed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# a backend's circuit breaker is open, fail fast
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+# the request's time budget ran out before a backend call could be made
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request, exc):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
 
 # pydantic models for request validation
 class OrderItemModel(BaseModel):
@@ -53,6 +248,9 @@ class CreateOrderModel(BaseModel):
     delivery_address: str
     special_instructions: Optional[str] = None
 
+class CreateOrdersModel(BaseModel):
+    orders: List[CreateOrderModel]
+
 class MenuItemModel(BaseModel):
     item_id: str
     name: str
@@ -64,31 +262,48 @@ class UpdateMenuModel(BaseModel):
     restaurant_id: str
     menu_items: List[MenuItemModel]
 
+# (version, JSON, summary JSON, ETag variant) of a restaurant, from the cache when it is there
+async def load_restaurant(restaurant_id):
+    cached = restaurant_cache.get(restaurant_id)
+    if cached is not None:
+        return cached
+
+    # one backend call per restaurant however many requests miss the cache at once
+    async def fetch():
+        generation = restaurant_cache.generation(restaurant_id)
+        request = restaurant_service_pb2.GetRestaurantRequest(restaurant_id=restaurant_id)
+        response = await restaurant_stub.GetRestaurant(request, timeout=backend_timeout())
+        
+        body = restaurant_json(response)
+        rendered = (response.version, body, restaurant_summary_json(response), content_variant(body))
+        restaurant_cache.set(restaurant_id, rendered, generation)
+        return rendered
+
+    return await restaurant_flight.do(restaurant_id, fetch)
+
 # route to get restaurant details
 @app.get("/restaurants/{restaurant_id}")
-async def get_restaurant(restaurant_id: str):
-    request = restaurant_service_pb2.GetRestaurantRequest(restaurant_id=restaurant_id)
+async def get_restaurant(restaurant_id: str, fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    fields = requested_fields(fields, RESTAURANT_FIELDS)
+    
+    # the restaurant service keeps menus in memory and numbers versions from
+    # 1 again when it restarts, so the ETag carries a hash of the body too
     try:
-        response = restaurant_stub.GetRestaurant(request)
-        
-        menu_items = []
-        for item in response.menu_items:
-            menu_items.append({
-                "item_id": item.item_id,
-                "name": item.name,
-                "description": item.description,
-                "price": item.price,
-                "available": item.available
-            })
-            
-        return {
-            "restaurant_id": response.restaurant_id,
-            "name": response.name,
-            "address": response.address,
-            "is_open": response.is_open,
-            "menu_items": menu_items
-        }
+        # the cache holds whole restaurants, so only some of the fields
+        # are asked of the restaurant service directly
+        if fields is not None:
+            request = restaurant_service_pb2.GetRestaurantRequest(restaurant_id=restaurant_id, read_mask=read_mask(fields))
+            response = await restaurant_flight.do(restaurant_id, lambda: restaurant_stub.GetRestaurant(request, timeout=backend_timeout()), fields)
+            body = restaurant_fields_json(response, fields)
+            version, variant = response.version, content_variant(body)
+        else:
+            # a cached copy answers conditional requests without a backend call
+            version, body, _, variant = await load_restaurant(restaurant_id)
+        if version in requested_versions(if_none_match, variant):
+            return not_modified(version, variant, if_none_match)
+        return versioned_json(body, version, variant)
     except grpc.RpcError as e:
+        check_backend_error(e)
         logging.error(f"Restaurant Service error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -111,7 +326,8 @@ async def restaurant_order_response(
     )
     
     try:
-        response = order_stub.RestaurantOrderResponse(request)
+        response = await order_stub.RestaurantOrderResponse(request, timeout=backend_timeout())
+        order_flight.forget(order_id)
         
         result = {
             "order_id": response.order_id,
@@ -124,6 +340,7 @@ async def restaurant_order_response(
             
         return result
     except grpc.RpcError as e:
+        check_backend_error(e)
         status_code = e.code()
         if status_code == grpc.StatusCode.NOT_FOUND:
             raise HTTPException(status_code=404, detail=str(e.details()))
@@ -154,7 +371,9 @@ async def update_menu(restaurant_id: str, menu_data: UpdateMenuModel):
     )
     
     try:
-        response = restaurant_stub.UpdateMenu(request)
+        response = await restaurant_stub.UpdateMenu(request, timeout=backend_timeout())
+        restaurant_cache.invalidate(restaurant_id)
+        restaurant_flight.forget(restaurant_id)
         
         result_items = []
         for item in response.menu_items:
@@ -170,6 +389,10 @@ async def update_menu(restaurant_id: str, menu_data: UpdateMenuModel):
             "menu_items": result_items
         }
     except grpc.RpcError as e:
+        # a timed out update may still have been applied
+        restaurant_cache.invalidate(restaurant_id)
+        restaurant_flight.forget(restaurant_id)
+        check_backend_error(e)
         logging.error(f"Restaurant Service error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -178,29 +401,19 @@ async def update_menu(restaurant_id: str, menu_data: UpdateMenuModel):
 async def get_restaurant_payments(restaurant_id: str):
     try:
         request = restaurant_service_pb2.GetRestaurantPaymentsRequest(restaurant_id=restaurant_id)
-        response = restaurant_stub.GetRestaurantPayments(request)
-        
-        payments = []
-        for payment in response.payments:
-            payments.append({
-                "payment_id": payment.payment_id,
-                "order_id": payment.order_id,
-                "amount": payment.amount,
-                "status": payment.status,
-                "timestamp": payment.timestamp
-            })
+        response = await restaurant_stub.GetRestaurantPayments(request, timeout=backend_timeout())
         
-        return payments
+        return Response(content=payments_json(response), media_type="application/json")
     except grpc.RpcError as e:
+        check_backend_error(e)
         status_code = e.code()
         if status_code == grpc.StatusCode.NOT_FOUND:
             raise HTTPException(status_code=404, detail=str(e.details()))
         else:
             raise HTTPException(status_code=500, detail=str(e))
 
-# route to create a new order
-@app.post("/orders")
-async def create_order(order_data: CreateOrderModel):
+# build a CreateOrderRequest from the validated request body
+def create_order_request(order_data):
     items = []
     for item in order_data.items:
         order_item = order_service_pb2.OrderItem(
@@ -212,7 +425,7 @@ async def create_order(order_data: CreateOrderModel):
         )
         items.append(order_item)
     
-    request = order_service_pb2.CreateOrderRequest(
+    return order_service_pb2.CreateOrderRequest(
         customer_name=order_data.customer_name,       
         customer_email=order_data.customer_email,    
         customer_phone=order_data.customer_phone or "",
@@ -221,97 +434,294 @@ async def create_order(order_data: CreateOrderModel):
         delivery_address=order_data.delivery_address,
         special_instructions=order_data.special_instructions or ""
     )
+
+# route to create a new order
+# a client retrying an order sends the same Idempotency-Key with every try,
+# and a retry gets the order the first try placed rather than a second one.
+# 422 if the key was used for a different order, 409 if the first try is
+# still being placed
+@app.post("/orders")
+async def create_order(order_data: CreateOrderModel, idempotency_key: Optional[str] = Header(None)):
+    request = create_order_request(order_data)
+    if idempotency_key is not None:
+        if not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {IDEMPOTENCY_KEY_LENGTH} characters")
+        request.idempotency_key = idempotency_key
     
     try:
-        response = order_stub.CreateOrder(request)
+        response = await order_stub.CreateOrder(request, timeout=backend_timeout())
         
-        result_items = []
-        for item in response.items:
-            item_dict = {
-                "item_id": item.item_id,
-                "quantity": item.quantity,
-                "name": item.name,
-                "price": item.price
-            }
-            if item.customizations:
-                item_dict["customizations"] = list(item.customizations)
-            result_items.append(item_dict)
-            
-        return {
-            "order_id": response.order_id,
-            "customer_name": response.customer_name,  
-            "customer_email": response.customer_email, 
-            "customer_phone": response.customer_phone,  
-            "restaurant_id": response.restaurant_id,
-            "items": result_items,
-            "delivery_address": response.delivery_address,
-            "special_instructions": response.special_instructions,
-            "status": order_service_pb2.OrderStatus.Name(response.status),
-            "total_amount": response.total_amount,
-            "created_at": response.created_at,
-            "updated_at": response.updated_at,
-        }
+        return Response(content=order_json(response), media_type="application/json")
+    except grpc.RpcError as e:
+        check_backend_error(e)
+        check_retry_later(e)
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            raise HTTPException(status_code=400, detail=str(e.details()))
+        if e.code() == grpc.StatusCode.FAILED_PRECONDITION:
+            raise HTTPException(status_code=422, detail=str(e.details()))
+        if e.code() == grpc.StatusCode.ABORTED:
+            raise HTTPException(status_code=409, detail=str(e.details()))
+        logging.error(f"Order Service error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# route to create many orders in one call, each order succeeds or fails on its own
+@app.post("/orders:batch")
+async def create_orders(batch_data: CreateOrdersModel):
+    if len(batch_data.orders) > ORDER_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {ORDER_BATCH_LIMIT} orders per batch")
+    
+    order_requests = [create_order_request(order_data) for order_data in batch_data.orders]
+    
+    try:
+        response = await order_stub.CreateOrders(iter(order_requests), timeout=backend_timeout())
+        
+        return Response(content=create_orders_json(response), media_type="application/json")
+    except grpc.RpcError as e:
+        check_backend_error(e)
+        check_retry_later(e)
+        logging.error(f"Order Service error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# an order status from a query, by name (ORDER_PENDING or PENDING) or number
+def order_status(value):
+    name = value.strip().upper()
+    if name.isdigit() and int(name) in order_service_pb2.OrderStatus.values():
+        return int(name)
+    for candidate in (name, 'ORDER_' + name):
+        if candidate in order_service_pb2.OrderStatus.keys():
+            return order_service_pb2.OrderStatus.Value(candidate)
+    raise HTTPException(status_code=400, detail=f"Unknown order status {value!r}")
+
+# orders are listed by (creation time, id), and a page token is the
+# position of the last order on the previous page, as the order service makes them
+def order_page_key(order):
+    return (micros_from_iso(order.created_at), order.order_id)
+
+def order_page_token(order):
+    return base64.urlsafe_b64encode(json.dumps(order_page_key(order)).encode()).decode()
+
+# ListOrders on every order shard at once, merged into one page. each shard
+# sends its own first page after the same position, so the first
+# `page_size` of them all are the page, and the next starts after its last
+async def list_order_shards(request):
+    if len(order_shard_stubs) == 1:
+        return await order_shard_stubs[0].ListOrders(request, timeout=backend_timeout())
+
+    shard_request = order_service_pb2.ListOrdersRequest()
+    shard_request.CopyFrom(request)
+    if shard_request.read_mask.paths:
+        # needed to merge, left out of the JSON unless asked for
+        shard_request.read_mask.paths.extend(
+            name for name in ('order_id', 'created_at') if name not in shard_request.read_mask.paths
+        )
+    responses = await asyncio.gather(*[
+        stub.ListOrders(shard_request, timeout=backend_timeout()) for stub in order_shard_stubs
+    ])
+
+    orders = [order for response in responses for order in response.orders]
+    orders.sort(key=order_page_key, reverse=not request.oldest_first)
+    page_size = min(request.page_size or ORDER_PAGE_SIZE, MAX_ORDER_PAGE_SIZE)
+    more = len(orders) > page_size or any(response.next_page_token for response in responses)
+    orders = orders[:page_size]
+    return order_service_pb2.ListOrdersResponse(
+        orders=orders,
+        next_page_token=order_page_token(orders[-1]) if more and orders else '',
+    )
+
+# route to list orders, e.g. a restaurant's pending orders for its dashboard.
+# newest first, `limit` at a time; pass the response's next_cursor as
+# `cursor` for the next page
+@app.get("/orders")
+async def list_orders(
+    restaurant_id: Optional[str] = None,
+    status: Optional[str] = None,
+    customer_email: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    order: str = "newest",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    if order not in ("newest", "oldest"):
+        raise HTTPException(status_code=400, detail="order must be newest or oldest")
+    fields = requested_fields(fields, ORDER_FIELDS)
+    request = order_service_pb2.ListOrdersRequest(
+        restaurant_id=restaurant_id or "",
+        status=order_status(status) if status else order_service_pb2.ORDER_UNKNOWN,
+        customer_email=customer_email or "",
+        created_after=created_after or "",
+        created_before=created_before or "",
+        oldest_first=order == "oldest",
+        page_size=limit,
+        page_token=cursor or "",
+        read_mask=read_mask(fields),
+    )
+    try:
+        response = await list_order_shards(request)
+        
+        return Response(content=order_list_json(response, fields), media_type="application/json")
     except grpc.RpcError as e:
+        check_backend_error(e)
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            raise HTTPException(status_code=400, detail=str(e.details()))
         logging.error(f"Order Service error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # route to get order details
 @app.get("/orders/{order_id}")
-async def get_order(order_id: str):
-    request = order_service_pb2.GetOrderRequest(order_id=order_id)
+async def get_order(order_id: str, fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    # tell the order service which version the client holds so it can skip sending it,
+    # and which fields it wants (?fields=status,updated_at) so it can skip the rest
+    # a body with only some fields is tagged apart from the whole order's
+    fields = requested_fields(fields, ORDER_FIELDS)
+    variant = fields_variant(fields)
+    known_versions = requested_versions(if_none_match, variant)
+    if_version = max(known_versions, default=0)
+    request = order_service_pb2.GetOrderRequest(order_id=order_id, if_version=if_version, read_mask=read_mask(fields))
     try:
-        response = order_stub.GetOrder(request)
+        response = await order_flight.do(order_id, lambda: order_stub.GetOrder(request, timeout=backend_timeout()), (if_version, fields))
         
-        result_items = []
-        for item in response.items:
-            item_dict = {
-                "item_id": item.item_id,
-                "quantity": item.quantity,
-                "name": item.name,
-                "price": item.price
-            }
-            if item.customizations:
-                item_dict["customizations"] = list(item.customizations)
-            result_items.append(item_dict)
-            
-        return {
-            "order_id": response.order_id,
-            "customer_name": response.customer_name, 
-            "customer_email": response.customer_email,  
-            "customer_phone": response.customer_phone,  
-            "restaurant_id": response.restaurant_id,
-            "items": result_items,
-            "delivery_address": response.delivery_address,
-            "special_instructions": response.special_instructions,
-            "status": order_service_pb2.OrderStatus.Name(response.status),
-            "total_amount": response.total_amount,
-            "created_at": response.created_at,
-            "updated_at": response.updated_at,
-        }
+        if response.version in known_versions:
+            return not_modified(response.version, variant, if_none_match)
+        body = order_json(response) if fields is None else order_fields_json(response, fields)
+        return versioned_json(body, response.version, variant)
+    except grpc.RpcError as e:
+        check_backend_error(e)
+        logging.error(f"Order Service error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# an optional part of a composite response, JSON or None. a part that
+# doesn't exist (NOT_FOUND) is None, one that failed or timed out is also
+# None and its name is added to `unavailable`
+async def optional_part(name, fetch, unavailable):
+    try:
+        return await fetch
+    except grpc.RpcError as e:
+        if e.code() != grpc.StatusCode.NOT_FOUND:
+            logging.warning(f"Leaving {name} out of the response: {e.code().name} {e.details()}")
+            unavailable.append(name)
+        return None
+    except (asyncio.TimeoutError, CircuitOpenError, DeadlineExceeded) as e:
+        logging.warning(f"Leaving {name} out of the response: {e!r}")
+        unavailable.append(name)
+        return None
+
+# route to get an order together with its delivery and a restaurant summary,
+# for the order screen. the delivery is fetched at the same time as the order,
+# the restaurant (usually from the cache) as soon as the order names it. if
+# either takes longer than OVERVIEW_PART_TIMEOUT or fails, the overview is
+# sent without it
+@app.get("/orders/{order_id}/overview")
+async def get_order_overview(order_id: str):
+    unavailable = []
+    
+    async def fetch_delivery():
+        request = delivery_service_pb2.GetDeliveryByOrderRequest(order_id=order_id)
+        response = await delivery_stub.GetDeliveryByOrder(request, timeout=min(OVERVIEW_PART_TIMEOUT, backend_timeout()))
+        return delivery_json(response)
+    
+    async def fetch_restaurant(restaurant_id):
+        _, _, summary, _ = await asyncio.wait_for(load_restaurant(restaurant_id), min(OVERVIEW_PART_TIMEOUT, backend_timeout()))
+        return summary
+    
+    delivery_task = asyncio.ensure_future(optional_part("delivery", fetch_delivery(), unavailable))
+    try:
+        request = order_service_pb2.GetOrderRequest(order_id=order_id)
+        order = await order_flight.do(order_id, lambda: order_stub.GetOrder(request, timeout=backend_timeout()), (0, None))
     except grpc.RpcError as e:
+        delivery_task.cancel()
+        check_backend_error(e)
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            raise HTTPException(status_code=404, detail=str(e.details()))
         logging.error(f"Order Service error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    except BaseException:
+        delivery_task.cancel()
+        raise
+    
+    restaurant = await optional_part("restaurant", fetch_restaurant(order.restaurant_id), unavailable)
+    delivery = await delivery_task
+    
+    return Response(content=overview_json(order_json(order), delivery, restaurant, unavailable), media_type="application/json")
 
-# route to update order status
+# route to update order status. with If-Match: "<version>" the change only
+# applies if the order is still at that version (412 if not), and moves the
+# order statuses don't allow, e.g. DELIVERED back to PREPARING, get 409
 @app.put("/orders/{order_id}/status")
-async def update_order_status(order_id: str, status: int = Body(..., embed=True)):
+async def update_order_status(order_id: str, status: int = Body(..., embed=True), if_match: Optional[str] = Header(None)):
+    try:
+        version = expected_version(if_match)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     request = order_service_pb2.UpdateOrderStatusRequest(
         order_id=order_id,
-        status=status
+        status=status,
+        expected_version=version,
     )
     
     try:
-        response = order_stub.UpdateOrderStatus(request)
+        response = await order_stub.UpdateOrderStatus(request, timeout=backend_timeout())
+        order_flight.forget(order_id)
         
-        return {
+        return JSONResponse(content={
             "order_id": response.order_id,
             "status": order_service_pb2.OrderStatus.Name(response.status),
-            "updated_at": response.updated_at
-        }
+            "updated_at": response.updated_at,
+            "version": response.version,
+        }, headers={"ETag": etag(response.version)})
     except grpc.RpcError as e:
+        check_backend_error(e)
+        status_code = e.code()
+        if status_code == grpc.StatusCode.NOT_FOUND:
+            raise HTTPException(status_code=404, detail=str(e.details()))
+        elif status_code == grpc.StatusCode.INVALID_ARGUMENT:
+            raise HTTPException(status_code=400, detail=str(e.details()))
+        elif status_code == grpc.StatusCode.ABORTED:
+            raise HTTPException(status_code=412, detail=str(e.details()))
+        elif status_code == grpc.StatusCode.FAILED_PRECONDITION:
+            raise HTTPException(status_code=409, detail=str(e.details()))
         logging.error(f"Order Service error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# one WatchOrder stream on a replica of the order's shard
+async def watch_order_updates(order_id):
+    order_pool = order_pools[shard_for(order_id, len(order_pools))]
+    replica = order_pool.pick()
+    call = replica.stub.WatchOrder(order_service_pb2.WatchOrderRequest(order_id=order_id))
+    code = None
+    recorded = False
+    try:
+        async for update in call:
+            # the breaker hears of the stream at its first update, as for
+            # TrackDelivery streams, so it holds no half open trial slot
+            if not recorded:
+                order_pool.record()
+                recorded = True
+            yield update
+    except grpc.RpcError as e:
+        code = e.code()
+        raise
+    finally:
+        call.cancel()
+        # a stream turned away at the order service's limit isn't a failure
+        order_pool.release(replica, None if code == grpc.StatusCode.RESOURCE_EXHAUSTED else code, recorded=recorded)
+
+# every client watching an order shares one upstream stream
+order_watching = StreamHub(watch_order_updates)
+
+# route to follow an order's status as server-sent events instead of polling
+# GET /orders/{id}. the first event is the status now, then one per change;
+# the stream ends after a final status. each event's id is the order version
+@app.get("/orders/{order_id}/watch")
+async def watch_order(order_id: str):
+    updates = order_watching.subscribe(order_id)
+    first = await first_update(order_watching, order_id, updates, "Order Service")
+    return event_stream(
+        order_watching, order_id, updates, first,
+        lambda event: b"id: " + str(event.version).encode() + b"\ndata: " + order_event_json(event) + b"\n\n",
+    )
+
 #  route to assign a driver for an order 
 @app.post("/deliveries")
 async def assign_driver(order_id: str = Body(...), driver_id: str = Body(...)):
@@ -321,60 +731,127 @@ async def assign_driver(order_id: str = Body(...), driver_id: str = Body(...)):
     )
     
     try:
-        response = delivery_stub.AssignDriver(request)
-        
-        result = {
-            "delivery_id": response.delivery_id,
-            "order_id": response.order_id,
-            "driver_id": response.driver_id,
-            "restaurant_address": response.restaurant_address,
-            "customer_address": response.customer_address,
-            "status": delivery_service_pb2.DeliveryStatus.Name(response.status),
-            "current_location": response.current_location,
-            "assigned_at": response.assigned_at,
-        }
+        response = await delivery_stub.AssignDriver(request, timeout=backend_timeout())
+        order_flight.forget(order_id)
         
-        if hasattr(response, 'picked_up_at') and response.picked_up_at:
-            result["picked_up_at"] = response.picked_up_at
-            
-        if hasattr(response, 'delivered_at') and response.delivered_at:
-            result["delivered_at"] = response.delivered_at
-            
-        return result
+        return Response(content=delivery_json(response), media_type="application/json")
     except grpc.RpcError as e:
+        check_backend_error(e)
+        status_code = e.code()
+        if status_code == grpc.StatusCode.NOT_FOUND:
+            raise HTTPException(status_code=404, detail=str(e.details()))
+        elif status_code == grpc.StatusCode.INVALID_ARGUMENT:
+            raise HTTPException(status_code=400, detail=str(e.details()))
+        elif status_code in (grpc.StatusCode.FAILED_PRECONDITION, grpc.StatusCode.ABORTED):
+            raise HTTPException(status_code=409, detail=str(e.details()))
         logging.error(f"Delivery Service error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # route to get delivery details
 @app.get("/deliveries/{delivery_id}")
-async def get_delivery(delivery_id: str):
-    request = delivery_service_pb2.GetDeliveryRequest(delivery_id=delivery_id)
+async def get_delivery(delivery_id: str, fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    # tell the delivery service which version the client holds so it can skip sending it,
+    # and which fields it wants so it can skip the rest
+    # a body with only some fields is tagged apart from the whole delivery's
+    fields = requested_fields(fields, DELIVERY_FIELDS)
+    variant = fields_variant(fields)
+    known_versions = requested_versions(if_none_match, variant)
+    if_version = max(known_versions, default=0)
+    request = delivery_service_pb2.GetDeliveryRequest(delivery_id=delivery_id, if_version=if_version, read_mask=read_mask(fields))
     
     try:
-        response = delivery_stub.GetDelivery(request)
+        response = await delivery_flight.do(delivery_id, lambda: delivery_stub.GetDelivery(request, timeout=backend_timeout()), (if_version, fields))
         
-        result = {
-            "delivery_id": response.delivery_id,
-            "order_id": response.order_id,
-            "driver_id": response.driver_id,
-            "restaurant_address": response.restaurant_address,
-            "customer_address": response.customer_address,
-            "status": delivery_service_pb2.DeliveryStatus.Name(response.status),
-            "current_location": response.current_location,
-            "assigned_at": response.assigned_at,
-        }
-        
-        if hasattr(response, 'picked_up_at') and response.picked_up_at:
-            result["picked_up_at"] = response.picked_up_at
-            
-        if hasattr(response, 'delivered_at') and response.delivered_at:
-            result["delivered_at"] = response.delivered_at
-            
-        return result
+        if response.version in known_versions:
+            return not_modified(response.version, variant, if_none_match)
+        body = delivery_json(response) if fields is None else delivery_fields_json(response, fields)
+        return versioned_json(body, response.version, variant)
     except grpc.RpcError as e:
+        check_backend_error(e)
         logging.error(f"Delivery Service error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# the first update on a StreamHub subscription. if the stream fails or
+# times out first, unsubscribes and raises the matching HTTP error
+async def first_update(hub, key, updates, service):
+    try:
+        first = await asyncio.wait_for(updates.get(), backend_timeout())
+    except asyncio.TimeoutError:
+        hub.unsubscribe(key, updates)
+        raise HTTPException(status_code=504, detail=f"{service} did not respond in time")
+    
+    if isinstance(first, grpc.RpcError):
+        hub.unsubscribe(key, updates)
+        if first.code() == grpc.StatusCode.NOT_FOUND:
+            raise HTTPException(status_code=404, detail=str(first.details()))
+        if first.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            raise HTTPException(status_code=503, detail=str(first.details()))
+        check_backend_error(first)
+        logging.error(f"{service} error: {first}")
+        raise HTTPException(status_code=500, detail=str(first))
+    if isinstance(first, Exception):
+        hub.unsubscribe(key, updates)
+        raise first
+    return first
+
+# server-sent events for a StreamHub subscription, `render(update)` -> event
+# bytes, starting with `first`. a comment every TRACK_KEEPALIVE seconds keeps
+# a quiet stream open
+def event_stream(hub, key, updates, first, render):
+    async def events():
+        try:
+            yield render(first)
+            while True:
+                try:
+                    update = await asyncio.wait_for(updates.get(), TRACK_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if update is END or isinstance(update, Exception):
+                    break
+                yield render(update)
+        finally:
+            hub.unsubscribe(key, updates)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# one TrackDelivery stream on a delivery service replica
+async def track_delivery_updates(delivery_id):
+    replica = delivery_pool.pick()
+    call = replica.stub.TrackDelivery(delivery_service_pb2.TrackDeliveryRequest(delivery_id=delivery_id))
+    code = None
+    recorded = False
+    try:
+        async for update in call:
+            # the first update shows the backend is up. the breaker hears so
+            # now, rather than when the stream ends, so a stream opened while
+            # it is half open doesn't keep a trial slot from other calls
+            if not recorded:
+                delivery_pool.record()
+                recorded = True
+            yield update
+    except grpc.RpcError as e:
+        code = e.code()
+        raise
+    finally:
+        call.cancel()
+        # no duration, a long lived stream says nothing about backend latency.
+        # a stream turned away at the delivery service's limit isn't a failure
+        delivery_pool.release(replica, None if code == grpc.StatusCode.RESOURCE_EXHAUSTED else code, recorded=recorded)
+
+# every client tracking a delivery shares one upstream stream
+delivery_tracking = StreamHub(track_delivery_updates)
+
+# route to follow a delivery live as server-sent events, one event per update
+@app.get("/deliveries/{delivery_id}/track")
+async def track_delivery(delivery_id: str):
+    updates = delivery_tracking.subscribe(delivery_id)
+    first = await first_update(delivery_tracking, delivery_id, updates, "Delivery Service")
+    return event_stream(
+        delivery_tracking, delivery_id, updates, first,
+        lambda update: b"data: " + tracking_json(update) + b"\n\n",
+    )
+
 # route to update delivery status
 @app.put("/deliveries/{delivery_id}/status")
 async def update_delivery_status(
@@ -389,7 +866,9 @@ async def update_delivery_status(
     )
     
     try:
-        response = delivery_stub.UpdateDeliveryStatus(request)
+        response = await delivery_stub.UpdateDeliveryStatus(request, timeout=backend_timeout())
+        delivery_flight.forget(delivery_id)
+        order_flight.forget(response.order_id)
         
         result = {
             "delivery_id": response.delivery_id,
@@ -399,6 +878,13 @@ async def update_delivery_status(
         
         return result
     except grpc.RpcError as e:
+        check_backend_error(e)
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            raise HTTPException(status_code=404, detail=str(e.details()))
+        # the order service refused the matching order change, e.g. the
+        # order was cancelled, and the delivery was left as it was
+        if e.code() in (grpc.StatusCode.FAILED_PRECONDITION, grpc.StatusCode.ABORTED):
+            raise HTTPException(status_code=409, detail=str(e.details()))
         logging.error(f"Delivery Service error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -414,6 +900,57 @@ async def root():
         }
     }
 
+# restaurant cache counters, used to size RESTAURANT_CACHE_SIZE and RESTAURANT_CACHE_TTL,
+# plus how many reads were coalesced onto an in-flight backend call
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "restaurants": restaurant_cache.stats(),
+        "coalescing": {
+            "restaurants": restaurant_flight.stats(),
+            "orders": order_flight.stats(),
+            "deliveries": delivery_flight.stats(),
+        },
+    }
+
+# requests waiting on a response, and admitted and turned away requests per priority class
+@app.get("/admission/stats")
+async def admission_stats():
+    return admission.stats()
+
+# replicas behind each backend, with requests in flight and ejection state,
+# and each backend's circuit breaker
+@app.get("/backends")
+async def backends():
+    def pool_stats(pool):
+        return {"replicas": pool.stats(), "breaker": pool.breaker.stats()}
+    
+    result = {
+        "order_service": pool_stats(order_pools[0]) if len(order_pools) == 1 else {"shards": [pool_stats(pool) for pool in order_pools]},
+        "delivery_service": pool_stats(delivery_pool),
+        "restaurant_service": pool_stats(restaurant_pool),
+    }
+    result["order_service"]["watching"] = order_watching.stats()
+    result["delivery_service"]["tracking"] = delivery_tracking.stats()
+    return result
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics():
+    body = render_metrics([
+        (http_metrics, "gateway_http", "status", "HTTP requests"),
+        (backend_metrics, "gateway_backend", "code", "Backend gRPC calls"),
+    ])
+    return Response(content=body, media_type="text/plain; version=0.0.4")
+
+# p50/p95/p99 latency per route and per backend RPC, estimated from the /metrics histograms
+@app.get("/metrics/summary")
+async def metrics_summary():
+    return {
+        "routes": http_metrics.summary(),
+        "backends": backend_metrics.summary(),
+    }
+
 # run FastAPI app using Uvicorn 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", "50050"))
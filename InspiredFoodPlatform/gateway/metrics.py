@@ -0,0 +1,212 @@
+import time
+import bisect
+import grpc
+from starlette.routing import Match
+from common.breaker import CircuitOpenError
+
+# upper bounds of the latency buckets in seconds, +Inf is implied
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # per bucket, not cumulative, last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # estimated the way Prometheus' histogram_quantile does it, by
+    # interpolating inside the bucket the quantile falls in
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+# latency histogram, in-flight gauge and per status code counter for each
+# combination of labels (route, backend method, ...). only ever updated
+# from the event loop thread, so plain ints and dicts do without locks
+class RequestMetrics:
+    def __init__(self, labels, buckets=LATENCY_BUCKETS):
+        self.labels = labels # label names, e.g. ("method", "route")
+        self.buckets = buckets
+        self.histograms = {} # label values -> Histogram
+        self.in_flight = {} # label values -> calls in progress
+        self.totals = {} # (label values, status code) -> finished calls
+
+    def started(self, labels):
+        self.in_flight[labels] = self.in_flight.get(labels, 0) + 1
+
+    def finished(self, labels, code, duration):
+        self.in_flight[labels] -= 1
+        histogram = self.histograms.get(labels)
+        if histogram is None:
+            histogram = self.histograms[labels] = Histogram(self.buckets)
+        histogram.observe(duration)
+        key = (labels, code)
+        self.totals[key] = self.totals.get(key, 0) + 1
+
+    # Prometheus text exposition lines for metrics named `<name>_...`
+    def render(self, name, code_label, description):
+        lines = [
+            f"# HELP {name}_requests_total {description} by status.",
+            f"# TYPE {name}_requests_total counter",
+        ]
+        for (labels, code), total in self.totals.items():
+            lines.append(f"{name}_requests_total{{{self._labels(labels, (code_label, code))}}} {total}")
+
+        lines += [
+            f"# HELP {name}_request_duration_seconds {description} latency.",
+            f"# TYPE {name}_request_duration_seconds histogram",
+        ]
+        for labels, histogram in self.histograms.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_request_duration_seconds_bucket{{{self._labels(labels, ('le', le))}}} {cumulative}")
+            lines.append(f"{name}_request_duration_seconds_sum{{{self._labels(labels)}}} {histogram.sum}")
+            lines.append(f"{name}_request_duration_seconds_count{{{self._labels(labels)}}} {histogram.count}")
+
+        lines += [
+            f"# HELP {name}_requests_in_flight {description} in progress.",
+            f"# TYPE {name}_requests_in_flight gauge",
+        ]
+        for labels, in_flight in self.in_flight.items():
+            lines.append(f"{name}_requests_in_flight{{{self._labels(labels)}}} {in_flight}")
+        return lines
+
+    def _labels(self, values, extra=None):
+        pairs = list(zip(self.labels, values))
+        if extra is not None:
+            pairs.append(extra)
+        return ",".join(f'{label}="{escape(value)}"' for label, value in pairs)
+
+    # count, p50/p95/p99 in milliseconds, in flight and status codes per label combination
+    def summary(self):
+        codes = {}
+        for (labels, code), total in self.totals.items():
+            codes.setdefault(labels, {})[code] = total
+
+        result = []
+        for labels, histogram in self.histograms.items():
+            entry = dict(zip(self.labels, labels))
+            entry["count"] = histogram.count
+            for name, q in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+                entry[name] = round(histogram.quantile(q) * 1000, 2)
+            entry["in_flight"] = self.in_flight.get(labels, 0)
+            entry["codes"] = codes.get(labels, {})
+            result.append(entry)
+        return result
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# the template of the route a request will be handled by, e.g.
+# /orders/{order_id}, matched up front so middleware knows it before the
+# router has run. kept on the scope so it is only worked out once
+def route_template(routes, scope):
+    template = scope.get("route_template")
+    if template is not None:
+        return template
+
+    template = None
+    path = scope["path"]
+    for route in routes:
+        # a bare regex test first, matches() builds a whole child scope
+        regex = getattr(route, "path_regex", None)
+        if regex is not None and regex.match(path) is None:
+            continue
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            template = route.path
+            break
+        if match == Match.PARTIAL and template is None:
+            template = route.path # right path, wrong method
+    template = template or "unmatched"
+    scope["route_template"] = template
+    return template
+
+# ASGI middleware recording every HTTP request by method, route template
+# (not the raw path, to keep the number of series bounded) and response
+# status. streamed responses count until they end. `routes` is the app's
+# route list
+class MetricsMiddleware:
+    def __init__(self, app, metrics, routes):
+        self.app = app
+        self.metrics = metrics
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        labels = (scope["method"], route_template(self.routes, scope))
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.started(labels)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.finished(labels, str(status), time.perf_counter() - start)
+
+# wraps a (pooled) stub so every unary call is recorded by service, method
+# and gRPC status code. CIRCUIT_OPEN marks calls refused by the breaker
+class InstrumentedStub:
+    def __init__(self, stub, service, metrics):
+        self._stub = stub
+        self._service = service
+        self._metrics = metrics
+
+    def __getattr__(self, method):
+        target = getattr(self._stub, method)
+        labels = (self._service, method)
+        metrics = self._metrics
+
+        async def call(*args, **kwargs):
+            metrics.started(labels)
+            start = time.perf_counter()
+            code = "OK"
+            try:
+                return await target(*args, **kwargs)
+            except grpc.RpcError as e:
+                code = e.code().name
+                raise
+            except CircuitOpenError:
+                code = "CIRCUIT_OPEN"
+                raise
+            except BaseException:
+                code = "CANCELLED"
+                raise
+            finally:
+                metrics.finished(labels, code, time.perf_counter() - start)
+
+        return call
+
+# the full /metrics page for the given (metrics, name, status label, description) families
+def render_metrics(families):
+    lines = []
+    for metrics, name, code_label, description in families:
+        lines += metrics.render(name, code_label, description)
+    return "\n".join(lines) + "\n"
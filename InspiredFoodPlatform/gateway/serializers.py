@@ -0,0 +1,261 @@
+import math
+from json.encoder import encode_basestring
+from order_service import order_service_pb2
+from delivery_service import delivery_service_pb2
+
+# protobuf -> JSON bytes for the gateway's read routes. each function writes
+# the document straight into a string, which skips building an intermediate
+# dict and FastAPI's jsonable_encoder pass over it. the output has the same
+# keys and values as the old hand built dicts
+
+# enum number -> name, looked up once at import instead of per response
+ORDER_STATUS_NAMES = {value.number: value.name for value in order_service_pb2.OrderStatus.DESCRIPTOR.values}
+DELIVERY_STATUS_NAMES = {value.number: value.name for value in delivery_service_pb2.DeliveryStatus.DESCRIPTOR.values}
+
+_string = encode_basestring # C accelerated, same escaping as json.dumps(ensure_ascii=False)
+
+def _float(value):
+    # JSONResponse refuses NaN and infinity, keep the same behaviour
+    if not math.isfinite(value):
+        raise ValueError(f"Out of range float value {value} is not JSON compliant")
+    return float.__repr__(value)
+
+def _bool(value):
+    return 'true' if value else 'false'
+
+def _strings(values):
+    return '[' + ','.join([_string(value) for value in values]) + ']'
+
+def _order_status(status):
+    name = ORDER_STATUS_NAMES.get(status)
+    return name if name is not None else order_service_pb2.OrderStatus.Name(status)
+
+def _delivery_status(status):
+    name = DELIVERY_STATUS_NAMES.get(status)
+    return name if name is not None else delivery_service_pb2.DeliveryStatus.Name(status)
+
+def _order_item(item):
+    text = (
+        '{"item_id":' + _string(item.item_id)
+        + ',"quantity":' + str(item.quantity)
+        + ',"name":' + _string(item.name)
+        + ',"price":' + _float(item.price)
+    )
+    if item.customizations:
+        text += ',"customizations":' + _strings(item.customizations)
+    return text + '}'
+
+def _order(response):
+    return (
+        '{"order_id":' + _string(response.order_id)
+        + ',"customer_name":' + _string(response.customer_name)
+        + ',"customer_email":' + _string(response.customer_email)
+        + ',"customer_phone":' + _string(response.customer_phone)
+        + ',"restaurant_id":' + _string(response.restaurant_id)
+        + ',"items":[' + ','.join([_order_item(item) for item in response.items]) + ']'
+        + ',"delivery_address":' + _string(response.delivery_address)
+        + ',"special_instructions":' + _string(response.special_instructions)
+        + ',"status":"' + _order_status(response.status) + '"'
+        + ',"total_amount":' + _float(response.total_amount)
+        + ',"created_at":' + _string(response.created_at)
+        + ',"updated_at":' + _string(response.updated_at)
+        + '}'
+    )
+
+def _menu_item(item):
+    return (
+        '{"item_id":' + _string(item.item_id)
+        + ',"name":' + _string(item.name)
+        + ',"description":' + _string(item.description)
+        + ',"price":' + _float(item.price)
+        + ',"available":' + _bool(item.available)
+        + '}'
+    )
+
+def _restaurant(response):
+    return (
+        '{"restaurant_id":' + _string(response.restaurant_id)
+        + ',"name":' + _string(response.name)
+        + ',"address":' + _string(response.address)
+        + ',"is_open":' + _bool(response.is_open)
+        + ',"menu_items":[' + ','.join([_menu_item(item) for item in response.menu_items]) + ']'
+        + '}'
+    )
+
+# the restaurant without its menu
+def _restaurant_summary(response):
+    return (
+        '{"restaurant_id":' + _string(response.restaurant_id)
+        + ',"name":' + _string(response.name)
+        + ',"address":' + _string(response.address)
+        + ',"is_open":' + _bool(response.is_open)
+        + '}'
+    )
+
+def _delivery(response):
+    text = (
+        '{"delivery_id":' + _string(response.delivery_id)
+        + ',"order_id":' + _string(response.order_id)
+        + ',"driver_id":' + _string(response.driver_id)
+        + ',"restaurant_address":' + _string(response.restaurant_address)
+        + ',"customer_address":' + _string(response.customer_address)
+        + ',"status":"' + _delivery_status(response.status) + '"'
+        + ',"current_location":' + _string(response.current_location)
+        + ',"assigned_at":' + _string(response.assigned_at)
+    )
+    if response.picked_up_at:
+        text += ',"picked_up_at":' + _string(response.picked_up_at)
+    if response.delivered_at:
+        text += ',"delivered_at":' + _string(response.delivered_at)
+    return text + '}'
+
+def _payment(payment):
+    return (
+        '{"payment_id":' + _string(payment.payment_id)
+        + ',"order_id":' + _string(payment.order_id)
+        + ',"amount":' + _float(payment.amount)
+        + ',"status":' + _string(payment.status)
+        + ',"timestamp":' + _string(payment.timestamp)
+        + '}'
+    )
+
+def _order_result(result):
+    if result.WhichOneof("result") == "order":
+        return '{"index":' + str(result.index) + ',"order":' + _order(result.order) + '}'
+    return '{"index":' + str(result.index) + ',"error":' + _string(result.error) + '}'
+
+# field name -> JSON value, for sparse responses (?fields=) that only carry
+# some fields. the names and values are the same as in the full documents
+ORDER_FIELDS = {
+    'order_id': lambda response: _string(response.order_id),
+    'customer_name': lambda response: _string(response.customer_name),
+    'customer_email': lambda response: _string(response.customer_email),
+    'customer_phone': lambda response: _string(response.customer_phone),
+    'restaurant_id': lambda response: _string(response.restaurant_id),
+    'items': lambda response: '[' + ','.join([_order_item(item) for item in response.items]) + ']',
+    'delivery_address': lambda response: _string(response.delivery_address),
+    'special_instructions': lambda response: _string(response.special_instructions),
+    'status': lambda response: '"' + _order_status(response.status) + '"',
+    'total_amount': lambda response: _float(response.total_amount),
+    'created_at': lambda response: _string(response.created_at),
+    'updated_at': lambda response: _string(response.updated_at),
+}
+
+RESTAURANT_FIELDS = {
+    'restaurant_id': lambda response: _string(response.restaurant_id),
+    'name': lambda response: _string(response.name),
+    'address': lambda response: _string(response.address),
+    'is_open': lambda response: _bool(response.is_open),
+    'menu_items': lambda response: '[' + ','.join([_menu_item(item) for item in response.menu_items]) + ']',
+}
+
+DELIVERY_FIELDS = {
+    'delivery_id': lambda response: _string(response.delivery_id),
+    'order_id': lambda response: _string(response.order_id),
+    'driver_id': lambda response: _string(response.driver_id),
+    'restaurant_address': lambda response: _string(response.restaurant_address),
+    'customer_address': lambda response: _string(response.customer_address),
+    'status': lambda response: '"' + _delivery_status(response.status) + '"',
+    'current_location': lambda response: _string(response.current_location),
+    'assigned_at': lambda response: _string(response.assigned_at),
+    'picked_up_at': lambda response: _string(response.picked_up_at) if response.picked_up_at else None,
+    'delivered_at': lambda response: _string(response.delivered_at) if response.delivered_at else None,
+}
+
+# the id field followed by `fields`. a renderer returning None leaves its
+# field out, like the full documents do for unset timestamps
+def _sparse(response, renderers, id_field, fields):
+    parts = []
+    for name in [id_field] + [name for name in fields if name != id_field]:
+        value = renderers[name](response)
+        if value is not None:
+            parts.append('"' + name + '":' + value)
+    return '{' + ','.join(parts) + '}'
+
+# OrderResponse
+def order_json(response):
+    return _order(response).encode('utf-8')
+
+# OrderResponse, only the id and `fields`
+def order_fields_json(response, fields):
+    return _sparse(response, ORDER_FIELDS, 'order_id', fields).encode('utf-8')
+
+# ListOrdersResponse, each order in full or only its id and `fields`. the
+# next page's cursor is null on the last page
+def order_list_json(response, fields=None):
+    if fields is None:
+        orders = [_order(order) for order in response.orders]
+    else:
+        orders = [_sparse(order, ORDER_FIELDS, 'order_id', fields) for order in response.orders]
+    return (
+        '{"orders":[' + ','.join(orders) + ']'
+        + ',"next_cursor":' + (_string(response.next_page_token) if response.next_page_token else 'null')
+        + '}'
+    ).encode('utf-8')
+
+# CreateOrdersResponse
+def create_orders_json(response):
+    return (
+        '{"created_count":' + str(response.created_count)
+        + ',"failed_count":' + str(response.failed_count)
+        + ',"results":[' + ','.join([_order_result(result) for result in response.results]) + ']'
+        + '}'
+    ).encode('utf-8')
+
+# RestaurantResponse
+def restaurant_json(response):
+    return _restaurant(response).encode('utf-8')
+
+# RestaurantResponse, only the id and `fields`
+def restaurant_fields_json(response, fields):
+    return _sparse(response, RESTAURANT_FIELDS, 'restaurant_id', fields).encode('utf-8')
+
+# RestaurantResponse, without the menu
+def restaurant_summary_json(response):
+    return _restaurant_summary(response).encode('utf-8')
+
+# order, delivery and restaurant summary rendered by the functions above into
+# one document. a part that is None is sent as null, and parts that could not
+# be fetched are named in "unavailable"
+def overview_json(order, delivery, restaurant, unavailable):
+    return (
+        b'{"order":' + order
+        + b',"delivery":' + (delivery if delivery is not None else b'null')
+        + b',"restaurant":' + (restaurant if restaurant is not None else b'null')
+        + b',"unavailable":' + _strings(unavailable).encode('utf-8')
+        + b'}'
+    )
+
+# DeliveryResponse
+def delivery_json(response):
+    return _delivery(response).encode('utf-8')
+
+# DeliveryResponse, only the id and `fields`
+def delivery_fields_json(response, fields):
+    return _sparse(response, DELIVERY_FIELDS, 'delivery_id', fields).encode('utf-8')
+
+# TrackDeliveryResponse
+def tracking_json(response):
+    return (
+        '{"delivery_id":' + _string(response.delivery_id)
+        + ',"driver_id":' + _string(response.driver_id)
+        + ',"current_location":' + _string(response.current_location)
+        + ',"status":"' + _delivery_status(response.status) + '"'
+        + '}'
+    ).encode('utf-8')
+
+# OrderStatusEvent, one WatchOrder update
+def order_event_json(event):
+    text = (
+        '{"order_id":' + _string(event.order_id)
+        + ',"status":"' + _order_status(event.status) + '"'
+        + ',"version":' + str(event.version)
+        + ',"updated_at":' + _string(event.updated_at)
+    )
+    if event.rejection_reason:
+        text += ',"rejection_reason":' + _string(event.rejection_reason)
+    return (text + '}').encode('utf-8')
+
+# GetRestaurantPaymentsResponse, returned as a bare list
+def payments_json(response):
+    return ('[' + ','.join([_payment(payment) for payment in response.payments]) + ']').encode('utf-8')
@@ -0,0 +1,44 @@
+import asyncio
+
+# collapses concurrent calls for the same key into one backend call.
+# the first caller starts the call, everyone arriving while it is still
+# running awaits the same result (or the same exception). calls for one key
+# that ask for different things (e.g. a different If-None-Match version)
+# pass a `variant` and only share with callers passing the same one
+class SingleFlight:
+    def __init__(self):
+        self.calls = {} # key -> {variant -> running task}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key, fn, variant=None):
+        task = self.calls.get(key, {}).get(variant)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.calls.setdefault(key, {})[variant] = task
+            task.add_done_callback(lambda done: self._forget(key, variant, done))
+            self.leaders += 1
+        else:
+            self.shared += 1
+
+        # shielded so one client hanging up doesn't cancel the call for the rest
+        return await asyncio.shield(task)
+
+    def _forget(self, key, variant, task):
+        variants = self.calls.get(key)
+        if variants is not None and variants.get(variant) is task:
+            del variants[variant]
+            if not variants:
+                del self.calls[key]
+
+    # called after a write so callers arriving from now on don't join
+    # a read that started before the write went through
+    def forget(self, key):
+        self.calls.pop(key, None)
+
+    def stats(self):
+        return {
+            "in_flight": sum(len(variants) for variants in self.calls.values()),
+            "backend_calls": self.leaders,
+            "coalesced": self.shared,
+        }
@@ -0,0 +1,70 @@
+import asyncio
+
+# marks the end of a feed in a subscriber's queue
+END = object()
+
+class Feed:
+    def __init__(self):
+        self.subscribers = set()
+        self.latest = None
+        self.task = None
+
+# shares one upstream stream per key between every subscriber to that key,
+# so ten thousand apps tracking the same delivery cost one TrackDelivery
+# stream. each update is a full snapshot, so a subscriber that falls behind
+# only loses intermediate states, never the latest one
+class StreamHub:
+    def __init__(self, open_stream, queue_size=16):
+        self.open_stream = open_stream # key -> async iterator of updates
+        self.queue_size = queue_size
+        self.feeds = {}
+
+    # returns a queue of updates that ends with END, or with the exception
+    # the upstream stream failed with
+    def subscribe(self, key):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        feed = self.feeds.get(key)
+        if feed is None:
+            feed = Feed()
+            self.feeds[key] = feed
+            feed.task = asyncio.ensure_future(self._pump(key, feed))
+        elif feed.latest is not None:
+            queue.put_nowait(feed.latest)
+        feed.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, key, queue):
+        feed = self.feeds.get(key)
+        if feed is None:
+            return
+        feed.subscribers.discard(queue)
+        if not feed.subscribers:
+            del self.feeds[key]
+            feed.task.cancel()
+
+    async def _pump(self, key, feed):
+        end = END
+        try:
+            async for update in self.open_stream(key):
+                feed.latest = update
+                for queue in feed.subscribers:
+                    self._offer(queue, update)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            end = e
+        if self.feeds.get(key) is feed:
+            del self.feeds[key]
+        for queue in feed.subscribers:
+            self._offer(queue, end)
+
+    def _offer(self, queue, item):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    def stats(self):
+        return {
+            "streams": len(self.feeds),
+            "subscribers": sum(len(feed.subscribers) for feed in self.feeds.values()),
+        }
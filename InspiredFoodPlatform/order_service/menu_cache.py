@@ -0,0 +1,95 @@
+import time
+import logging
+import threading
+import grpc
+from restaurant_service import restaurant_service_pb2
+from restaurant_service import restaurant_service_pb2_grpc
+
+# an order's price for an item may be off from the menu's by rounding
+PRICE_TOLERANCE = 0.005
+
+# seconds between tries at reconnecting to the restaurant service
+RECONNECT_DELAY = 1.0
+
+# one restaurant's menu as the order service last heard it: item id ->
+# (price, available). replaced whole when the menu changes, never changed
+class Menu:
+    __slots__ = ('version', 'is_open', 'items')
+
+    def __init__(self, version, is_open, items):
+        self.version = version
+        self.is_open = is_open
+        self.items = items
+
+    @classmethod
+    def from_proto(cls, menu):
+        return cls(menu.version, menu.is_open, {item.item_id: (item.price, item.available) for item in menu.menu_items})
+
+# every restaurant's menu, kept up to date by a WatchMenus stream from the
+# restaurant service, so placing an order checks its items and prices
+# against memory instead of calling the restaurant service. if the stream
+# drops the menus last heard are kept and used while it reconnects, and
+# only the menus that changed in between are sent again. if the restaurant
+# service restarted meanwhile (or another replica answers) its versions
+# can't be compared with ours, so its first update replaces every menu
+class MenuCache:
+    def __init__(self, addresses, compression=None):
+        self.addresses = addresses
+        self.compression = compression # for the channel, menus are the largest messages sent
+        self.menus = {} # restaurant id -> Menu, read without a lock
+        self.incarnation = '' # the restaurant service run the menus came from
+        self.ready = threading.Event() # set once the first full set of menus is in
+
+    def start(self):
+        threading.Thread(target=self._watch, name='menu-watcher', daemon=True).start()
+
+    def _watch(self):
+        attempt = 0
+        while True:
+            address = self.addresses[attempt % len(self.addresses)]
+            attempt += 1
+            try:
+                with grpc.insecure_channel(address, compression=self.compression) as channel:
+                    stub = restaurant_service_pb2_grpc.RestaurantServiceStub(channel)
+                    known_versions = {restaurant_id: menu.version for restaurant_id, menu in self.menus.items()}
+                    request = restaurant_service_pb2.WatchMenusRequest(known_versions=known_versions, incarnation=self.incarnation)
+                    for update in stub.WatchMenus(request):
+                        self.apply(update)
+                        if not self.ready.is_set():
+                            logging.info(f"Loaded {len(self.menus)} menus from {address}")
+                            self.ready.set()
+            except grpc.RpcError as e:
+                logging.warning(f"Menu stream from {address} failed, retrying: {e.code()}")
+            time.sleep(RECONNECT_DELAY)
+
+    # an update may repeat a menu already applied, older versions are
+    # ignored. the first update from another run of the restaurant service
+    # holds every menu, and replaces them all
+    def apply(self, update):
+        if update.incarnation != self.incarnation:
+            self.menus = {menu.restaurant_id: Menu.from_proto(menu) for menu in update.menus}
+            self.incarnation = update.incarnation
+            return
+        for menu in update.menus:
+            current = self.menus.get(menu.restaurant_id)
+            if current is None or menu.version > current.version:
+                self.menus[menu.restaurant_id] = Menu.from_proto(menu)
+
+    # returns an error message if the order's restaurant is closed or any
+    # of its items isn't on the menu, isn't available or has the wrong price
+    def check(self, request):
+        menu = self.menus.get(request.restaurant_id)
+        if menu is None:
+            return f"Restaurant {request.restaurant_id} not found"
+        if not menu.is_open:
+            return f"Restaurant {request.restaurant_id} is closed"
+        for item in request.items:
+            entry = menu.items.get(item.item_id)
+            if entry is None:
+                return f"Item {item.item_id} is not on the menu"
+            price, available = entry
+            if not available:
+                return f"Item {item.item_id} is not available"
+            if abs(item.price - price) > PRICE_TOLERANCE:
+                return f"Item {item.item_id} costs {price:.2f}, not {item.price:.2f}"
+        return None
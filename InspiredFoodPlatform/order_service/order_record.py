@@ -0,0 +1,57 @@
+import sys
+
+# how an order is kept in memory. a dict per order with live protobuf items
+# and ISO timestamp strings cost well over a kilobyte each, so instead:
+# - a class with __slots__, no per-order dict or repeated key strings
+# - the items as the serialized bytes of an OrderResponse holding only the
+#   items, merged straight into responses
+# - timestamps as integer microseconds since the epoch, turned into ISO
+#   strings only when a response is built (common/times.py)
+# - restaurant ids interned, so the orders of a restaurant share one string
+# records are never changed in place (see common/store.py), replace()
+# returns a changed copy. the one exception is `response`, the serialized
+# OrderResponse of this version of the order, filled in on its first read.
+# a change makes a new record without it, so it is never stale
+class OrderRecord:
+    FIELDS = (
+        'order_id', 'customer_id', 'customer_name', 'customer_email', 'customer_phone',
+        'restaurant_id', 'items', 'delivery_address', 'special_instructions', 'status',
+        'total_amount', 'created_at', 'updated_at', 'version', 'rejection_reason',
+    )
+    __slots__ = FIELDS + ('response',)
+
+    def __init__(self, order_id, customer_id, customer_name, customer_email, customer_phone,
+                 restaurant_id, items, delivery_address, special_instructions, status,
+                 total_amount, created_at, updated_at, version, rejection_reason=''):
+        self.order_id = order_id
+        self.customer_id = customer_id
+        self.customer_name = customer_name
+        self.customer_email = customer_email
+        self.customer_phone = customer_phone
+        self.restaurant_id = sys.intern(restaurant_id)
+        self.items = items
+        self.delivery_address = delivery_address
+        self.special_instructions = special_instructions
+        self.status = status
+        self.total_amount = total_amount
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.version = version
+        self.rejection_reason = rejection_reason
+        self.response = None
+
+    # a copy with `changes` (field -> value) applied
+    def replace(self, **changes):
+        record = object.__new__(OrderRecord)
+        for name in OrderRecord.FIELDS:
+            setattr(record, name, changes[name] if name in changes else getattr(self, name))
+        record.response = None
+        return record
+
+    # field by name, for the secondary indexes
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    # pickled as its values only, for the write-ahead log and snapshots
+    def __reduce__(self):
+        return OrderRecord, tuple(getattr(self, name) for name in OrderRecord.FIELDS)
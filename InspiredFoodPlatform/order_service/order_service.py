@@ -1,44 +1,405 @@
 import os
+import json
+import time
 import uuid
+import base64
+import signal
 import logging
-from datetime import datetime
+import threading
 from concurrent import futures
+import sys
 import grpc
 import order_service_pb2
 import order_service_pb2_grpc
+from order_record import OrderRecord
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'restaurant_service'))
+from menu_cache import MenuCache
+from common.archive import SegmentArchive
+from common.balancer import parse_addresses
+from common.compression import grpc_compression
+from common.deadlines import time_remaining
+from common.dedupe import DedupeIndex
+from common.fieldmask import masked_fields
+from common.ids import uuid7s
+from common.index import RecordIndex
+from common.limits import StreamLimit
+from common.serialized import SerializedResponses, embedded
+from common.sharding import shard_for
+from common.store import StripedStore
+from common.times import now_micros, iso_time, micros_from_iso
+from common.wal import WriteAheadLog
+from common.watch import WatchRegistry
+
+# directory for the write-ahead log and snapshots. without it orders are
+# only kept in memory and lost on restart
+ORDER_DATA_DIR = os.environ.get('ORDER_DATA_DIR')
+
+# where orders that are done with are moved out of memory to (see
+# archive_orders). defaults to a folder in ORDER_DATA_DIR; without either,
+# every order stays in memory
+ORDER_ARCHIVE_DIR = os.environ.get('ORDER_ARCHIVE_DIR') or (os.path.join(ORDER_DATA_DIR, 'archive') if ORDER_DATA_DIR else None)
+
+# delivered, rejected and cancelled orders are archived once they haven't
+# changed for this many minutes. the archiver looks every ARCHIVE_INTERVAL seconds
+ARCHIVE_AFTER_MINUTES = float(os.environ.get('ARCHIVE_AFTER_MINUTES', '30'))
+ARCHIVE_INTERVAL = float(os.environ.get('ARCHIVE_INTERVAL', '60'))
+
+# restaurant service replicas, separated by commas, to take the menus from.
+# new orders are checked against them: the restaurant is open and every
+# item is on the menu, available and at the menu's price. without it orders
+# aren't checked against the menus
+RESTAURANT_SERVICE_ADDR = os.environ.get('RESTAURANT_SERVICE_ADDR')
+
+# orders per archive segment
+ARCHIVE_SEGMENT_ORDERS = 100000
+
+# keep each order's serialized OrderResponse for GetOrder, UpdateOrderStatus
+# and ListOrders to send as it is, until the order changes
+ORDER_RESPONSE_CACHE = os.environ.get('ORDER_RESPONSE_CACHE', 'true').lower() != 'false'
+
+# worker processes, each serving a shard of the orders on its own port,
+# PORT + its shard number. an order belongs to the shard its id hashes to
+# (common/sharding.py), and callers route by order id, so one process is
+# no longer held to one core by the GIL. each shard keeps its log and
+# archive in its own folder of ORDER_DATA_DIR and ORDER_ARCHIVE_DIR
+ORDER_SHARDS = int(os.environ.get('ORDER_SHARDS', '1'))
+PORT = int(os.environ.get('PORT', '50051'))
+
+# worker threads. order writes are lock free compare-and-set on a single
+# record, so more workers don't queue up behind a lock
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '32'))
+
+# CreateOrder requests with an idempotency_key are remembered for
+# IDEMPOTENCY_TTL seconds (default a day), at most IDEMPOTENCY_KEYS of them
+IDEMPOTENCY_TTL = float(os.environ.get('IDEMPOTENCY_TTL', '86400'))
+IDEMPOTENCY_KEYS = int(os.environ.get('IDEMPOTENCY_KEYS', '100000'))
+
+# longest a repeated CreateOrder waits for the first request with its key
+# to finish, and all it waits if the call has a longer deadline or none
+IDEMPOTENCY_WAIT = float(os.environ.get('IDEMPOTENCY_WAIT', '5'))
+
+# open WatchOrder streams at once (see common/limits.py). the gateway
+# shares one stream per order between all of its clients
+MAX_WATCHERS = int(os.environ.get('MAX_WATCHERS', str(MAX_WORKERS // 2)))
+
+# the statuses an order may move to from each status. orders only move
+# forward, skipping steps the restaurant doesn't report (e.g. straight from
+# CONFIRMED to OUT_FOR_DELIVERY); REJECTED, DELIVERED and CANCELLED are final
+ORDER_TRANSITIONS = {
+    order_service_pb2.ORDER_PENDING: {
+        order_service_pb2.ORDER_CONFIRMED, order_service_pb2.ORDER_REJECTED, order_service_pb2.ORDER_CANCELLED,
+    },
+    order_service_pb2.ORDER_CONFIRMED: {
+        order_service_pb2.ORDER_PREPARING, order_service_pb2.ORDER_READY,
+        order_service_pb2.ORDER_OUT_FOR_DELIVERY, order_service_pb2.ORDER_CANCELLED,
+    },
+    order_service_pb2.ORDER_PREPARING: {
+        order_service_pb2.ORDER_READY, order_service_pb2.ORDER_OUT_FOR_DELIVERY, order_service_pb2.ORDER_CANCELLED,
+    },
+    order_service_pb2.ORDER_READY: {
+        order_service_pb2.ORDER_OUT_FOR_DELIVERY, order_service_pb2.ORDER_CANCELLED,
+    },
+    order_service_pb2.ORDER_OUT_FOR_DELIVERY: {
+        order_service_pb2.ORDER_DELIVERED,
+    },
+}
+
+# statuses with no way out, orders in them can be archived
+FINAL_STATUSES = (order_service_pb2.ORDER_REJECTED, order_service_pb2.ORDER_DELIVERED, order_service_pb2.ORDER_CANCELLED)
+
+def status_name(status):
+    try:
+        return order_service_pb2.OrderStatus.Name(status)
+    except ValueError:
+        return str(status)
+
+# ListOrders page size when the request doesn't set one, and the largest allowed
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# fields ListOrders can filter on. orders are listed by creation time, so
+# the index's sort key is (created_at, order_id)
+INDEXED_FIELDS = ('restaurant_id', 'status', 'customer_email')
+
+def order_sort_key(order):
+    return (order.created_at, order.order_id)
+
+# a page token is the sort key of the last order on the previous page
+def page_token(order):
+    return base64.urlsafe_b64encode(json.dumps(order_sort_key(order)).encode()).decode()
+
+# the sort key in a page token, raises ValueError for one we didn't make
+def page_position(token):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (ValueError, UnicodeError):
+        raise ValueError(f"Invalid page token {token!r}")
+    if not (isinstance(position, list) and len(position) == 2
+            and isinstance(position[0], int) and isinstance(position[1], str)):
+        raise ValueError(f"Invalid page token {token!r}")
+    return tuple(position)
+
+# OrderResponse field -> its value in an OrderRecord, for responses that only
+# carry some fields. items are merged in separately
+RESPONSE_VALUES = {
+    'customer_name': lambda order: order.customer_name,
+    'customer_email': lambda order: order.customer_email,
+    'customer_phone': lambda order: order.customer_phone,
+    'delivery_address': lambda order: order.delivery_address,
+    'restaurant_id': lambda order: order.restaurant_id,
+    'special_instructions': lambda order: order.special_instructions,
+    'status': lambda order: order.status,
+    'total_amount': lambda order: order.total_amount,
+    'created_at': lambda order: iso_time(order.created_at),
+    'updated_at': lambda order: iso_time(order.updated_at),
+}
+
+# logs and snapshots written before OrderRecord hold each order as a dict,
+# with its items as OrderItem messages and its times as ISO strings. such
+# an order as an OrderRecord, anything else as it is
+def recovered_order(order):
+    if not isinstance(order, dict):
+        return order
+    values = {name: order[name] for name in OrderRecord.FIELDS if name in order}
+    if not isinstance(values['items'], bytes):
+        values['items'] = order_service_pb2.OrderResponse(items=values['items']).SerializeToString()
+    for name in ('created_at', 'updated_at'):
+        if isinstance(values[name], str):
+            values[name] = micros_from_iso(values[name])
+    return OrderRecord(**values)
 
 class OrderServicer(order_service_pb2_grpc.OrderServiceServicer):
-    def __init__(self):
-        self.orders = {} # in memory storage for orders
+    def __init__(self, shard=0, shards=1):
+        # this process only makes ids of orders it owns, see _new_order_ids
+        self.shard = shard
+        self.shards = shards
+        data_dir, archive_dir = ORDER_DATA_DIR, ORDER_ARCHIVE_DIR
+        if shards > 1:
+            data_dir = data_dir and os.path.join(data_dir, f'shard-{shard}')
+            archive_dir = archive_dir and os.path.join(archive_dir, f'shard-{shard}')
+        
+        # in memory storage for orders, shared by the worker threads, with
+        # secondary indexes for ListOrders
+        index = RecordIndex(INDEXED_FIELDS, order_sort_key)
+        # WatchOrder streams waiting for changes to an order
+        self.watchers = WatchRegistry()
+        self.watch_limit = StreamLimit(MAX_WATCHERS, 'WatchOrder')
+        # idempotency key -> the response CreateOrder sent for it
+        self.idempotency = DedupeIndex(IDEMPOTENCY_KEYS, IDEMPOTENCY_TTL)
+        self.orders = StripedStore(index=index, watchers=self.watchers)
+        if data_dir:
+            # every change is on disk before it is acknowledged, and the
+            # orders are rebuilt from the snapshot and log on startup
+            log = WriteAheadLog(
+                data_dir,
+                fsync=os.environ.get('WAL_FSYNC', 'true').lower() != 'false',
+                snapshot_every=int(os.environ.get('SNAPSHOT_EVERY', '100000')),
+            )
+            self.orders = StripedStore(log=log, index=index, watchers=self.watchers)
+            self.orders.load({order_id: recovered_order(order) for order_id, order in log.recover().items()})
+            log.start(self.orders.snapshot)
+        
+        # finished orders older than ARCHIVE_AFTER_MINUTES leave memory for
+        # segment files, where GetOrder still finds them
+        self.archive = None
+        if archive_dir:
+            self.archive = SegmentArchive(archive_dir)
+            threading.Thread(target=self._archive_loop, name='order-archiver', daemon=True).start()
+        
+        # a copy of every restaurant's menu, pushed by the restaurant service
+        # as it changes, so orders are checked without a call per order
+        self.menus = None
+        if RESTAURANT_SERVICE_ADDR:
+            self.menus = MenuCache(
+                parse_addresses(RESTAURANT_SERVICE_ADDR),
+                compression=grpc_compression(os.environ.get('RESTAURANT_SERVICE_COMPRESSION')),
+            )
+            self.menus.start()
     
     # create a new order
     def CreateOrder(self, request, context):
-        order_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
+        claim = None
+        if request.idempotency_key:
+            # the key is looked up before the order is checked, so a repeat
+            # gets the first response even if the menu has changed since
+            repeat, claim = self._claim_order(request, context)
+            if repeat is not None:
+                return repeat
+
+        try:
+            if not self._menus_loaded(context) or self._reject_invalid(request, context):
+                response = None
+            else:
+                order_id = self._new_order_ids(1)[0] # sorts by creation time
+                now = now_micros()
+                
+                customer_id = str(uuid.uuid4()) # generating a customer id
+                
+                response = self._store_order(request, order_id, customer_id, now)
+        except BaseException:
+            if claim is not None:
+                self.idempotency.release(request.idempotency_key, claim)
+            raise
+        if response is None:
+            # a refused order isn't remembered, a retry is checked again
+            if claim is not None:
+                self.idempotency.release(request.idempotency_key, claim)
+            return order_service_pb2.OrderResponse()
+        if claim is not None:
+            # kept for repeats and sent as it is (see common/serialized.py)
+            response = response.SerializeToString()
+            self.idempotency.complete(claim, response)
         
+        logging.info(f"Created order {order_id} for customer {customer_id}")
+        
+        return response
+    
+    # for a CreateOrder with an idempotency key: (None, claim) if this is the
+    # first request with the key, which then places the order, otherwise
+    # (response, None) with the first request's response, serialized, or an
+    # empty response and an error set on `context`. a repeat that arrives
+    # while the first is still running waits for it
+    def _claim_order(self, request, context):
+        key = request.idempotency_key
+        fingerprint = hash(request.SerializeToString())
+        while True:
+            claim, first = self.idempotency.claim(key, fingerprint)
+            if first:
+                return None, claim
+            
+            if claim.fingerprint != fingerprint:
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                context.set_details(f"Idempotency key {key!r} was already used for a different order")
+                return order_service_pb2.OrderResponse(), None
+            
+            response = self.idempotency.wait(claim, time_remaining(context, IDEMPOTENCY_WAIT))
+            if response is not None:
+                logging.info(f"Repeated order for idempotency key {key!r}")
+                return response, None
+            if not claim.done:
+                context.set_code(grpc.StatusCode.ABORTED)
+                context.set_details(f"The order with idempotency key {key!r} is still being placed")
+                return order_service_pb2.OrderResponse(), None
+            # the first request failed, this one takes the key over
+    
+    # create a batch of orders streamed in by the client, one result per order
+    def CreateOrders(self, request_iterator, context):
+        requests = list(request_iterator)
+        if not self._menus_loaded(context):
+            return order_service_pb2.CreateOrdersResponse()
+        now = now_micros()
+        
+        # one urandom call each for the batch's order and customer ids
+        order_ids = self._new_order_ids(len(requests))
+        customer_ids = self._new_ids(len(requests))
+        
+        results = []
+        created = 0
+        for index, request in enumerate(requests):
+            error = self._validate_order(request)
+            if error:
+                results.append(order_service_pb2.CreateOrderResult(index=index, error=error))
+                continue
+            
+            order = self._store_order(request, order_ids[index], customer_ids[index], now, wait=False)
+            results.append(order_service_pb2.CreateOrderResult(index=index, order=order))
+            created += 1
+        
+        # one wait for the whole batch to reach the disk
+        self.orders.sync()
+        
+        logging.info(f"Created {created} of {len(requests)} orders in batch")
+        
+        return order_service_pb2.CreateOrdersResponse(
+            results=results,
+            created_count=created,
+            failed_count=len(requests) - created,
+        )
+    
+    # returns an error message if the order can't be placed
+    def _validate_order(self, request):
+        if not request.restaurant_id:
+            return "restaurant_id is required"
+        if not request.items:
+            return "Order must contain at least one item"
+        for item in request.items:
+            if item.quantity <= 0:
+                return f"Item {item.item_id} has invalid quantity {item.quantity}"
+        if self.menus is not None:
+            return self.menus.check(request)
+        return None
+    
+    # sets INVALID_ARGUMENT on `context` and returns True if the order
+    # fails _validate_order
+    def _reject_invalid(self, request, context):
+        error = self._validate_order(request)
+        if not error:
+            return False
+        context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+        context.set_details(error)
+        return True
+    
+    # orders can't be checked until the first menus arrive after startup.
+    # not UNAVAILABLE, which the gateway would count against this replica
+    # although everything but placing orders works. the retry-after trailer
+    # tells the gateway to have the client try again shortly
+    def _menus_loaded(self, context):
+        if self.menus is None or self.menus.ready.is_set():
+            return True
+        context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+        context.set_details("Menus not loaded yet")
+        context.set_trailing_metadata((('retry-after', '1'),))
+        return False
+    
+    # `count` new order ids, in increasing order, that hash to this shard.
+    # a shard keeps about one id in `shards` it makes, which costs less than
+    # a call to another shard
+    def _new_order_ids(self, count):
+        if self.shards == 1:
+            return uuid7s(count)
+        order_ids = []
+        while len(order_ids) < count:
+            order_ids.extend(
+                order_id for order_id in uuid7s((count - len(order_ids)) * self.shards)
+                if shard_for(order_id, self.shards) == self.shard
+            )
+        return order_ids[:count]
+    
+    # random version 4 uuids, generated from a single block of random bytes
+    def _new_ids(self, count):
+        random_bytes = os.urandom(16 * count)
+        return [
+            str(uuid.UUID(bytes=random_bytes[i * 16:(i + 1) * 16], version=4))
+            for i in range(count)
+        ]
+    
+    # store the order and build its response. with wait=False the caller
+    # waits for it to be on disk with self.orders.sync()
+    def _store_order(self, request, order_id, customer_id, now, wait=True):
         # calculating the total amount for the order
         total_amount = sum(item.price * item.quantity for item in request.items)
         
-        customer_id = str(uuid.uuid4()) # generating a customer id
-        
-        self.orders[order_id] = {
-            'order_id': order_id,
-            'customer_id': customer_id,
-            'customer_name': request.customer_name,
-            'customer_email': request.customer_email,
-            'customer_phone': request.customer_phone,
-            'restaurant_id': request.restaurant_id,
-            'items': list(request.items),
-            'delivery_address': request.delivery_address,
-            'special_instructions': request.special_instructions or '',
-            'status': order_service_pb2.ORDER_PENDING,
-            'total_amount': total_amount,
-            'created_at': now,
-            'updated_at': now,
-        }
-        
-        logging.info(f"Created order {order_id} for customer {customer_id}")
+        order = OrderRecord(
+            order_id=order_id,
+            customer_id=customer_id,
+            customer_name=request.customer_name,
+            customer_email=request.customer_email,
+            customer_phone=request.customer_phone,
+            restaurant_id=request.restaurant_id,
+            items=order_service_pb2.OrderResponse(items=request.items).SerializeToString(),
+            delivery_address=request.delivery_address,
+            special_instructions=request.special_instructions or '',
+            status=order_service_pb2.ORDER_PENDING,
+            total_amount=total_amount,
+            created_at=now,
+            updated_at=now,
+            version=1, # bumped on every change
+        )
+        self.orders.put(order_id, order, wait=wait)
         
+        created_at = iso_time(now)
         return order_service_pb2.OrderResponse(
             order_id=order_id,
             customer_name=request.customer_name,
@@ -50,8 +411,9 @@ class OrderServicer(order_service_pb2_grpc.OrderServiceServicer):
             special_instructions=request.special_instructions or '',
             status=order_service_pb2.ORDER_PENDING,
             total_amount=total_amount,
-            created_at=now,
-            updated_at=now,
+            created_at=created_at,
+            updated_at=created_at,
+            version=1,
         )
     
     # handling restaurant response based on accepted or rejected 
@@ -61,36 +423,45 @@ class OrderServicer(order_service_pb2_grpc.OrderServiceServicer):
         accepted = request.accepted
         rejection_reason = request.rejection_reason
     
-        if order_id not in self.orders:
-            context.set_code(grpc.StatusCode.NOT_FOUND)
-            context.set_details(f"Order {order_id} not found")
-            return order_service_pb2.RestaurantOrderResponseResponse()
+        now = now_micros()
+        new_status = order_service_pb2.ORDER_CONFIRMED if accepted else order_service_pb2.ORDER_REJECTED
     
-        order = self.orders[order_id]
-        if order["restaurant_id"] != restaurant_id:
-            context.set_code(grpc.StatusCode.PERMISSION_DENIED)
-            context.set_details(f"Order {order_id} does not belong to restaurant {restaurant_id}")
-            return order_service_pb2.RestaurantOrderResponseResponse()
+        # check and change the order in one step: if another response got in
+        # between, look again (the order is then no longer pending)
+        while True:
+            order = self._find_order(order_id)
+            if order is None:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details(f"Order {order_id} not found")
+                return order_service_pb2.RestaurantOrderResponseResponse()
     
-        if order["status"] != order_service_pb2.ORDER_PENDING:
-            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
-            context.set_details(f"Order {order_id} is not in PENDING state")
-            return order_service_pb2.RestaurantOrderResponseResponse()
+            if order.restaurant_id != restaurant_id:
+                context.set_code(grpc.StatusCode.PERMISSION_DENIED)
+                context.set_details(f"Order {order_id} does not belong to restaurant {restaurant_id}")
+                return order_service_pb2.RestaurantOrderResponseResponse()
     
-        now = datetime.now().isoformat()
-        new_status = order_service_pb2.ORDER_CONFIRMED if accepted else order_service_pb2.ORDER_REJECTED
+            if order.status != order_service_pb2.ORDER_PENDING:
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                context.set_details(f"Order {order_id} is not in PENDING state")
+                return order_service_pb2.RestaurantOrderResponseResponse()
     
-        order["status"] = new_status
-        order["updated_at"] = now
+            updated = order.replace(
+                status=new_status,
+                updated_at=now,
+                version=order.version + 1,
+                rejection_reason='' if accepted else rejection_reason,
+            )
+            if self.orders.compare_and_set(order_id, order, updated):
+                order = updated
+                break
     
-        if not accepted:
-            order["rejection_reason"] = rejection_reason
         logging.info(f"Restaurant {restaurant_id} {'accepted' if accepted else 'rejected'} order {order_id}")
     
         response = order_service_pb2.RestaurantOrderResponseResponse(
             order_id=order_id,
             status=new_status,
-            updated_at=now
+            updated_at=iso_time(now),
+            version=order.version
         )
     
         if not accepted:
@@ -102,69 +473,320 @@ class OrderServicer(order_service_pb2_grpc.OrderServiceServicer):
     def GetOrder(self, request, context):
         order_id = request.order_id
         
-        if order_id not in self.orders:
+        try:
+            fields = masked_fields(request.read_mask, order_service_pb2.OrderResponse.DESCRIPTOR)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return order_service_pb2.OrderResponse()
+        
+        order = self._find_order(order_id)
+        if order is None:
             context.set_code(grpc.StatusCode.NOT_FOUND)
             context.set_details(f"Order {order_id} not found")
             return order_service_pb2.OrderResponse()
         
-        order = self.orders[order_id]        
         logging.info(f"Retrieved order {order_id}")
         
-        return order_service_pb2.OrderResponse(
-            order_id=order['order_id'],
-            customer_name=order['customer_name'],
-            customer_email=order['customer_email'],
-            customer_phone=order['customer_phone'],
-            restaurant_id=order['restaurant_id'],
-            items=order['items'],
-            delivery_address=order['delivery_address'],
-            special_instructions=order['special_instructions'],
-            status=order['status'],
-            total_amount=order['total_amount'],
-            created_at=order['created_at'],
-            updated_at=order['updated_at'],
+        # the caller's copy is current, don't send the order again
+        if request.if_version and request.if_version == order.version:
+            return order_service_pb2.OrderResponse(order_id=order_id, version=order.version)
+        
+        if fields is None:
+            return self._serialized_response(order)
+        return self._order_response(order, fields)
+    
+    # the order from memory or, once it has been archived, from the archive.
+    # nothing changes an archived order
+    def _find_order(self, order_id):
+        order = self.orders.get(order_id)
+        if order is None and self.archive is not None:
+            order = self.archive.get(order_id)
+        return order
+    
+    def _archive_loop(self):
+        while True:
+            time.sleep(ARCHIVE_INTERVAL)
+            try:
+                self.archive_orders(now_micros() - int(ARCHIVE_AFTER_MINUTES * 60 * 1000000))
+            except Exception:
+                logging.exception("Archiving orders failed")
+    
+    # move the orders in a final status that haven't changed since `before`
+    # (microseconds) from memory to the archive, returns how many moved.
+    # their segment is on disk before they leave the store, so a crash in
+    # between leaves an order in both, and the copy in memory wins
+    def archive_orders(self, before):
+        done = []
+        for status in FINAL_STATUSES:
+            # an order last changed before `before` was created before it
+            # too, the index finds those oldest first
+            lower = None
+            while True:
+                orders = self.orders.find({'status': status}, lower, (before,), ARCHIVE_SEGMENT_ORDERS)
+                done.extend(order for order in orders if order.updated_at < before)
+                if len(orders) < ARCHIVE_SEGMENT_ORDERS:
+                    break
+                lower = order_sort_key(orders[-1])
+        
+        for start in range(0, len(done), ARCHIVE_SEGMENT_ORDERS):
+            batch = done[start:start + ARCHIVE_SEGMENT_ORDERS]
+            self.archive.write([(order.order_id, order) for order in batch])
+            for order in batch:
+                # an order changed meanwhile stays, a later pass archives it again
+                self.orders.remove(order.order_id, order, wait=False)
+            self.orders.sync()
+        
+        if done:
+            logging.info(f"Archived {len(done)} orders, {len(self.orders)} left in memory")
+        return len(done)
+    
+    # the full OrderResponse of the order, serialized once per version and
+    # kept on the record. returned from a handler as bytes it is sent as it
+    # is (see common/serialized.py), with no response to build
+    def _serialized_response(self, order):
+        if not ORDER_RESPONSE_CACHE:
+            return self._order_response(order)
+        response = order.response
+        if response is None:
+            # two threads reading a new version may both build it, same bytes
+            response = self._order_response(order).SerializeToString()
+            order.response = response
+        return response
+    
+    # the stored order as an OrderResponse. with `fields` only those fields
+    # (plus order_id and version), e.g. just the status for clients polling it
+    def _order_response(self, order, fields=None):
+        if fields is not None:
+            values = {name: RESPONSE_VALUES[name](order) for name in fields if name in RESPONSE_VALUES}
+            values.update(order_id=order.order_id, version=order.version)
+            response = order_service_pb2.OrderResponse(**values)
+            if 'items' in fields:
+                response.MergeFromString(order.items)
+            return response
+        
+        response = order_service_pb2.OrderResponse(
+            order_id=order.order_id,
+            customer_name=order.customer_name,
+            customer_email=order.customer_email,
+            customer_phone=order.customer_phone,
+            restaurant_id=order.restaurant_id,
+            delivery_address=order.delivery_address,
+            special_instructions=order.special_instructions,
+            status=order.status,
+            total_amount=order.total_amount,
+            created_at=iso_time(order.created_at),
+            updated_at=iso_time(order.updated_at),
+            version=order.version,
         )
+        # the stored items are an OrderResponse holding just them
+        response.MergeFromString(order.items)
+        return response
     
-    # update the status of the order
+    # list orders by restaurant, status, customer email and creation time, a
+    # page at a time. the indexes lead straight to the matching orders, so a
+    # page costs about the same however many orders there are
+    def ListOrders(self, request, context):
+        try:
+            fields = masked_fields(request.read_mask, order_service_pb2.OrderResponse.DESCRIPTOR)
+            position = page_position(request.page_token) if request.page_token else None
+            created_after = micros_from_iso(request.created_after) if request.created_after else None
+            created_before = micros_from_iso(request.created_before) if request.created_before else None
+            if request.page_size < 0:
+                raise ValueError(f"page_size must not be negative, got {request.page_size}")
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return order_service_pb2.ListOrdersResponse()
+        
+        page_size = min(request.page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        
+        equals = {}
+        if request.restaurant_id:
+            equals['restaurant_id'] = request.restaurant_id
+        if request.status:
+            equals['status'] = request.status
+        if request.customer_email:
+            equals['customer_email'] = request.customer_email
+        
+        # (time,) sorts just before every order created at that time
+        lower = (created_after,) if created_after is not None else None
+        upper = (created_before,) if created_before is not None else None
+        if position is not None:
+            if request.oldest_first:
+                lower = position if lower is None else max(lower, position)
+            else:
+                upper = position if upper is None else min(upper, position)
+        
+        # one more than a page to tell whether there is a next page
+        orders = self.orders.find(equals, lower, upper, page_size + 1, reverse=not request.oldest_first)
+        next_page_token = ''
+        if len(orders) > page_size:
+            orders = orders[:page_size]
+            next_page_token = page_token(orders[-1])
+        
+        logging.info(f"Listed {len(orders)} orders")
+        
+        # whole orders are joined from their serialized responses
+        if fields is None and ORDER_RESPONSE_CACHE:
+            return b''.join(
+                [embedded(1, self._serialized_response(order)) for order in orders]
+                + ([embedded(2, next_page_token.encode())] if next_page_token else [])
+            )
+        
+        return order_service_pb2.ListOrdersResponse(
+            orders=[self._order_response(order, fields) for order in orders],
+            next_page_token=next_page_token,
+        )
+    
+    # update the status of the order, if the transition table allows it and,
+    # with expected_version, if nobody changed the order since the caller
+    # read it. moving an order to the status it already has changes nothing
     def UpdateOrderStatus(self, request, context):
         order_id = request.order_id
+        status = request.status
         
-        if order_id not in self.orders:
-            context.set_code(grpc.StatusCode.NOT_FOUND)
-            context.set_details(f"Order {order_id} not found")
+        if status == order_service_pb2.ORDER_UNKNOWN or status not in order_service_pb2.OrderStatus.values():
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"Unknown order status {status}")
             return order_service_pb2.OrderResponse()
         
-        order = self.orders[order_id]
-        order['status'] = request.status
-        order['updated_at'] = datetime.now().isoformat()
+        now = now_micros()
+        # check the order and swap in the changed one only if it is still the
+        # order that was checked, otherwise look again. no lock is held
+        while True:
+            # an archived order is final, so the checks below never get as
+            # far as changing it
+            order = self._find_order(order_id)
+            if order is None:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details(f"Order {order_id} not found")
+                return order_service_pb2.OrderResponse()
+            
+            if request.expected_version and request.expected_version != order.version:
+                context.set_code(grpc.StatusCode.ABORTED)
+                context.set_details(f"Order {order_id} is at version {order.version}, not {request.expected_version}")
+                return order_service_pb2.OrderResponse()
+            
+            if status == order.status:
+                break
+            
+            if status not in ORDER_TRANSITIONS.get(order.status, ()):
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                context.set_details(f"Order {order_id} can't go from {status_name(order.status)} to {status_name(status)}")
+                return order_service_pb2.OrderResponse()
+            
+            updated = order.replace(status=status, updated_at=now, version=order.version + 1)
+            if self.orders.compare_and_set(order_id, order, updated):
+                order = updated
+                break
         
-        logging.info(f"Updated order {order_id} status to {request.status}")
+        logging.info(f"Updated order {order_id} status to {status}")
         
-        return order_service_pb2.OrderResponse(
-            order_id=order['order_id'],
-            customer_name=order['customer_name'],
-            customer_email=order['customer_email'],
-            customer_phone=order['customer_phone'],
-            restaurant_id=order['restaurant_id'],
-            items=order['items'],
-            delivery_address=order['delivery_address'],
-            special_instructions=order['special_instructions'],
-            status=order['status'],
-            total_amount=order['total_amount'],
-            created_at=order['created_at'],
-            updated_at=order['updated_at'],
+        # serialized now, GetOrder calls for this version reuse it
+        return self._serialized_response(order)
+
+    # stream the order's status as it changes, starting with its status now,
+    # until it reaches a final status. the store publishes every new version
+    # of the order to this stream's subscription, so it sleeps until then
+    def WatchOrder(self, request, context):
+        yield from self.watch_limit.run(self._watch_order(request, context), context)
+    
+    def _watch_order(self, request, context):
+        order_id = request.order_id
+        
+        # subscribed before the order is read, so no change is missed in between
+        subscription = self.watchers.subscribe(order_id)
+        context.add_callback(subscription.wake)
+        try:
+            order = self._find_order(order_id)
+            if order is None:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details(f"Order {order_id} not found")
+                return
+            
+            logging.info(f"Watching order {order_id}")
+            
+            seen_version = request.since_version
+            records = [order]
+            while True:
+                for order in records:
+                    # the subscription can hold versions older than the first read
+                    if order.version > seen_version:
+                        seen_version = order.version
+                        yield self._status_event(order)
+                if order.status in FINAL_STATUSES or not context.is_active():
+                    return
+                records = subscription.take()
+        finally:
+            self.watchers.unsubscribe(subscription)
+    
+    def _status_event(self, order):
+        return order_service_pb2.OrderStatusEvent(
+            order_id=order.order_id,
+            status=order.status,
+            version=order.version,
+            updated_at=iso_time(order.updated_at),
+            rejection_reason=order.rejection_reason,
         )
 
 # starting the gRPC server
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    order_service_pb2_grpc.add_OrderServiceServicer_to_server(OrderServicer(), server)
+def serve_shard(shard, shards):
+    # GRPC_COMPRESSION compresses responses (none, gzip or deflate)
+    # SerializedResponses sends the cached responses the servicer returns as bytes
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=MAX_WORKERS),
+        compression=grpc_compression(os.environ.get('GRPC_COMPRESSION')),
+        interceptors=[SerializedResponses()],
+    )
+    order_service_pb2_grpc.add_OrderServiceServicer_to_server(OrderServicer(shard, shards), server)
     
-    server.add_insecure_port('[::]:50051')
+    port = PORT + shard
+    server.add_insecure_port(f'[::]:{port}')
     server.start()
-    logging.info("Order service started on port 50051")
+    if shards > 1:
+        logging.info(f"Order service shard {shard} of {shards} started on port {port}")
+    else:
+        logging.info(f"Order service started on port {port}")
     server.wait_for_termination()
 
+# a child process serving `shard`, forked before this process has made any
+# gRPC server or channel, which don't survive a fork
+def fork_shard(shard, shards):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            serve_shard(shard, shards)
+        finally:
+            os._exit(1)
+    return pid
+
+# with ORDER_SHARDS above 1 this process only starts a worker process per
+# shard and starts it again if it dies; a shard's orders are back from its
+# log when it is
+def serve():
+    if ORDER_SHARDS <= 1:
+        serve_shard(0, 1)
+        return
+    
+    children = {fork_shard(shard, ORDER_SHARDS): shard for shard in range(ORDER_SHARDS)}
+    
+    def stop(signum, frame):
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, stop)
+    
+    while True:
+        pid, status = os.wait()
+        shard = children.pop(pid, None)
+        if shard is None:
+            continue
+        logging.warning(f"Order service shard {shard} exited with status {status}, restarting it")
+        time.sleep(1)
+        children[fork_shard(shard, ORDER_SHARDS)] = shard
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
     serve()
\ No newline at end of file
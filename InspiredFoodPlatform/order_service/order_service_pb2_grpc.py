@@ -39,6 +39,11 @@ class OrderServiceStub(object):
                 request_serializer=order__service__pb2.CreateOrderRequest.SerializeToString,
                 response_deserializer=order__service__pb2.OrderResponse.FromString,
                 _registered_method=True)
+        self.CreateOrders = channel.stream_unary(
+                '/order.OrderService/CreateOrders',
+                request_serializer=order__service__pb2.CreateOrderRequest.SerializeToString,
+                response_deserializer=order__service__pb2.CreateOrdersResponse.FromString,
+                _registered_method=True)
         self.GetOrder = channel.unary_unary(
                 '/order.OrderService/GetOrder',
                 request_serializer=order__service__pb2.GetOrderRequest.SerializeToString,
@@ -54,6 +59,16 @@ class OrderServiceStub(object):
                 request_serializer=order__service__pb2.RestaurantOrderResponseRequest.SerializeToString,
                 response_deserializer=order__service__pb2.RestaurantOrderResponseResponse.FromString,
                 _registered_method=True)
+        self.ListOrders = channel.unary_unary(
+                '/order.OrderService/ListOrders',
+                request_serializer=order__service__pb2.ListOrdersRequest.SerializeToString,
+                response_deserializer=order__service__pb2.ListOrdersResponse.FromString,
+                _registered_method=True)
+        self.WatchOrder = channel.unary_stream(
+                '/order.OrderService/WatchOrder',
+                request_serializer=order__service__pb2.WatchOrderRequest.SerializeToString,
+                response_deserializer=order__service__pb2.OrderStatusEvent.FromString,
+                _registered_method=True)
 
 
 class OrderServiceServicer(object):
@@ -65,6 +80,12 @@ class OrderServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def CreateOrders(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def GetOrder(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -83,6 +104,18 @@ class OrderServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ListOrders(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def WatchOrder(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_OrderServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -91,6 +124,11 @@ def add_OrderServiceServicer_to_server(servicer, server):
                     request_deserializer=order__service__pb2.CreateOrderRequest.FromString,
                     response_serializer=order__service__pb2.OrderResponse.SerializeToString,
             ),
+            'CreateOrders': grpc.stream_unary_rpc_method_handler(
+                    servicer.CreateOrders,
+                    request_deserializer=order__service__pb2.CreateOrderRequest.FromString,
+                    response_serializer=order__service__pb2.CreateOrdersResponse.SerializeToString,
+            ),
             'GetOrder': grpc.unary_unary_rpc_method_handler(
                     servicer.GetOrder,
                     request_deserializer=order__service__pb2.GetOrderRequest.FromString,
@@ -106,6 +144,16 @@ def add_OrderServiceServicer_to_server(servicer, server):
                     request_deserializer=order__service__pb2.RestaurantOrderResponseRequest.FromString,
                     response_serializer=order__service__pb2.RestaurantOrderResponseResponse.SerializeToString,
             ),
+            'ListOrders': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListOrders,
+                    request_deserializer=order__service__pb2.ListOrdersRequest.FromString,
+                    response_serializer=order__service__pb2.ListOrdersResponse.SerializeToString,
+            ),
+            'WatchOrder': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchOrder,
+                    request_deserializer=order__service__pb2.WatchOrderRequest.FromString,
+                    response_serializer=order__service__pb2.OrderStatusEvent.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'order.OrderService', rpc_method_handlers)
@@ -144,6 +192,33 @@ class OrderService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def CreateOrders(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/order.OrderService/CreateOrders',
+            order__service__pb2.CreateOrderRequest.SerializeToString,
+            order__service__pb2.CreateOrdersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def GetOrder(request,
             target,
@@ -224,3 +299,57 @@ class OrderService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def ListOrders(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/order.OrderService/ListOrders',
+            order__service__pb2.ListOrdersRequest.SerializeToString,
+            order__service__pb2.ListOrdersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def WatchOrder(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/order.OrderService/WatchOrder',
+            order__service__pb2.WatchOrderRequest.SerializeToString,
+            order__service__pb2.OrderStatusEvent.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
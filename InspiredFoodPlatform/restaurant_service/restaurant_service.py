@@ -1,24 +1,48 @@
 import os
+import uuid
 import logging
 from datetime import datetime
 from concurrent import futures
+import sys
 import grpc
 import restaurant_service_pb2
 import restaurant_service_pb2_grpc
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+from common.compression import grpc_compression
+from common.fieldmask import masked_fields
+from common.limits import StreamLimit
+from common.store import StripedStore
+from common.watch import WatchRegistry
+
+# worker threads
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '32'))
+
+# open WatchMenus streams at once (see common/limits.py). every order
+# service process (one per order shard) keeps one open for as long as it runs
+MAX_MENU_WATCHERS = int(os.environ.get('MAX_MENU_WATCHERS', str(MAX_WORKERS // 2)))
 
 class RestaurantServicer(restaurant_service_pb2_grpc.RestaurantServiceServicer):
     def __init__(self):
+        # WatchMenus streams, sent every change to a restaurant. menus change
+        # rarely and a watcher needs every restaurant's, so none are dropped
+        self.menu_watchers = WatchRegistry(queue_size=None)
+        self.menu_watch_limit = StreamLimit(MAX_MENU_WATCHERS, 'WatchMenus')
+        # this run of the service. versions start from 1 again on every
+        # start, so a menu watcher tells runs apart by this
+        self.incarnation = uuid.uuid4().hex
         self.restaurants = self._initialize_restaurants()
         self.payments = {} # in memory storage for payments
     
     def _initialize_restaurants(self):
-        restaurants = {}
+        restaurants = StripedStore(watchers=self.menu_watchers) # shared by the worker threads
         restaurant_id = "restaurant456"
-        restaurants[restaurant_id] = {
+        restaurants.put(restaurant_id, {
             'restaurant_id': restaurant_id,
             'name': 'Eskimo Pizza Bandon',
             'address': '1st Patricks quay, Gully, Bandon, Co. Cork, P72 TN93',
             'is_open': True,
+            'version': 1, # bumped on every menu update
             'menu_items': [
                 {
                     'item_id': 'pizza1',
@@ -35,24 +59,12 @@ class RestaurantServicer(restaurant_service_pb2_grpc.RestaurantServiceServicer):
                     'available': True
                 }
             ]
-        }
+        })
         
         return restaurants
     
-    # get restaurants
-    def GetRestaurant(self, request, context):
-        restaurant_id = request.restaurant_id
-        
-        if restaurant_id not in self.restaurants:
-            context.set_code(grpc.StatusCode.NOT_FOUND)
-            context.set_details(f"Restaurant {restaurant_id} not found")
-            return restaurant_service_pb2.RestaurantResponse()
-        
-        restaurant = self.restaurants[restaurant_id]
-        
-        logging.info(f"Retrieved restaurant {restaurant_id}")
-        
-        # convert items -> protobuf messages
+    # convert items -> protobuf messages
+    def _menu_items(self, restaurant):
         menu_items = []
         for item in restaurant['menu_items']:
             menu_item = restaurant_service_pb2.MenuItem(
@@ -63,13 +75,42 @@ class RestaurantServicer(restaurant_service_pb2_grpc.RestaurantServiceServicer):
                 available=item['available']
             )
             menu_items.append(menu_item)
+        return menu_items
+    
+    # get restaurants
+    def GetRestaurant(self, request, context):
+        restaurant_id = request.restaurant_id
+        
+        try:
+            fields = masked_fields(request.read_mask, restaurant_service_pb2.RestaurantResponse.DESCRIPTOR)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return restaurant_service_pb2.RestaurantResponse()
+        
+        restaurant = self.restaurants.get(restaurant_id)
+        if restaurant is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details(f"Restaurant {restaurant_id} not found")
+            return restaurant_service_pb2.RestaurantResponse()
+        
+        logging.info(f"Retrieved restaurant {restaurant_id}")
+        
+        # only the fields asked for, the menu is only converted when it is one of them
+        if fields is not None:
+            values = {name: restaurant[name] for name in fields if name in restaurant and name != 'menu_items'}
+            if 'menu_items' in fields:
+                values['menu_items'] = self._menu_items(restaurant)
+            values.update(restaurant_id=restaurant_id, version=restaurant['version'])
+            return restaurant_service_pb2.RestaurantResponse(**values)
         
         return restaurant_service_pb2.RestaurantResponse(
             restaurant_id=restaurant['restaurant_id'],
             name=restaurant['name'],
             address=restaurant['address'],
-            menu_items=menu_items,
-            is_open=restaurant['is_open']
+            menu_items=self._menu_items(restaurant),
+            is_open=restaurant['is_open'],
+            version=restaurant['version']
         )
     
     # get restaurant payments
@@ -99,14 +140,7 @@ class RestaurantServicer(restaurant_service_pb2_grpc.RestaurantServiceServicer):
     def UpdateMenu(self, request, context):
         restaurant_id = request.restaurant_id
         
-        if restaurant_id not in self.restaurants:
-            context.set_code(grpc.StatusCode.NOT_FOUND)
-            context.set_details(f"Restaurant {restaurant_id} not found")
-            return restaurant_service_pb2.MenuResponse()
-        
-        restaurant = self.restaurants[restaurant_id]
-        
-        restaurant['menu_items'] = []
+        menu_items = []
         for item in request.menu_items:
             menu_item = {
                 'item_id': item.item_id,
@@ -115,7 +149,17 @@ class RestaurantServicer(restaurant_service_pb2_grpc.RestaurantServiceServicer):
                 'price': item.price,
                 'available': item.available
             }
-            restaurant['menu_items'].append(menu_item)
+            menu_items.append(menu_item)
+        
+        # swap in the new menu in one step, readers see the old menu or the new one
+        restaurant = self.restaurants.update(restaurant_id, lambda restaurant: {
+            'menu_items': menu_items,
+            'version': restaurant['version'] + 1,
+        })
+        if restaurant is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details(f"Restaurant {restaurant_id} not found")
+            return restaurant_service_pb2.MenuResponse()
         
         now = datetime.now().isoformat()
         
@@ -124,12 +168,56 @@ class RestaurantServicer(restaurant_service_pb2_grpc.RestaurantServiceServicer):
         return restaurant_service_pb2.MenuResponse(
             restaurant_id=restaurant_id,
             menu_items=request.menu_items,
-            updated_at=now
+            updated_at=now,
+            version=restaurant['version']
+        )
+
+    # stream every restaurant's menu, then each menu again when it changes,
+    # for services that keep a copy of the menus (the order service checks
+    # new orders against its copy)
+    def WatchMenus(self, request, context):
+        yield from self.menu_watch_limit.run(self._watch_menus(request, context), context)
+    
+    def _watch_menus(self, request, context):
+        # subscribed before the menus are read, so no change is missed in
+        # between. one read in both is sent twice, the version tells
+        subscription = self.menu_watchers.subscribe(None)
+        context.add_callback(subscription.wake)
+        try:
+            known_versions = dict(request.known_versions) if request.incarnation == self.incarnation else {}
+            yield restaurant_service_pb2.MenuUpdate(incarnation=self.incarnation, menus=[
+                self._restaurant_menu(restaurant)
+                for restaurant in self.restaurants.snapshot().values()
+                if known_versions.get(restaurant['restaurant_id']) != restaurant['version']
+            ])
+            logging.info("Sent every menu to a watcher")
+            
+            while context.is_active():
+                # the latest of each restaurant that changed
+                changed = {restaurant['restaurant_id']: restaurant for restaurant in subscription.take()}
+                if changed:
+                    yield restaurant_service_pb2.MenuUpdate(
+                        incarnation=self.incarnation,
+                        menus=[self._restaurant_menu(restaurant) for restaurant in changed.values()],
+                    )
+        finally:
+            self.menu_watchers.unsubscribe(subscription)
+    
+    def _restaurant_menu(self, restaurant):
+        return restaurant_service_pb2.RestaurantMenu(
+            restaurant_id=restaurant['restaurant_id'],
+            version=restaurant['version'],
+            is_open=restaurant['is_open'],
+            menu_items=self._menu_items(restaurant),
         )
 
 # starting the gRPC server
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    # GRPC_COMPRESSION compresses responses (none, gzip or deflate)
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=MAX_WORKERS),
+        compression=grpc_compression(os.environ.get('GRPC_COMPRESSION')),
+    )
     restaurant_service_pb2_grpc.add_RestaurantServiceServicer_to_server(RestaurantServicer(), server)
     
     server.add_insecure_port('[::]:50053')
@@ -22,31 +22,42 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
+from google.protobuf import field_mask_pb2 as google_dot_protobuf_dot_field__mask__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x18restaurant_service.proto\x12\nrestaurant\"-\n\x14GetRestaurantRequest\x12\x15\n\rrestaurant_id\x18\x01 \x01(\t\"\x85\x01\n\x12RestaurantResponse\x12\x15\n\rrestaurant_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x03 \x01(\t\x12\x0f\n\x07is_open\x18\x04 \x01(\x08\x12(\n\nmenu_items\x18\x05 \x03(\x0b\x32\x14.restaurant.MenuItem\"T\n\x11UpdateMenuRequest\x12\x15\n\rrestaurant_id\x18\x01 \x01(\t\x12(\n\nmenu_items\x18\x02 \x03(\x0b\x32\x14.restaurant.MenuItem\"`\n\x08MenuItem\x12\x0f\n\x07item_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x03 \x01(\t\x12\r\n\x05price\x18\x04 \x01(\x01\x12\x11\n\tavailable\x18\x05 \x01(\x08\"c\n\x0cMenuResponse\x12\x15\n\rrestaurant_id\x18\x01 \x01(\t\x12(\n\nmenu_items\x18\x02 \x03(\x0b\x32\x14.restaurant.MenuItem\x12\x12\n\nupdated_at\x18\x03 \x01(\t\"5\n\x1cGetRestaurantPaymentsRequest\x12\x15\n\rrestaurant_id\x18\x01 \x01(\t\"b\n\x07Payment\x12\x12\n\npayment_id\x18\x01 \x01(\t\x12\x10\n\x08order_id\x18\x02 \x01(\t\x12\x0e\n\x06\x61mount\x18\x03 \x01(\x01\x12\x0e\n\x06status\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\t\"F\n\x1dGetRestaurantPaymentsResponse\x12%\n\x08payments\x18\x01 \x03(\x0b\x32\x13.restaurant.Payment2\x9b\x02\n\x11RestaurantService\x12Q\n\rGetRestaurant\x12 .restaurant.GetRestaurantRequest\x1a\x1e.restaurant.RestaurantResponse\x12\x45\n\nUpdateMenu\x12\x1d.restaurant.UpdateMenuRequest\x1a\x18.restaurant.MenuResponse\x12l\n\x15GetRestaurantPayments\x12(.restaurant.GetRestaurantPaymentsRequest\x1a).restaurant.GetRestaurantPaymentsResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x18restaurant_service.proto\x12\nrestaurant\x1a google/protobuf/field_mask.proto\"\\\n\x14GetRestaurantRequest\x12\x15\n\rrestaurant_id\x18\x01 \x01(\t\x12-\n\tread_mask\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\"\x96\x01\n\x12RestaurantResponse\x12\x15\n\rrestaurant_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x03 \x01(\t\x12\x0f\n\x07is_open\x18\x04 \x01(\x08\x12(\n\nmenu_items\x18\x05 \x03(\x0b\x32\x14.restaurant.MenuItem\x12\x0f\n\x07version\x18\x06 \x01(\x03\"T\n\x11UpdateMenuRequest\x12\x15\n\rrestaurant_id\x18\x01 \x01(\t\x12(\n\nmenu_items\x18\x02 \x03(\x0b\x32\x14.restaurant.MenuItem\"`\n\x08MenuItem\x12\x0f\n\x07item_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x03 \x01(\t\x12\r\n\x05price\x18\x04 \x01(\x01\x12\x11\n\tavailable\x18\x05 \x01(\x08\"t\n\x0cMenuResponse\x12\x15\n\rrestaurant_id\x18\x01 \x01(\t\x12(\n\nmenu_items\x18\x02 \x03(\x0b\x32\x14.restaurant.MenuItem\x12\x12\n\nupdated_at\x18\x03 \x01(\t\x12\x0f\n\x07version\x18\x04 \x01(\x03\"\xa8\x01\n\x11WatchMenusRequest\x12H\n\x0eknown_versions\x18\x01 \x03(\x0b\x32\x30.restaurant.WatchMenusRequest.KnownVersionsEntry\x12\x13\n\x0bincarnation\x18\x02 \x01(\t\x1a\x34\n\x12KnownVersionsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x03:\x02\x38\x01\"L\n\nMenuUpdate\x12)\n\x05menus\x18\x01 \x03(\x0b\x32\x1a.restaurant.RestaurantMenu\x12\x13\n\x0bincarnation\x18\x02 \x01(\t\"s\n\x0eRestaurantMenu\x12\x15\n\rrestaurant_id\x18\x01 \x01(\t\x12\x0f\n\x07version\x18\x02 \x01(\x03\x12\x0f\n\x07is_open\x18\x03 \x01(\x08\x12(\n\nmenu_items\x18\x04 \x03(\x0b\x32\x14.restaurant.MenuItem\"5\n\x1cGetRestaurantPaymentsRequest\x12\x15\n\rrestaurant_id\x18\x01 \x01(\t\"b\n\x07Payment\x12\x12\n\npayment_id\x18\x01 \x01(\t\x12\x10\n\x08order_id\x18\x02 \x01(\t\x12\x0e\n\x06\x61mount\x18\x03 \x01(\x01\x12\x0e\n\x06status\x18\x04 \x01(\t\x12\x11\n\ttimestamp\x18\x05 \x01(\t\"F\n\x1dGetRestaurantPaymentsResponse\x12%\n\x08payments\x18\x01 \x03(\x0b\x32\x13.restaurant.Payment2\xe2\x02\n\x11RestaurantService\x12Q\n\rGetRestaurant\x12 .restaurant.GetRestaurantRequest\x1a\x1e.restaurant.RestaurantResponse\x12\x45\n\nUpdateMenu\x12\x1d.restaurant.UpdateMenuRequest\x1a\x18.restaurant.MenuResponse\x12l\n\x15GetRestaurantPayments\x12(.restaurant.GetRestaurantPaymentsRequest\x1a).restaurant.GetRestaurantPaymentsResponse\x12\x45\n\nWatchMenus\x12\x1d.restaurant.WatchMenusRequest\x1a\x16.restaurant.MenuUpdate0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'restaurant_service_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_GETRESTAURANTREQUEST']._serialized_start=40
-  _globals['_GETRESTAURANTREQUEST']._serialized_end=85
-  _globals['_RESTAURANTRESPONSE']._serialized_start=88
-  _globals['_RESTAURANTRESPONSE']._serialized_end=221
-  _globals['_UPDATEMENUREQUEST']._serialized_start=223
-  _globals['_UPDATEMENUREQUEST']._serialized_end=307
-  _globals['_MENUITEM']._serialized_start=309
-  _globals['_MENUITEM']._serialized_end=405
-  _globals['_MENURESPONSE']._serialized_start=407
-  _globals['_MENURESPONSE']._serialized_end=506
-  _globals['_GETRESTAURANTPAYMENTSREQUEST']._serialized_start=508
-  _globals['_GETRESTAURANTPAYMENTSREQUEST']._serialized_end=561
-  _globals['_PAYMENT']._serialized_start=563
-  _globals['_PAYMENT']._serialized_end=661
-  _globals['_GETRESTAURANTPAYMENTSRESPONSE']._serialized_start=663
-  _globals['_GETRESTAURANTPAYMENTSRESPONSE']._serialized_end=733
-  _globals['_RESTAURANTSERVICE']._serialized_start=736
-  _globals['_RESTAURANTSERVICE']._serialized_end=1019
+  _globals['_WATCHMENUSREQUEST_KNOWNVERSIONSENTRY']._loaded_options = None
+  _globals['_WATCHMENUSREQUEST_KNOWNVERSIONSENTRY']._serialized_options = b'8\001'
+  _globals['_GETRESTAURANTREQUEST']._serialized_start=74
+  _globals['_GETRESTAURANTREQUEST']._serialized_end=166
+  _globals['_RESTAURANTRESPONSE']._serialized_start=169
+  _globals['_RESTAURANTRESPONSE']._serialized_end=319
+  _globals['_UPDATEMENUREQUEST']._serialized_start=321
+  _globals['_UPDATEMENUREQUEST']._serialized_end=405
+  _globals['_MENUITEM']._serialized_start=407
+  _globals['_MENUITEM']._serialized_end=503
+  _globals['_MENURESPONSE']._serialized_start=505
+  _globals['_MENURESPONSE']._serialized_end=621
+  _globals['_WATCHMENUSREQUEST']._serialized_start=624
+  _globals['_WATCHMENUSREQUEST']._serialized_end=792
+  _globals['_WATCHMENUSREQUEST_KNOWNVERSIONSENTRY']._serialized_start=740
+  _globals['_WATCHMENUSREQUEST_KNOWNVERSIONSENTRY']._serialized_end=792
+  _globals['_MENUUPDATE']._serialized_start=794
+  _globals['_MENUUPDATE']._serialized_end=870
+  _globals['_RESTAURANTMENU']._serialized_start=872
+  _globals['_RESTAURANTMENU']._serialized_end=987
+  _globals['_GETRESTAURANTPAYMENTSREQUEST']._serialized_start=989
+  _globals['_GETRESTAURANTPAYMENTSREQUEST']._serialized_end=1042
+  _globals['_PAYMENT']._serialized_start=1044
+  _globals['_PAYMENT']._serialized_end=1142
+  _globals['_GETRESTAURANTPAYMENTSRESPONSE']._serialized_start=1144
+  _globals['_GETRESTAURANTPAYMENTSRESPONSE']._serialized_end=1214
+  _globals['_RESTAURANTSERVICE']._serialized_start=1217
+  _globals['_RESTAURANTSERVICE']._serialized_end=1571
 # @@protoc_insertion_point(module_scope)
@@ -49,6 +49,11 @@ class RestaurantServiceStub(object):
                 request_serializer=restaurant__service__pb2.GetRestaurantPaymentsRequest.SerializeToString,
                 response_deserializer=restaurant__service__pb2.GetRestaurantPaymentsResponse.FromString,
                 _registered_method=True)
+        self.WatchMenus = channel.unary_stream(
+                '/restaurant.RestaurantService/WatchMenus',
+                request_serializer=restaurant__service__pb2.WatchMenusRequest.SerializeToString,
+                response_deserializer=restaurant__service__pb2.MenuUpdate.FromString,
+                _registered_method=True)
 
 
 class RestaurantServiceServicer(object):
@@ -72,6 +77,12 @@ class RestaurantServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def WatchMenus(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RestaurantServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -90,6 +101,11 @@ def add_RestaurantServiceServicer_to_server(servicer, server):
                     request_deserializer=restaurant__service__pb2.GetRestaurantPaymentsRequest.FromString,
                     response_serializer=restaurant__service__pb2.GetRestaurantPaymentsResponse.SerializeToString,
             ),
+            'WatchMenus': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchMenus,
+                    request_deserializer=restaurant__service__pb2.WatchMenusRequest.FromString,
+                    response_serializer=restaurant__service__pb2.MenuUpdate.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'restaurant.RestaurantService', rpc_method_handlers)
@@ -181,3 +197,30 @@ class RestaurantService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def WatchMenus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/restaurant.RestaurantService/WatchMenus',
+            restaurant__service__pb2.WatchMenusRequest.SerializeToString,
+            restaurant__service__pb2.MenuUpdate.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)